@@ -0,0 +1,79 @@
+"""پیکره‌ی پاسخ‌های مدل‌ها برای بنچمارک‌های rewrite_tools.
+
+منبع اصلی پاسخ‌های واقعی ضبط‌شده از Gemini/OpenRouter در recorded_replies.jsonl است (با
+record_replies.py ساخته و ناشناس‌سازی می‌شود). تا وقتی آن فایل نباشد، MODEL_OUTPUTS استفاده می‌شود:
+نمونه‌های ساختگی که به سبک پاسخ‌های مدل‌ها نوشته شده‌اند، نه خروجی واقعی.
+describe منبع استفاده‌شده را برای چاپ در خروجی هر بنچمارک می‌دهد.
+build_text فقط برای ساختن متن با طول دلخواه (200، 2k، 20k) از همین نمونه‌ها با seed ثابت است.
+"""
+import json
+import os
+import random
+
+RECORDED_REPLIES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recorded_replies.jsonl")
+
+MODEL_OUTPUTS = [
+    """برای شروع یادگیری برنامه‌نویسی پایتون، توصیه می‌شود ابتدا با مفاهیم پایه مانند متغیرها، حلقه‌ها و توابع آشنا شوید.
+در حال حاضر منابع رایگان بسیاری وجود دارد که می‌توانند به شما کمک کنند. بنابراین لازم است یک برنامه‌ی منظم داشته باشید
+و هر روز حداقل یک ساعت تمرین کنید. مطمئن شوید که پروژه‌های کوچک را به صورت کامل انجام دهید، زیرا تجربه‌ی عملی
+بسیار مهم است. همچنین بررسی کنید که کدام حوزه (وب، داده یا هوش مصنوعی) برای شما مناسب است.""",
+    """سبک زندگی سالم شامل تغذیه سالم، فعالیت بدنی منظم و خواب کافی است. به خاطر داشته باشید که نوشیدن آب کافی
+در طول روز ضروری است. از مصرف غذاهای فرآوری‌شده اجتناب کنید و سعی کنید وعده‌های غذایی خود را در ساعت مشخصی
+میل کنید. علاوه بر این، استرس مزمن می‌تواند تأثیر منفی بر سلامت داشته باشد؛ بنابراین توصیه می‌شود
+روزانه چند دقیقه استراحت کنید و تمرکز کنید بر تنفس عمیق. در صورتی که احساس ناراحتی مداوم دارید، حتماً انجام دهید
+یک بررسی پزشکی کامل.""",
+    """برای افزایش بهره‌وری در محیط کار، ابتدا اهداف روزانه‌ی خود را مشخص کنید. ترجیحاً کارهای مهم را در ساعات
+ابتدایی روز انجام دهید، زیرا در این زمان تمرکز بیشتری دارید. مراقب باشید که جلسات وقت‌گیر برنامه‌ی شما را مختل نکنند.
+نکته قابل توجه این است که استراحت‌های کوتاه میان کارها اثربخش است و به شما کمک می‌کند شاداب بمانید.
+در نتیجه می‌توانید با انرژی بیشتری پیشرفت کنید. به طور کلی، مدیریت زمان مهارتی است که با تمرین به دست می‌آید.""",
+    """یادگیری زبان انگلیسی فرآیندی تدریجی است. در ابتدا لازم است واژگان پرکاربرد را بیاموزید و سپس با گرامر
+پایه آشنا شوید. توصیه می‌شود هر روز به پادکست‌ها یا فیلم‌های انگلیسی گوش دهید. همچنین ارتباط برقرار کنید با افرادی
+که به این زبان صحبت می‌کنند. به هیچ وجه از اشتباه کردن نترسید، زیرا اشتباه بخشی از یادگیری است. تجربه کنید،
+تمرین کنید و صبور باشید؛ نتیجه بسیار خوب خواهد بود. لازم به ذکر است که اپلیکیشن‌های متنوعی برای این منظور وجود دارد.""",
+    """در صورتی که قصد خرید لپ‌تاپ دارید، ابتدا بررسی کنید که کاربری اصلی شما چیست. برای کارهای اداری،
+یک پردازنده‌ی میان‌رده و هشت گیگابایت حافظه کافی است. اما برای طراحی گرافیک یا بازی، کارت گرافیک مجزا ضروری است.
+اطمینان حاصل کنید که دستگاه از گارانتی معتبر برخوردار است. از خرید مدل‌های بی‌کیفیت پرهیز کنید، زیرا در درازمدت
+هزینه‌ی بیشتری خواهد داشت. با در نظر گرفتن بودجه، مقایسه‌ی چند مدل مختلف امکان‌پذیر است و تصمیم‌گیری را
+ساده‌تر می‌کند.""",
+    """برای کاهش اضطراب پیش از امتحان، توصیه می‌شود برنامه‌ریزی منظمی برای مطالعه داشته باشید. شب قبل از امتحان
+استراحت کنید و خواب کافی داشته باشید. مطمئن شوید که صبحانه‌ی سبک و مناسب میل کرده‌اید. در طول امتحان، ابتدا
+سؤالات آسان را پاسخ دهید و سپس به سراغ سؤالات دشوار بروید. به خاطر داشته باشید که اضطراب خفیف طبیعی است و
+حتی می‌تواند به تمرکز کمک کند. با خیال راحت به توانایی‌های خود اعتماد کنید و تلاش کنید آرامش خود را حفظ کنید.""",
+]
+
+
+def load_recorded(path=RECORDED_REPLIES_FILE):
+    """پاسخ‌های ضبط‌شده به شکل فهرست (منبع، متن)؛ اگر فایل نباشد فهرست خالی."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+    return [(record["source"], record["text"]) for record in records if record.get("text")]
+
+
+def replies():
+    """پاسخ‌های واقعی ضبط‌شده، یا اگر نباشند نمونه‌های ساختگی MODEL_OUTPUTS (با منبع "synthetic")."""
+    return load_recorded() or [("synthetic", text) for text in MODEL_OUTPUTS]
+
+
+def describe():
+    """یک خط برای خروجی بنچمارک‌ها: نتیجه روی پاسخ‌های واقعی ضبط‌شده گرفته شده یا روی نمونه‌های ساختگی."""
+    recorded = load_recorded()
+    if recorded:
+        sources = ", ".join(sorted({source for source, _ in recorded}))
+        return f"📚 پیکره: {len(recorded)} پاسخ ضبط‌شده ({sources}) از {os.path.basename(RECORDED_REPLIES_FILE)}"
+    return (f"⚠️ پیکره: {len(MODEL_OUTPUTS)} نمونه‌ی ساختگی MODEL_OUTPUTS، نه خروجی واقعی مدل "
+            "(برای پاسخ واقعی benchmarks/record_replies.py را اجرا کنید)")
+
+
+def build_text(length, seed=0):
+    """متنی تقریباً به طول length از پاسخ‌های پیکره با ترتیب تصادفی ثابت می‌سازد."""
+    rng = random.Random(seed)
+    samples = [text for _, text in replies()]
+    parts, size = [], 0
+    while size < length:
+        sample = rng.choice(samples)
+        parts.append(sample)
+        size += len(sample) + 1
+    return " ".join(parts)[:length]
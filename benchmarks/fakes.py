@@ -0,0 +1,281 @@
+"""جایگزین‌های محلی سرویس‌های بیرونی بات برای بنچمارک‌ها.
+
+- FakeGeminiModel: به جای genai.GenerativeModel در providers گذاشته می‌شود (درون همان پروسه)
+- FakeOpenRouter: سرور HTTP سازگار با OpenAI (POST .../chat/completions، پاسخ JSON یا SSE)
+- FakeTelegram: سرور جعلی Bot API (getMe، sendMessage، editMessageText، deleteMessage، sendChatAction و ...)
+
+تأخیر هر سرویس با Latency تعریف می‌شود: lognormal با میانه و sigma، و با احتمال error_rate خطای گذرا
+(503/429 برای سرورها، FakeGeminiError برای Gemini). متن پاسخ‌ها از پیکره‌ی corpus ساخته می‌شود.
+serve() سرورها را در پروسه‌ی جدا اجرا می‌کند تا CPU آن‌ها در اندازه‌گیری CPU بات حساب نشود.
+"""
+import asyncio
+import json
+import math
+import multiprocessing
+import random
+import time
+from http import HTTPStatus
+from types import SimpleNamespace
+from urllib.parse import parse_qsl
+
+from benchmarks.corpus import build_text
+
+
+class Latency:
+    """تأخیر lognormal با میانه‌ی median ثانیه و پهنای sigma؛ با احتمال error_rate تماس خطا می‌دهد."""
+
+    def __init__(self, median, sigma=0.5, error_rate=0.0, seed=0):
+        self.median = median
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+
+    # "0.8" یا "0.8,0.6" یا "0.8,0.6,0.05"
+    @classmethod
+    def parse(cls, spec, seed=0):
+        values = [float(value) for value in spec.split(",")]
+        return cls(*values, seed=seed)
+
+    def spec(self):
+        return f"{self.median},{self.sigma},{self.error_rate}"
+
+    def sample(self):
+        if self.median <= 0:
+            return 0.0
+        return self.median * math.exp(self.rng.gauss(0, self.sigma))
+
+    def fails(self):
+        return self.error_rate > 0 and self.rng.random() < self.error_rate
+
+
+def fake_reply(rng, chars):
+    return build_text(chars, seed=rng.randrange(1 << 30))
+
+
+class FakeGeminiError(Exception):
+    """خطای گذرا به شکل خطاهای google.api_core (کد HTTP در code)."""
+
+    code = 503
+
+
+class FakeGeminiResponse:
+    def __init__(self, text, prompt_tokens=0):
+        self.text = text
+        self.usage_metadata = SimpleNamespace(prompt_token_count=prompt_tokens, candidates_token_count=len(text) // 3)
+
+
+class FakeGeminiModel:
+    """مدل جعلی Gemini با تأخیر و نرخ خطای Latency؛ حالت stream=True تکه‌تکه پاسخ می‌دهد."""
+
+    def __init__(self, latency, reply_chars=600, seed=0):
+        self.latency = latency
+        self.reply_chars = reply_chars
+        self.rng = random.Random(seed)
+        self.calls = 0
+
+    async def generate_content_async(self, contents, generation_config=None, stream=False):
+        self.calls += 1
+        delay = self.latency.sample()
+        if self.latency.fails():
+            await asyncio.sleep(delay)
+            raise FakeGeminiError("503 fake overload")
+        text = fake_reply(self.rng, self.reply_chars)
+        prompt_tokens = len(contents) // 3 if isinstance(contents, str) else 0
+        if stream:
+            return self._stream(text, delay)
+        await asyncio.sleep(delay)
+        return FakeGeminiResponse(text, prompt_tokens)
+
+    async def _stream(self, text, delay, chunks=8):
+        step = max(1, len(text) // chunks)
+        for start in range(0, len(text), step):
+            await asyncio.sleep(delay / chunks)
+            yield FakeGeminiResponse(text[start:start + step])
+
+
+# 🌐 سرور HTTP/1.1 کوچک روی asyncio با keep-alive (همان چیزی که استخر اتصال httpx انتظار دارد)
+class FakeServer:
+    def __init__(self, latency):
+        self.latency = latency
+        self.counts = {}
+
+    async def start(self, host="127.0.0.1", port=0):
+        self.server = await asyncio.start_server(self._connection, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def _connection(self, reader, writer):
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                if path == "/_stats":
+                    self.send(writer, 200, self.counts)
+                else:
+                    await self.respond(writer, method, path, headers, body)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_request(reader):
+        line = await reader.readline()
+        if not line.strip():
+            return None
+        method, path, _ = line.decode("latin-1").split(" ", 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        body = await reader.readexactly(int(headers.get("content-length", "0")))
+        return method, path, headers, body
+
+    def count(self, name):
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    @staticmethod
+    def send(writer, status, payload, content_type="application/json"):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+            f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+
+    async def respond(self, writer, method, path, headers, body):
+        raise NotImplementedError
+
+
+class FakeOpenRouter(FakeServer):
+    """سرور جعلی chat/completions: بعد از تأخیر Latency متنی از پیکره برمی‌گرداند (با stream به شکل SSE)."""
+
+    def __init__(self, latency, reply_chars=600, seed=0):
+        super().__init__(latency)
+        self.reply_chars = reply_chars
+        self.rng = random.Random(seed)
+
+    async def respond(self, writer, method, path, headers, body):
+        if method != "POST" or not path.endswith("/chat/completions"):
+            self.send(writer, 404, {"error": {"message": "not found"}})
+            return
+        payload = json.loads(body)
+        model = payload.get("model", "")
+        self.count(model)
+        delay = self.latency.sample()
+        if self.latency.fails():
+            self.count("errors")
+            await asyncio.sleep(delay)
+            status = self.rng.choice((429, 503))
+            self.send(writer, status, {"error": {"code": status, "message": "fake upstream error"}})
+            return
+        text = fake_reply(self.rng, self.reply_chars)
+        prompt_tokens = sum(len(message.get("content") or "") for message in payload.get("messages", [])) // 3
+        if payload.get("stream"):
+            await self._stream(writer, model, text, delay)
+            return
+        await asyncio.sleep(delay)
+        self.send(writer, 200, {
+            "id": f"gen-{self.rng.randrange(1 << 30)}",
+            "object": "chat.completion",
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(text) // 3},
+        })
+
+    @staticmethod
+    async def _stream(writer, model, text, delay, chunks=8):
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nTransfer-Encoding: chunked\r\n\r\n")
+        step = max(1, len(text) // chunks)
+        events = [": OPENROUTER PROCESSING"]
+        for start in range(0, len(text), step):
+            chunk = {"model": model, "choices": [{"index": 0, "delta": {"content": text[start:start + step]}}]}
+            events.append("data: " + json.dumps(chunk, ensure_ascii=False))
+        events.append("data: [DONE]")
+        for event in events:
+            data = (event + "\n\n").encode("utf-8")
+            writer.write(f"{len(data):X}\r\n".encode("latin-1") + data + b"\r\n")
+            await writer.drain()
+            await asyncio.sleep(delay / len(events))
+        writer.write(b"0\r\n\r\n")
+
+
+class FakeTelegram(FakeServer):
+    """سرور جعلی Bot API: /bot<token>/<method>؛ پیام‌های ارسالی با message_id افزایشی برمی‌گردند."""
+
+    def __init__(self, latency):
+        super().__init__(latency)
+        self.next_message_id = 1
+
+    @staticmethod
+    def _params(headers, body):
+        content_type = headers.get("content-type", "")
+        if content_type.startswith("application/json"):
+            return json.loads(body or b"{}")
+        if content_type.startswith("application/x-www-form-urlencoded"):
+            return dict(parse_qsl(body.decode("utf-8")))
+        return {}
+
+    def _message(self, params, message_id=None):
+        if message_id is None:
+            message_id, self.next_message_id = self.next_message_id, self.next_message_id + 1
+        return {
+            "message_id": int(message_id),
+            "date": int(time.time()),
+            "chat": {"id": int(params.get("chat_id", 0)), "type": "private"},
+            "text": params.get("text", ""),
+        }
+
+    async def respond(self, writer, method, path, headers, body):
+        api_method = path.rsplit("/", 1)[-1]
+        self.count(api_method)
+        params = self._params(headers, body)
+        await asyncio.sleep(self.latency.sample())
+        if self.latency.fails():
+            self.count("errors")
+            self.send(writer, 429, {
+                "ok": False, "error_code": 429, "description": "Too Many Requests: retry after 1",
+                "parameters": {"retry_after": 1},
+            })
+            return
+        if api_method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+        elif api_method == "sendMessage":
+            result = self._message(params)
+        elif api_method == "editMessageText":
+            result = self._message(params, params.get("message_id"))
+        else:
+            result = True
+        self.send(writer, 200, {"ok": True, "result": result})
+
+
+def _run_servers(openrouter, telegram, reply_chars, seed, conn):
+    async def run():
+        servers = [
+            FakeOpenRouter(Latency.parse(openrouter, seed), reply_chars, seed),
+            FakeTelegram(Latency.parse(telegram, seed + 1)),
+        ]
+        conn.send([await server.start() for server in servers])
+        await asyncio.Event().wait()
+
+    asyncio.run(run())
+
+
+# 🚀 اجرای سرورهای جعلی در پروسه‌ی جدا؛ (پروسه، آدرس chat/completions، base_url برای Bot API)
+def serve(openrouter="0.8,0.5,0", telegram="0.03,0.3,0", reply_chars=600, seed=0):
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.get_context("spawn").Process(
+        target=_run_servers, args=(openrouter, telegram, reply_chars, seed, child), daemon=True
+    )
+    process.start()
+    openrouter_port, telegram_port = parent.recv()
+    return (
+        process,
+        f"http://127.0.0.1:{openrouter_port}/api/v1/chat/completions",
+        f"http://127.0.0.1:{telegram_port}/bot",
+    )
@@ -0,0 +1,42 @@
+"""مقایسه‌ی امتیازدهی رسمی بودن قدیمی (یک re.search برای هر کلید) با formality_score.
+
+روی تک‌تک پاسخ‌های ضبط‌شده‌ی مدل‌ها (benchmarks/recorded_replies.jsonl) و متن‌هایی به طول 200، 2k و 20k
+اجرا می‌شود؛ اگر پاسخ ضبط‌شده‌ای نباشد، نمونه‌های ساختگی corpus استفاده می‌شوند. منبع در خروجی چاپ می‌شود.
+
+    python benchmarks/formality_bench.py
+"""
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import build_text, describe, replies
+from rewrite_tools import formality_score, slang_replacements
+
+
+def legacy_score(text):
+    formal_keywords = list(slang_replacements.keys())
+    return sum(1 for word in formal_keywords if re.search(rf"\b{re.escape(word)}\b", text))
+
+
+def bench(func, text, number):
+    return min(timeit.repeat(lambda: func(text), number=number, repeat=5)) / number
+
+
+def main():
+    samples = replies()
+    print(describe() + "\n")
+    texts = samples + [(f"{n} chars", build_text(n)) for n in (200, 2000, 20000)]
+    print(f"{'text':<12}{'len':>7}{'legacy µs':>12}{'new µs':>10}{'speedup':>9}")
+    for name, text in texts:
+        assert legacy_score(text) == formality_score(text)[0]
+        number = 20 if len(text) > 10000 else 200
+        old = bench(legacy_score, text, number)
+        new = bench(formality_score, text, number)
+        print(f"{name:<12}{len(text):>7}{old * 1e6:>12.0f}{new * 1e6:>10.0f}{old / new:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
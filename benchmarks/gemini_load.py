@@ -0,0 +1,64 @@
+"""تست بار فراخوانی‌های Gemini با یک مدل جعلی محلی.
+
+N چت هم‌زمان در حالت gemini اجرا می‌شوند؛ چون هر فراخوانی مدل غیرمسدودکننده است،
+زمان کل باید تقریباً برابر زمان یک چت باشد، نه N برابر آن.
+
+    python benchmarks/gemini_load.py --chats 20 --latency 0.5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """مدل جعلی که تأخیر شبکه را با sleep شبیه‌سازی می‌کند."""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    async def generate_content_async(self, contents, generation_config=None):
+        await asyncio.sleep(self.latency)
+        return FakeResponse("در حال حاضر توصیه می‌شود که این کار را انجام دهید.")
+
+    def generate_content(self, contents, generation_config=None):
+        time.sleep(self.latency)
+        return FakeResponse("در حال حاضر توصیه می‌شود که این کار را انجام دهید.")
+
+
+async def run_chats(n):
+    start = time.perf_counter()
+    await asyncio.gather(*(main.process_message(f"سوال شماره {i}", mode="gemini") for i in range(n)))
+    return time.perf_counter() - start
+
+
+async def run(chats, latency):
+    main.providers.PROVIDERS["gemini"].models[main.providers.GEMINI_MODEL] = FakeModel(latency)
+    main.router.ROUTES["check"] = [main.router.GEMINI_ROUTE]
+    main.model_limits.configure(main.providers.GEMINI_MODEL, concurrency=chats, rpm=0, tpm=0)
+
+    single = await run_chats(1)
+    concurrent = await run_chats(chats)
+    ratio = concurrent / single
+    print(f"1 chat:   {single:.3f}s")
+    print(f"{chats} chats: {concurrent:.3f}s  (x{ratio:.2f} of one chat)")
+    return ratio
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chats", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+    ratio = asyncio.run(run(args.chats, args.latency))
+    sys.exit(0 if ratio < 2 else 1)
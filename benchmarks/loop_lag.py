@@ -0,0 +1,70 @@
+"""تأخیر event loop (p99) هنگام بازنویسی هم‌زمان چند پاسخ، با و بدون rewrite_executor.
+
+یک تسک کاوشگر هر INTERVAL میلی‌ثانیه بیدار می‌شود و دیرکرد بیدار شدنش را ثبت می‌کند؛
+هم‌زمان N چت هر کدام چند بار پاسخ‌های پیکره را بازنویسی می‌کنند.
+
+    python benchmarks/loop_lag.py --chats 8 --length 8000 --modes inline thread process
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rewrite_executor
+from benchmarks.corpus import build_text, describe
+
+
+async def probe(lags, interval, stop):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def chat(seed, length, rounds):
+    for i in range(rounds):
+        await rewrite_executor.rewrite(build_text(length, seed=seed * 100 + i))
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+
+async def run(mode, chats, length, rounds, interval):
+    rewrite_executor.REWRITE_EXECUTOR = mode
+    await rewrite_executor.start()
+
+    lags, stop = [], asyncio.Event()
+    probe_task = asyncio.create_task(probe(lags, interval, stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(chat(seed, length, rounds) for seed in range(chats)))
+    total = time.perf_counter() - start
+    stop.set()
+    await probe_task
+
+    rewrite_executor.shutdown()
+    return total, percentile(lags, 0.5), percentile(lags, 0.99), max(lags, default=0.0)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chats", type=int, default=8)
+    parser.add_argument("--length", type=int, default=8000)
+    parser.add_argument("--rounds", type=int, default=4)
+    parser.add_argument("--interval", type=float, default=0.005)
+    parser.add_argument("--modes", nargs="+", default=["inline", "thread", "process"])
+    args = parser.parse_args()
+
+    print(describe())
+    results = [(mode, asyncio.run(run(mode, args.chats, args.length, args.rounds, args.interval))) for mode in args.modes]
+    print(f"{'mode':<9}{'total s':>9}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for mode, (total, p50, p99, worst) in results:
+        print(f"{mode:<9}{total:>9.2f}{p50 * 1000:>9.1f}{p99 * 1000:>9.1f}{worst * 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""بنچمارک آفلاین کل پایپ‌لاین پاسخ با سرویس‌های جعلی محلی (بدون تلگرام و کلید مدل واقعی).
+
+هدف‌ها: process_message در حالت‌های gemini، openrouter، deepseek و refined، و handler:<mode> که
+handle_user_message را با آپدیت ساختگی از مسیر اپلیکیشن و سرور جعلی Bot API اجرا می‌کند.
+هر هدف در هر سطح هم‌زمانی با --requests درخواست (هر کدام از یک چت جدا) اجرا می‌شود و توان عملیاتی،
+تأخیر p50/p95/p99، زمان CPU هر پاسخ (پروسه‌ی بات و workerهای بازنویسی) و تعداد تماس با مدل‌ها و
+Bot API برای هر پاسخ گزارش می‌شود. تأخیر هر سرویس «میانه[,sigma[,نرخ خطا]]» بر حسب ثانیه است.
+
+کش پاسخ خاموش است و سقف‌های model_limits و outbound برداشته می‌شوند تا خود بات اندازه‌گیری شود؛
+با --model-limits و --telegram-limits سقف‌های واقعی سر جایشان می‌مانند.
+
+    python benchmarks/pipeline_bench.py --concurrency 1 8 32 --requests 64
+    python benchmarks/pipeline_bench.py --targets gemini handler:refined --openrouter 0.8,0.6,0.05 --json out.json
+    python benchmarks/pipeline_bench.py --baseline out.json --tolerance 0.2
+
+با --baseline اگر توان عملیاتی کمتر، یا p95 یا CPU هر پاسخ بیشتر از tolerance نسبت به نتیجه‌ی ذخیره‌شده
+بدتر شود، اسکریپت با کد 1 تمام می‌شود.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import corpus, fakes
+
+MODES = ["gemini", "openrouter", "deepseek", "refined"]
+DEFAULT_TARGETS = MODES + ["handler:gemini"]
+UNLIMITED_RATE = "1000000"
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+
+# ⏱️ CPU پروسه‌ی جاری به‌علاوه‌ی پروسه‌های فرزند زنده (workerهای بازنویسی)؛ سرور جعلی حساب نمی‌شود
+def cpu_seconds(exclude_pid):
+    total = time.process_time()
+    ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+    for child in multiprocessing.active_children():
+        if child.pid == exclude_pid:
+            continue
+        try:
+            with open(f"/proc/{child.pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            total += (int(fields[11]) + int(fields[12])) / ticks
+        except OSError:
+            pass
+    return total
+
+
+def configure_environment(args, openrouter_url, telegram_url, workdir):
+    os.environ.update({
+        "OPENROUTER_URL": openrouter_url,
+        "TELEGRAM_BASE_URL": telegram_url,
+        "USER_MODE_FILE": os.path.join(workdir, "user_modes.json"),
+        "RESPONSE_CACHE_ENABLED": "0",
+        "SEMANTIC_CACHE_ENABLED": "0",
+    })
+    for name, value in (
+        ("TELEGRAM_TOKEN", "123456:bench"),
+        ("OPENROUTER_API_KEY", "bench"),
+        ("GOOGLE_API_KEY", "bench"),
+        ("LOG_LEVEL", "ERROR"),
+    ):
+        os.environ.setdefault(name, value)
+    if args.rewrite_executor:
+        os.environ["REWRITE_EXECUTOR"] = args.rewrite_executor
+    if not args.telegram_limits:
+        for name in ("OUTBOUND_GLOBAL_RATE", "OUTBOUND_GLOBAL_BURST", "OUTBOUND_CHAT_RATE",
+                     "OUTBOUND_CHAT_BURST", "OUTBOUND_GROUP_RATE"):
+            os.environ[name] = UNLIMITED_RATE
+
+
+def make_update(bot, update_id, chat_id, text):
+    from telegram import Update
+
+    return Update.de_json({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private", "first_name": "Bench"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Bench"},
+            "text": text,
+        },
+    }, bot)
+
+
+class Bench:
+    def __init__(self, main, app, gemini, fake_pid, telegram_url):
+        self.main = main
+        self.app = app
+        self.gemini = gemini
+        self.fake_pid = fake_pid
+        self.stats_urls = {
+            "openrouter": os.environ["OPENROUTER_URL"].split("/api/", 1)[0] + "/_stats",
+            "telegram": telegram_url.rsplit("/", 1)[0] + "/_stats",
+        }
+        self.ids = itertools.count(1)
+        self.handler_errors = 0
+        # پاسخ‌های خطای مسیر handler به کاربر فرستاده می‌شوند و بالا نمی‌آیند؛ همین‌جا شمرده می‌شوند
+        cached_process_message = main.cached_process_message
+
+        async def counted(*args, **kwargs):
+            reply = await cached_process_message(*args, **kwargs)
+            if not reply or main.failed(reply):
+                self.handler_errors += 1
+            return reply
+
+        main.cached_process_message = counted
+
+    async def fake_counts(self):
+        import httpx
+
+        counts = {}
+        async with httpx.AsyncClient() as client:
+            for name, url in self.stats_urls.items():
+                values = (await client.get(url)).json()
+                counts[name] = sum(value for key, value in values.items() if key != "errors")
+        counts["openrouter"] += self.gemini.calls
+        return counts
+
+    async def request(self, target):
+        n = next(self.ids)
+        text = f"سوال شماره {n}: برای شروع یادگیری برنامه‌نویسی چه کار کنم؟"
+        if not target.startswith("handler:"):
+            return await self.main.process_message(text, mode=target)
+        chat_id = 500000 + n
+        self.main.user_store.set_mode(chat_id, target.split(":", 1)[1])
+        await self.app.process_update(make_update(self.app.bot, n, chat_id, text))
+        return ""
+
+    async def run(self, target, concurrency, requests):
+        latencies, errors = [], 0
+        pending = iter(range(requests))
+
+        async def worker():
+            nonlocal errors
+            for _ in pending:
+                start = time.perf_counter()
+                try:
+                    reply = await self.request(target)
+                except Exception:
+                    errors += 1
+                else:
+                    if self.main.failed(reply):
+                        errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        counts_before = await self.fake_counts()
+        handler_errors = self.handler_errors
+        cpu_before = cpu_seconds(self.fake_pid)
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - start
+        cpu = cpu_seconds(self.fake_pid) - cpu_before
+        counts_after = await self.fake_counts()
+        return {
+            "target": target,
+            "concurrency": concurrency,
+            "requests": requests,
+            "errors": errors + self.handler_errors - handler_errors,
+            "throughput": requests / wall,
+            "p50": percentile(latencies, 0.5),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "cpu_per_reply": cpu / requests,
+            "model_calls": (counts_after["openrouter"] - counts_before["openrouter"]) / requests,
+            "telegram_calls": (counts_after["telegram"] - counts_before["telegram"]) / requests,
+        }
+
+
+def print_results(results):
+    print(f"{'target':<18}{'conc':>5}{'err':>5}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'cpu ms':>8}{'model':>7}{'tg':>6}")
+    for r in results:
+        print(f"{r['target']:<18}{r['concurrency']:>5}{r['errors']:>5}{r['throughput']:>8.2f}"
+              f"{r['p50'] * 1000:>9.0f}{r['p95'] * 1000:>9.0f}{r['p99'] * 1000:>9.0f}"
+              f"{r['cpu_per_reply'] * 1000:>8.1f}{r['model_calls']:>7.2f}{r['telegram_calls']:>6.2f}")
+
+
+# 📉 مقایسه با نتیجه‌ی ذخیره‌شده؛ فهرست پسرفت‌ها
+def regressions(results, baseline, tolerance):
+    previous = {(r["target"], r["concurrency"]): r for r in baseline}
+    found = []
+    for r in results:
+        old = previous.get((r["target"], r["concurrency"]))
+        if old is None:
+            continue
+        if r["throughput"] < old["throughput"] * (1 - tolerance):
+            found.append(f"{r['target']}@{r['concurrency']}: req/s {old['throughput']:.2f} → {r['throughput']:.2f}")
+        for key in ("p95", "cpu_per_reply"):
+            if r[key] > old[key] * (1 + tolerance):
+                found.append(f"{r['target']}@{r['concurrency']}: {key} {old[key] * 1000:.1f}ms → {r[key] * 1000:.1f}ms")
+    return found
+
+
+async def run(args, fake_pid, telegram_url):
+    import main
+    from benchmarks.fakes import FakeGeminiModel, Latency
+
+    gemini = FakeGeminiModel(Latency.parse(args.gemini, args.seed + 2), args.reply_chars, args.seed)
+    main.providers.PROVIDERS["gemini"].models[main.providers.GEMINI_MODEL] = gemini
+    if not args.model_limits:
+        for model in {main.providers.resolve(route)[1] for routes in main.router.ROUTES.values() for route in routes}:
+            main.model_limits.configure(model, concurrency=0, rpm=0, tpm=0)
+    main.STREAM_REPLIES = args.stream
+
+    app = main.build_application(polling=False)
+    await app.initialize()
+    await main.on_startup(app)
+    bench = Bench(main, app, gemini, fake_pid, telegram_url)
+    results = []
+    try:
+        for target in args.targets:
+            await bench.run(target, 1, 1)
+            for concurrency in args.concurrency:
+                results.append(await bench.run(target, concurrency, max(args.requests, concurrency)))
+    finally:
+        await app.shutdown()
+        await main.on_shutdown(app)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--targets", nargs="+", default=DEFAULT_TARGETS)
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--gemini", default="0.5,0.5,0")
+    parser.add_argument("--openrouter", default="0.8,0.5,0")
+    parser.add_argument("--telegram", default="0.03,0.3,0")
+    parser.add_argument("--reply-chars", type=int, default=600)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rewrite-executor", choices=["inline", "thread", "process"])
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--model-limits", action="store_true")
+    parser.add_argument("--telegram-limits", action="store_true")
+    parser.add_argument("--json")
+    parser.add_argument("--baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    # متن پاسخ سرویس‌های جعلی از پیکره‌ی corpus ساخته می‌شود
+    print(corpus.describe())
+    process, openrouter_url, telegram_url = fakes.serve(args.openrouter, args.telegram, args.reply_chars, args.seed)
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            configure_environment(args, openrouter_url, telegram_url, workdir)
+            results = asyncio.run(run(args, process.pid, telegram_url))
+    finally:
+        process.terminate()
+
+    print_results(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        for line in found:
+            print(f"📉 {line}")
+        sys.exit(1 if found else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""ضبط پاسخ‌های واقعی مدل‌ها (Gemini و OpenRouter) برای پیکره‌ی بنچمارک‌ها.
+
+چند سوال عمومی ثابت (بدون اطلاعات کاربر) از مسیرهای answer، direct و reason روتر پرسیده می‌شود و
+پاسخ خام هر مدل، پیش از بازنویسی، بعد از ناشناس‌سازی (نشانی وب، ایمیل، شماره‌ی تلفن و اعداد بلند)
+در benchmarks/recorded_replies.jsonl نوشته می‌شود. کلیدهای GOOGLE_API_KEY و OPENROUTER_API_KEY لازم‌اند.
+
+    python benchmarks/record_replies.py
+    python benchmarks/record_replies.py --stages answer direct --output /tmp/replies.jsonl
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from benchmarks.corpus import RECORDED_REPLIES_FILE
+
+PROMPTS = [
+    "برای شروع یادگیری برنامه‌نویسی پایتون چه کار کنم؟",
+    "چطور می‌توانم کیفیت خوابم را بهتر کنم؟",
+    "تفاوت انرژی خورشیدی و بادی چیست؟",
+    "برای مدیریت زمان در دوران امتحانات چه پیشنهادی داری؟",
+    "چطور یک رزومه‌ی خوب برای اولین شغل بنویسم؟",
+    "فواید پیاده‌روی روزانه چیست؟",
+    "برای پس‌انداز ماهانه از کجا شروع کنم؟",
+    "یادگیری زبان انگلیسی را با چه روشی ادامه دهم؟",
+]
+STAGES = ["answer", "direct", "reason"]
+
+# 🕶️ الگوهای ناشناس‌سازی؛ هر چیزی که می‌تواند به شخص یا جای مشخصی اشاره کند جایگزین می‌شود
+_ANONYMIZE = [
+    (re.compile(r"https?://\S+|www\.\S+"), "<url>"),
+    (re.compile(r"[\w.+-]+@[\w-]+\.[\w.]+"), "<email>"),
+    (re.compile(r"(?:\+|00)?[\d۰-۹][\d۰-۹ -]{8,}[\d۰-۹]"), "<phone>"),
+    (re.compile(r"@\w{4,}"), "<handle>"),
+]
+
+
+def anonymize(text):
+    for pattern, placeholder in _ANONYMIZE:
+        text = pattern.sub(placeholder, text)
+    return text.strip()
+
+
+# 📼 هر مسیر هر مرحله جدا پرسیده می‌شود تا منبع هر پاسخ دقیقاً معلوم باشد
+async def record(stages, prompts):
+    import openrouter_client
+    import router
+
+    records = []
+    try:
+        for stage in stages:
+            for route in router.ROUTES[stage]:
+                for prompt in prompts:
+                    try:
+                        text = await router._call(stage, route, [{"role": "user", "content": prompt}], None)
+                    except Exception as e:
+                        print(f"⚠️ {route}: {type(e).__name__}: {e}")
+                        continue
+                    if text:
+                        records.append({
+                            "source": route.split(":", 1)[0], "route": route, "prompt": prompt,
+                            "text": anonymize(text),
+                        })
+    finally:
+        await openrouter_client.aclose()
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stages", nargs="+", default=STAGES, choices=STAGES)
+    parser.add_argument("--output", default=RECORDED_REPLIES_FILE)
+    args = parser.parse_args()
+
+    records = asyncio.run(record(args.stages, PROMPTS))
+    with open(args.output, "w", encoding="utf-8") as f:
+        for item in records:
+            f.write(json.dumps(item, ensure_ascii=False) + "\n")
+    print(f"{len(records)} پاسخ در {args.output} ذخیره شد")
+
+
+if __name__ == "__main__":
+    main()
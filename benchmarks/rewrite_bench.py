@@ -0,0 +1,130 @@
+"""میکروبنچمارک تبدیل‌های rewrite_tools روی پیکره‌ی ثابت (seed ثابت) در طول‌های 200، 2k و 20k نویسه.
+
+برای هر تابع (و زنجیره‌های کامل rewrite_ai_response و super_humanize) تعداد اجرا در ثانیه (بهترین
+تکرار از --repeat) و اوج حافظه‌ی تخصیص‌یافته در یک اجرا (tracemalloc) گزارش می‌شود. random قبل از هر
+اندازه‌گیری با همان seed مقداردهی می‌شود تا مسیر تبدیل‌ها بین اجراها یکسان باشد.
+
+    python benchmarks/rewrite_bench.py
+    python benchmarks/rewrite_bench.py --functions apply_slang super_humanize --sizes 20000 --json base.json
+    python benchmarks/rewrite_bench.py --baseline base.json --tolerance 0.1
+
+با --baseline اگر ops/s کمتر یا اوج حافظه بیشتر از tolerance نسبت به نتیجه‌ی ذخیره‌شده بدتر شود،
+اسکریپت با کد 1 تمام می‌شود.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rewrite_tools
+from benchmarks.corpus import build_text, describe
+
+FUNCTIONS = [
+    "apply_slang",
+    "paraphrase_structure",
+    "simulate_typo",
+    "add_human_touch",
+    "insert_minor_irrelevance",
+    "humanize_text",
+    "super_humanize",
+    "rewrite_ai_response",
+]
+SIZES = [200, 2000, 20000]
+
+
+def measure_speed(func, text, seed, repeat):
+    timer = timeit.Timer(lambda: func(text))
+    random.seed(seed)
+    number, _ = timer.autorange()
+    best = float("inf")
+    for _ in range(repeat):
+        random.seed(seed)
+        best = min(best, timer.timeit(number) / number)
+    return 1 / best
+
+
+def measure_peak(func, text, seed):
+    random.seed(seed)
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        func(text)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def run(functions, sizes, seed, repeat):
+    results = []
+    for size in sizes:
+        text = build_text(size, seed=seed)
+        for name in functions:
+            func = getattr(rewrite_tools, name)
+            results.append({
+                "function": name,
+                "size": size,
+                "ops_per_sec": measure_speed(func, text, seed, repeat),
+                "peak_bytes": measure_peak(func, text, seed),
+            })
+    return results
+
+
+def print_results(results):
+    print(f"{'function':<26}{'chars':>7}{'ops/s':>11}{'µs/op':>11}{'peak KiB':>10}")
+    for r in results:
+        print(f"{r['function']:<26}{r['size']:>7}{r['ops_per_sec']:>11.0f}{1e6 / r['ops_per_sec']:>11.1f}"
+              f"{r['peak_bytes'] / 1024:>10.1f}")
+
+
+# 📉 مقایسه با نتیجه‌ی ذخیره‌شده؛ فهرست پسرفت‌ها و بهبودها
+def compare(results, baseline, tolerance):
+    previous = {(r["function"], r["size"]): r for r in baseline}
+    regressions = []
+    print(f"\n{'function':<26}{'chars':>7}{'ops/s':>9}{'peak':>9}")
+    for r in results:
+        old = previous.get((r["function"], r["size"]))
+        if old is None:
+            continue
+        speed = r["ops_per_sec"] / old["ops_per_sec"]
+        memory = r["peak_bytes"] / old["peak_bytes"] if old["peak_bytes"] else 1.0
+        print(f"{r['function']:<26}{r['size']:>7}{speed:>8.2f}x{memory:>8.2f}x")
+        if speed < 1 - tolerance:
+            regressions.append(f"{r['function']}@{r['size']}: ops/s {old['ops_per_sec']:.0f} → {r['ops_per_sec']:.0f}")
+        if memory > 1 + tolerance:
+            regressions.append(f"{r['function']}@{r['size']}: peak {old['peak_bytes']} → {r['peak_bytes']} bytes")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--functions", nargs="+", default=FUNCTIONS, choices=FUNCTIONS)
+    parser.add_argument("--sizes", nargs="+", type=int, default=SIZES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json")
+    parser.add_argument("--baseline")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    print(describe())
+    results = run(args.functions, args.sizes, args.seed, args.repeat)
+    print_results(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"📉 {line}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
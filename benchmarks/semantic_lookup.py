@@ -0,0 +1,77 @@
+"""زمان جست‌وجوی کش معنایی با 10 هزار، 100 هزار و 1 میلیون ورودی.
+
+ایندکس با بردارهای تصادفی نرمال پر می‌شود و پرس‌وجوها نسخه‌ی نویزدار (شباهت حدود 0.95)
+چند ورودی ذخیره‌شده‌اند؛ recall یعنی چند درصد از آن‌ها دوباره پیدا شدند.
+تا SEMANTIC_CACHE_ANN_MIN_ENTRIES جست‌وجو brute force است و بالاتر از آن LSH.
+
+    python benchmarks/semantic_lookup.py --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import semantic_cache
+from benchmarks.corpus import describe, replies
+
+
+def unit(vectors):
+    return vectors / np.linalg.norm(vectors, axis=-1, keepdims=True)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def bench_size(size, queries, noise, rng):
+    dim = semantic_cache.SEMANTIC_CACHE_DIM
+    index = semantic_cache.VectorIndex(max_entries=size)
+    expires_at = time.time() + 3600
+    start = time.perf_counter()
+    for start_row in range(0, size, 10000):
+        batch = unit(rng.standard_normal((min(10000, size - start_row), dim)).astype(np.float32))
+        for offset, vector in enumerate(batch):
+            index.add(vector, start_row + offset, expires_at)
+    fill = time.perf_counter() - start
+
+    targets = rng.integers(0, size, queries)
+    latencies, found = [], 0
+    for target in targets:
+        stored = index._vectors[target]
+        query = unit(stored + noise * unit(rng.standard_normal(dim).astype(np.float32)))
+        t = time.perf_counter()
+        _, reply = index.search(query, time.time())
+        latencies.append(time.perf_counter() - t)
+        found += reply == target
+    mode = "lsh" if index._sorted_positions is not None else "brute"
+    return mode, fill, percentile(latencies, 0.5), percentile(latencies, 0.99), found / queries
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--noise", type=float, default=0.33)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    print(describe())
+    texts = [line for _, sample in replies() for line in sample.splitlines() if line.strip()]
+    start = time.perf_counter()
+    for text in texts:
+        semantic_cache.embed(text)
+    print(f"🔢 embed: {(time.perf_counter() - start) / len(texts) * 1e6:.0f} µs برای هر جمله")
+
+    print(f"{'entries':>9}{'index':>7}{'fill s':>9}{'p50 ms':>9}{'p99 ms':>9}{'recall':>8}")
+    for size in args.sizes:
+        mode, fill, p50, p99, recall = bench_size(size, args.queries, args.noise, rng)
+        print(f"{size:>9}{mode:>7}{fill:>9.1f}{p50 * 1000:>9.2f}{p99 * 1000:>9.2f}{recall:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
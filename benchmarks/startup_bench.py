@@ -0,0 +1,100 @@
+"""زمان import ماژول‌های ورودی بات (main، webhook، sharding) با python -X importtime.
+
+هر ماژول چند بار در پروسه‌ی تازه import می‌شود (یک اجرای گرم‌کننده برای ساختن __pycache__ حساب نمی‌شود)
+و میانه‌ی جمع زمان import و زمان کل پروسه گزارش می‌شود، همراه با سنگین‌ترین بسته‌های سطح بالا و
+این‌که بسته‌های سنگین (hazm، google.generativeai، numpy) هنگام بالا آمدن بارگیری شده‌اند یا نه.
+با --rev همان اندازه‌گیری روی یک نسخه‌ی دیگر از git (مثلاً قبل از تغییر) هم انجام و کنار هم چاپ می‌شود.
+
+    python benchmarks/startup_bench.py
+    python benchmarks/startup_bench.py --modules main webhook --rev HEAD~1 --runs 7
+"""
+import argparse
+import io
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WATCHED = ["hazm", "google.generativeai", "numpy"]
+_IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)")
+
+
+def import_times(cwd, module):
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} در {cwd} ناموفق بود:\n{result.stderr[-2000:]}")
+    total, modules = 0.0, {}
+    for line in result.stderr.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if match:
+            own, cumulative, indent, name = match.groups()
+            # ماژول‌های سطح بالا یک فاصله تورفتگی دارند؛ جمع آن‌ها کل زمان import است
+            if len(indent) == 1:
+                total += int(cumulative) / 1e6
+            # زمان خود هر ماژول به بسته‌ی ریشه‌اش نسبت داده می‌شود (telegram، httpx، hazm، ...)
+            modules[name] = int(own) / 1e6
+    return wall, total, modules
+
+
+def measure(cwd, module, runs):
+    import_times(cwd, module)
+    samples = sorted((import_times(cwd, module) for _ in range(runs)), key=lambda sample: sample[1])
+    _, _, modules = samples[len(samples) // 2]
+    packages = {}
+    for name, seconds in modules.items():
+        root = name.split(".")[0]
+        packages[root] = packages.get(root, 0.0) + seconds
+    return {
+        "wall": statistics.median(wall for wall, _, _ in samples),
+        "imports": statistics.median(total for _, total, _ in samples),
+        "modules": modules,
+        "packages": packages,
+    }
+
+
+def export_revision(rev, target):
+    archive = subprocess.run(["git", "-C", ROOT, "archive", rev], capture_output=True, check=True).stdout
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(target)
+
+
+def print_result(label, module, result, top):
+    loaded = ", ".join(f"{name}={'yes' if name in result['modules'] else 'no'}" for name in WATCHED)
+    print(f"{label:<10}{module:<10}{result['imports'] * 1000:>10.0f}{result['wall'] * 1000:>10.0f}   {loaded}")
+    heaviest = sorted(result["packages"].items(), key=lambda item: item[1], reverse=True)[:top]
+    for name, seconds in heaviest:
+        if seconds:
+            print(f"{'':<20}{seconds * 1000:>10.0f}   {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modules", nargs="+", default=["main"])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--rev")
+    parser.add_argument("--top", type=int, default=8)
+    args = parser.parse_args()
+
+    trees = [("current", ROOT)]
+    with tempfile.TemporaryDirectory() as workdir:
+        if args.rev:
+            export_revision(args.rev, workdir)
+            trees.insert(0, (args.rev, workdir))
+        print(f"{'tree':<10}{'module':<10}{'import ms':>10}{'wall ms':>10}")
+        for module in args.modules:
+            for label, cwd in trees:
+                print_result(label, module, measure(cwd, module, args.runs), args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import os
+import asyncio
+from collections import deque, defaultdict
+
+# 📬 صف کار هر چت جلوی process_message؛ سیاست با CHAT_QUEUE_POLICY انتخاب می‌شود:
+#   serialize → پیام‌های یک چت به ترتیب و یکی‌یکی پردازش می‌شوند
+#   coalesce  → پیام‌هایی که وقتِ کار قبلی رسیده‌اند با هم یک پرامپت می‌شوند و یک بار جواب می‌گیرند
+#   cancel    → پیام تازه کار در جریان (و منتظرها) را لغو می‌کند؛ لغو تسک، تماس‌های HTTP را هم قطع می‌کند
+# بیش از CHAT_QUEUE_MAX_PENDING پیام منتظر در یک چت پذیرفته نمی‌شود.
+# صف‌ها درون همین پروسه‌اند: در sharding.py هر چت همیشه به یک worker می‌رسد، ولی در
+# «gunicorn webhook:app» با بیش از یک worker پیام‌های یک چت ممکن است در پروسه‌های جدا هم‌زمان اجرا شوند.
+CHAT_QUEUE_POLICY = os.getenv("CHAT_QUEUE_POLICY", "serialize")
+CHAT_QUEUE_MAX_PENDING = int(os.getenv("CHAT_QUEUE_MAX_PENDING", "5"))
+COALESCE_SEPARATOR = "\n"
+
+
+class Superseded(Exception):
+    """پیام با پیام بعدی همان چت ادغام یا به خاطر آن لغو شد."""
+
+
+class QueueFull(Exception):
+    """تعداد پیام‌های منتظر این چت از سقف گذشته است."""
+
+
+class _Entry:
+    __slots__ = ("text", "future", "task", "superseded")
+
+    def __init__(self, text):
+        self.text = text
+        self.future = asyncio.get_running_loop().create_future()
+        self.task = None
+        self.superseded = False
+
+
+class _ChatState:
+    __slots__ = ("running", "waiting")
+
+    def __init__(self):
+        self.running = None
+        self.waiting = deque()
+
+
+_chats = {}
+_stats = defaultdict(lambda: {
+    "started": 0, "queued": 0, "coalesced": 0, "cancelled": 0, "rejected": 0, "completed": 0, "max_pending": 0,
+})
+
+
+def _supersede(entry, policy, counter):
+    _stats[policy][counter] += 1
+    if not entry.future.done():
+        entry.future.set_exception(Superseded())
+
+
+# ⏭️ نوبت بعدی: در coalesce همه‌ی منتظرها در آخرین پیام ادغام می‌شوند، در بقیه اولین منتظر شروع می‌شود
+def _advance(chat_id, state, policy):
+    if not state.waiting:
+        state.running = None
+        del _chats[chat_id]
+        return
+    if policy == "coalesce":
+        entries = list(state.waiting)
+        state.waiting.clear()
+        for entry in entries[:-1]:
+            _supersede(entry, policy, "coalesced")
+        nxt, prompt = entries[-1], COALESCE_SEPARATOR.join(entry.text for entry in entries)
+    else:
+        nxt = state.waiting.popleft()
+        prompt = nxt.text
+    # پیش از بیدار شدن تسکش، همین حالا در جریان علامت می‌خورد تا پیام تازه‌ای از جلویش رد نشود
+    state.running = nxt
+    nxt.future.set_result(prompt)
+
+
+# 📥 اجرای work(prompt) با رعایت صف این چت؛ خروجی نتیجه‌ی work است
+async def submit(chat_id, text, work, policy=CHAT_QUEUE_POLICY):
+    state = _chats.get(chat_id)
+    if state is None:
+        state = _chats[chat_id] = _ChatState()
+    stats = _stats[policy]
+    entry = _Entry(text)
+
+    if policy == "cancel":
+        for waiting in state.waiting:
+            _supersede(waiting, policy, "cancelled")
+        state.waiting.clear()
+        running = state.running
+        if running is not None and running.task is not None and not running.task.done():
+            running.superseded = True
+            running.task.cancel()
+            stats["cancelled"] += 1
+
+    if state.running is None and not state.waiting:
+        state.running = entry
+        prompt = text
+    else:
+        if len(state.waiting) >= CHAT_QUEUE_MAX_PENDING:
+            stats["rejected"] += 1
+            raise QueueFull()
+        state.waiting.append(entry)
+        stats["queued"] += 1
+        stats["max_pending"] = max(stats["max_pending"], len(state.waiting))
+        try:
+            prompt = await entry.future
+        except asyncio.CancelledError:
+            # خود هندلر لغو شد (مثلاً هنگام خاموش شدن)؛ نوبتش نباید صف را قفل نگه دارد
+            if entry in state.waiting:
+                state.waiting.remove(entry)
+            elif state.running is entry:
+                _advance(chat_id, state, policy)
+            raise
+
+    stats["started"] += 1
+    try:
+        entry.task = asyncio.create_task(work(prompt))
+        try:
+            result = await entry.task
+        except asyncio.CancelledError:
+            if entry.superseded:
+                raise Superseded() from None
+            raise
+        stats["completed"] += 1
+        return result
+    finally:
+        _advance(chat_id, state, policy)
+
+
+def stats():
+    return {
+        "policy": CHAT_QUEUE_POLICY,
+        "active_chats": len(_chats),
+        "pending": sum(len(state.waiting) for state in _chats.values()),
+        "by_policy": {policy: dict(values) for policy, values in _stats.items()},
+    }
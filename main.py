@@ -1,12 +1,32 @@
 import os
-import json
+from dotenv import load_dotenv
+
+# 📦 بارگیری متغیرهای .env (پیش از import ماژول‌های محلی که تنظیماتشان را هنگام import می‌خوانند)
+load_dotenv()
+
 import asyncio
+import logging
 import random
-import re
-from rewrite_tools import rewrite_ai_response
-import requests
-from dotenv import load_dotenv
-import google.generativeai as genai
+import time
+import hashlib
+from collections import OrderedDict
+from contextlib import contextmanager
+import rewrite_executor
+from rewrite_tools import formality_score
+import httpx
+import openrouter_client
+import user_store
+import response_cache
+import semantic_cache
+import outbound
+import progress
+import chat_queue
+import model_limits
+import resilience
+import providers
+import router
+import telemetry
+from telegram_stream import ProgressiveMessage, split_text_for_telegram
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup
 from telegram.ext import (
     ApplicationBuilder,
@@ -24,143 +44,78 @@ def get_main_menu():
     ]
     return InlineKeyboardMarkup(keyboard)
 
-# 📦 بارگیری متغیرهای .env
-load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-USER_MODE_FILE = "user_modes.json"
-
-# 🔧 تنظیم Gemini
-genai.configure(api_key=GOOGLE_API_KEY)
-model = genai.GenerativeModel("deepseek/deepseek-chat-v3-0324:free")
-
-# 🧠 پیکربندی تولید محتوا
-generation_config = genai.GenerationConfig(
-    temperature=0.5,
-    top_p=0.95,
-    top_k=40,
-    max_output_tokens=2048,
-)
-
-# 🧾 مدیریت حالت کاربر
-def load_user_mode(user_id):
-    try:
-        with open(USER_MODE_FILE, "r") as f:
-            data = json.load(f)
-            return data.get(str(user_id), "gemini")
-    except:
-        return "gemini"
-
-def save_user_mode(user_id, mode):
+telemetry.setup_logging()
+log = logging.getLogger(__name__)
+# 🔀 تعداد آپدیت‌هایی که اپلیکیشن هم‌زمان پردازش می‌کند؛ بدون آن هر چت پشت پاسخ چت قبلی می‌ماند و
+# تماس‌های ناهمگام مدل‌ها فایده‌ای ندارند (1 یعنی پردازش یکی‌یکی مثل قبل)
+CONCURRENT_UPDATES = int(os.getenv("CONCURRENT_UPDATES", "256"))
+# 🏠 آدرس Bot API (برای سرور محلی Bot API یا سرور جعلی بنچمارک)، مثلاً http://127.0.0.1:8081/bot
+TELEGRAM_BASE_URL = os.getenv("TELEGRAM_BASE_URL")
+
+# 🧭 پیام‌ها در قالب chat/completions؛ مدل هر مرحله را router انتخاب می‌کند
+def chat_messages(prompt, system=None):
+    messages = [{"role": "system", "content": system}] if system else []
+    return messages + [{"role": "user", "content": prompt}]
+
+# ❌ پاسخ خطا: متنش همان‌طور به کاربر نشان داده می‌شود، ولی نوعش می‌گوید پایپ‌لاین موفق نبوده
+# (مثلاً در کش ذخیره نمی‌شود). عملیات رشته‌ای مثل strip نوع را نگه نمی‌دارند، پس پیش از آن‌ها بررسی شود.
+class FailedReply(str):
+    pass
+
+def failed(reply):
+    return isinstance(reply, FailedReply)
+
+# 🧾 مدیریت حالت هر چت (در گروه‌ها حالت مال کل چت است، نه تک‌تک اعضا)
+def load_chat_mode(chat_id):
+    return user_store.get_mode(chat_id, "gemini")
+
+def save_chat_mode(chat_id, mode):
+    user_store.set_mode(chat_id, mode)
+
+# 🔀 مسیر جایگزین وقتی مدار سرویس اصلی باز است
+async def ask_gemini_fallback(prompt, draft=None):
     try:
-        if os.path.exists(USER_MODE_FILE):
-            with open(USER_MODE_FILE, "r") as f:
-                data = json.load(f)
-        else:
-            data = {}
-        data[str(user_id)] = mode
-        with open(USER_MODE_FILE, "w") as f:
-            json.dump(data, f)
-    except Exception as e:
-        print(f"❌ خطا در ذخیره حالت کاربر: {e}")
+        if draft is not None:
+            await draft.reset()
+        return await router.complete("answer", chat_messages(prompt), draft) or FailedReply("❌ پاسخ معتبری دریافت نشد.")
+    except resilience.CircuitOpen as e:
+        return FailedReply(f"❌ سرویس‌ها فعلاً در دسترس نیستند: {e}")
 
 # 📡 تماس با OpenRouter
-def ask_openrouter(prompt):
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json"
-    }
-
+async def ask_openrouter(prompt, draft=None, fallback=True):
     system_prompt = """
     وظیفه‌ی تو پاسخ دادن به سوالات کاربر به شکل مستقیم، سریع و دقیق است.
     هیچ مقدمه، توضیح اضافی، یا جمع‌بندی ننویس.
     فقط اصل جواب را بده. از زیاده‌گویی و توضیح واضحات خودداری کن.
     """
 
-    data = {
-        "model": "deepseek/deepseek-chat-v3-0324:free",
-        "messages": [
-            {"role": "system", "content": system_prompt.strip()},
-            {"role": "user", "content": prompt}
-        ]
-    }
-
-    try:
-        res = requests.post("https://openrouter.ai/api/v1/chat/completions", headers=headers, json=data)
-        res.raise_for_status()
-        res_json = res.json()
-        if isinstance(res_json, dict) and "choices" in res_json and len(res_json["choices"]) > 0:
-            message = res_json["choices"][0].get("message", {})
-            return message.get("content", "❌ پاسخ معتبری دریافت نشد.")
-        else:
-            return f"❌ پاسخ نامعتبر از OpenRouter:\n{res_json}"
-    except requests.exceptions.RequestException as e:
-        return f"❌ خطا در ارتباط با OpenRouter: {e}"
-
-# 📡 بررسی و بازنویسی با OpenRouter
-def check_and_rewrite_openrouter(text, user_input):
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json"
-    }
-
-    check_prompt = f"""
-     کاربر: «{user_input}»
-    متن تولیدشده: «{text}»
-
-    بررسی کن که آیا این متن به اندازه کافی محاوره‌ای، صمیمی و مثل گفت‌وگوی روزمره هست یا نه.
-    اگر متن خیلی رسمی، خشک یا غیرمحاوره‌ایه، بازنویسیش کن تا:
-    - مثل یه چت دوستانه و طبیعی باشه.
-    - از عبارات محاوره‌ای، ساده و روزمره استفاده کن (مثل چیزی که تو مکالمه با رفیق می‌گی).
-    - از کلمات سنگین یا ادبی پرهیز کن.
-    اگر متن به اندازه کافی محاوره‌ای و خوبه، همون رو برگردون.
-    فقط متن نهایی (بازنویسی‌شده یا اصلی) رو بنویس.
-    """
-
-    data = {
-        "model": "google/gemini-2.0-flash-thinking-exp-1219:free",
-        "messages": [
-            {"role": "user", "content": check_prompt}
-        ]
-    }
-
     try:
-        res = requests.post("https://openrouter.ai/api/v1/chat/completions", headers=headers, json=data)
-        res.raise_for_status()
-        res_json = res.json()
-        if isinstance(res_json, dict) and "choices" in res_json and len(res_json["choices"]) > 0:
-            return res_json["choices"][0]["message"]["content"].strip()
-        return text
-    except requests.exceptions.RequestException as e:
-        print(f"❌ خطا در بررسی و بازنویسی OpenRouter: {e}")
-        return text
+        content = await router.complete("direct", chat_messages(prompt, system_prompt.strip()), draft)
+        return content or FailedReply("❌ پاسخ معتبری دریافت نشد.")
+    except resilience.CircuitOpen as e:
+        if not fallback:
+            return FailedReply(f"❌ OpenRouter فعلاً در دسترس نیست: {e}")
+        log.warning("🔀 %s؛ ادامه با Gemini", e)
+        return await ask_gemini_fallback(prompt, draft)
+    except (httpx.HTTPError, ValueError, asyncio.TimeoutError) as e:
+        return FailedReply(f"❌ خطا در ارتباط با OpenRouter: {e}")
 
 # 📡 تماس با DeepSeek
-def ask_deepseek(prompt):
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json"
-    }
-
+async def ask_deepseek(prompt, draft=None, fallback=True):
     raw_prompt = f"""
     کاربر: {prompt}
 
     لطفاً سریع و دقیق به این سوال پاسخ بده.
     از اضافه‌گویی و مقدمه‌چینی پرهیز کن. اصل مطلب رو بگو.
     """
-    data1 = {
-        "model": "deepseek/deepseek-r1:free",
-        "messages": [{"role": "user", "content": raw_prompt}]
-    }
 
     try:
-        res1 = requests.post("https://openrouter.ai/api/v1/chat/completions", headers=headers, json=data1)
-        res1.raise_for_status()
-        res_json1 = res1.json()
-        if "choices" not in res_json1 or not res_json1["choices"]:
-            return "❌ خطا در دریافت پاسخ مرحله اول از DeepSeek."
-        raw_response = res_json1["choices"][0]["message"]["content"].strip()
+        raw_response = await router.complete("reason", chat_messages(raw_prompt), draft)
+        if not raw_response:
+            return FailedReply("❌ خطا در دریافت پاسخ مرحله اول از DeepSeek.")
 
         friendly_prompt = f"""
         این پاسخ رو به زبونی خودمونی، صمیمی و انسانی بازنویسی کن. نه خیلی رسمی باشه، نه پیچیده.
@@ -169,31 +124,26 @@ def ask_deepseek(prompt):
 
         حالا جواب خودمونی رو بنویس:
         """
-        data2 = {
-            "model": "deepseek/deepseek-chat-v3-0324:free",
-            "messages": [{"role": "user", "content": friendly_prompt}]
-        }
-
-        res2 = requests.post("https://openrouter.ai/api/v1/chat/completions", headers=headers, json=data2)
-        res2.raise_for_status()
-        res_json2 = res2.json()
-        if "choices" not in res_json2 or not res_json2["choices"]:
-            return raw_response
-
-        friendly_response = res_json2["choices"][0]["message"]["content"].strip()
-        return friendly_response
-
-    except requests.exceptions.RequestException as e:
-        return f"❌ خطا در ارتباط با DeepSeek: {e}"
-
-# 📡 بررسی و بازنویسی با DeepSeek
-def check_and_rewrite_deepseek(text, user_input):
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json"
-    }
-
-    check_prompt = f"""
+        if draft is not None:
+            # پیش‌نویس از متن خام به نسخه‌ی خودمونی که در حال تولید است تغییر می‌کند
+            await draft.reset()
+        friendly_response = await router.complete("friendly", chat_messages(friendly_prompt), draft)
+        return friendly_response or raw_response
+
+    except resilience.CircuitOpen as e:
+        if not fallback:
+            return FailedReply(f"❌ DeepSeek فعلاً در دسترس نیست: {e}")
+        # 🔀 DeepSeek سالم نیست؛ همان سؤال به مسیر OpenRouter سپرده می‌شود
+        log.warning("🔀 %s؛ ادامه با OpenRouter", e)
+        if draft is not None:
+            await draft.reset()
+        return await ask_openrouter(prompt, draft)
+    except (httpx.HTTPError, ValueError, asyncio.TimeoutError) as e:
+        return FailedReply(f"❌ خطا در ارتباط با DeepSeek: {e}")
+
+# 📡 بررسی و بازنویسی محاوره‌ای (مدلش را router از بین نامزدهای مرحله‌ی check انتخاب می‌کند)
+def check_prompt_for(user_input, text):
+    return f"""
      کاربر: «{user_input}»
     متن تولیدشده: «{text}»
 
@@ -206,28 +156,102 @@ def check_and_rewrite_deepseek(text, user_input):
     فقط متن نهایی (بازنویسی‌شده یا اصلی) رو بنویس.
     """
 
-    data = {
-        "model": "deepseek/deepseek-chat-v3-0324:free",
-        "messages": [
-            {"role": "user", "content": check_prompt}
-        ]
-    }
-
+# (مرحله‌ی check اختیاری است: هر خطایی جز شلوغی/مدار باز، که conversational_check می‌شمارد، متن اصلی را برمی‌گرداند)
+async def check_and_rewrite(check_prompt, text, stage="check"):
     try:
-        res = requests.post("https://openrouter.ai/api/v1/chat/completions", headers=headers, json=data)
-        res.raise_for_status()
-        res_json = res.json()
-        if isinstance(res_json, dict) and "choices" in res_json and len(res_json["choices"]) > 0:
-            return res_json["choices"][0]["message"]["content"].strip()
+        return await router.complete(stage, chat_messages(check_prompt)) or text
+    except (model_limits.Busy, resilience.CircuitOpen):
+        raise
+    except Exception as e:
+        log.warning("❌ خطا در بررسی و بازنویسی (%s): %s", stage, e)
         return text
-    except requests.exceptions.RequestException as e:
-        print(f"❌ خطا در بررسی و بازنویسی DeepSeek: {e}")
+
+# 🗣️ مرحله‌ی «به اندازه‌ی کافی محاوره‌ای هست؟»
+# اگر امتیاز رسمی بودن محلی متن کمتر از CHECK_SKIP_BELOW_SCORE باشد تماس با مدل لازم نیست،
+# و نتیجه‌ی تماس‌ها بر اساس هش متن ورودی (برای هر سرویس جدا) در یک LRU نگه داشته می‌شود.
+CHECK_SKIP_BELOW_SCORE = int(os.getenv("CHECK_SKIP_BELOW_SCORE", "3"))
+CHECK_MEMO_SIZE = int(os.getenv("CHECK_MEMO_SIZE", "1024"))
+check_memo = OrderedDict()
+check_stats = {"skipped": 0, "memo_hits": 0, "calls": 0, "busy": 0}
+
+async def conversational_check(stage, text, run_check):
+    with telemetry.span("check", model=stage) as span:
+        return await _conversational_check(stage, text, run_check, span)
+
+async def _conversational_check(stage, text, run_check, span):
+    score, _ = formality_score(text)
+    if score < CHECK_SKIP_BELOW_SCORE:
+        check_stats["skipped"] += 1
+        span.set(kind="skipped")
+        return text
+
+    key = hashlib.sha256(f"{stage}\0{text}".encode("utf-8")).hexdigest()
+    if key in check_memo:
+        check_memo.move_to_end(key)
+        check_stats["memo_hits"] += 1
+        span.set(kind="memo")
+        return check_memo[key]
+
+    check_stats["calls"] += 1
+    span.set(kind="call")
+    progress.report("check")
+    try:
+        result = await run_check()
+    except (model_limits.Busy, resilience.CircuitOpen) as e:
+        # این مرحله اختیاری است؛ وقتی مدل شلوغ یا ناسالم است متن بدون بررسی برمی‌گردد
+        log.info("🚦 بررسی محاوره‌ای رد شد (%s)", e)
+        check_stats["busy"] += 1
+        span.set(kind="busy")
         return text
+    if result:
+        check_memo[key] = result
+        if len(check_memo) > CHECK_MEMO_SIZE:
+            check_memo.popitem(last=False)
+    return result
+
+# ✍️ بازنویسی همراه با اعلام مرحله به نشانگر پیشرفت
+async def rewrite_reply(text):
+    progress.report("rewrite")
+    with telemetry.span("rewrite", kind=rewrite_executor.REWRITE_EXECUTOR) as span:
+        result = await rewrite_executor.rewrite(text)
+        span.set(bytes=len(result.encode("utf-8")))
+    return result
+
+# ⏱️ مهلت هر سرویس در حالت ترکیبی (ثانیه)
+REFINED_OPENROUTER_DEADLINE = float(os.getenv("REFINED_OPENROUTER_DEADLINE", "25"))
+REFINED_DEEPSEEK_DEADLINE = float(os.getenv("REFINED_DEEPSEEK_DEADLINE", "40"))
+
+# ⏱️ ثبت مدت‌زمان هر مرحله: در timings (برای لاگ DEBUG همین درخواست) و به شکل span «refined» با
+# kind=نام مرحله، تا توزیع هر مرحله‌ی مسیر بحرانی در متریک‌ها (bot_stage_duration_seconds) دیده شود
+@contextmanager
+def stage_timer(timings, stage):
+    start = time.perf_counter()
+    try:
+        with telemetry.span("refined", kind=stage):
+            yield
+    finally:
+        timings[stage] = time.perf_counter() - start
+
+def format_timings(timings):
+    return ", ".join(f"{stage}={seconds:.2f}s" for stage, seconds in timings.items())
+
+# ⏳ گرفتن پاسخ یک سرویس تا پایان مهلتش؛ پس از مهلت با رشته‌ی خالی ادامه می‌دهیم
+# (اگر سرویس شلوغ باشد None برمی‌گردد تا در صورت شلوغ بودن هر دو، پیام «شلوغ است» داده شود)
+async def fetch_with_deadline(name, coro, deadline, timings):
+    with stage_timer(timings, f"fetch_{name}"):
+        try:
+            return await asyncio.wait_for(coro, timeout=deadline)
+        except asyncio.TimeoutError:
+            log.warning("⌛ مهلت %s تمام شد (%s ثانیه)؛ ادامه بدون این پاسخ.", name, deadline)
+            return ""
+        except model_limits.Busy as e:
+            log.info("🚦 %s شلوغ است (%s)؛ ادامه بدون این پاسخ.", name, e)
+            return None
 
 # 🧠 پردازش پیام متنی
-async def process_message(user_input, mode="gemini"):
+async def process_message(user_input, mode="gemini", draft=None):
     try:
-        print(f"🛠️ شروع با: {mode}")
+        log.debug("🛠️ شروع با: %s", mode)
 
         if mode == "gemini":
             prompt = f"""
@@ -237,101 +261,125 @@ async def process_message(user_input, mode="gemini"):
             لطفاً به صورت واضح، دقیق، و قابل فهم برای انسان به این سوال پاسخ بده.
             از لحن صمیمی استفاده کن و پاسخ کاربردی بده.
             """
-            print("📝 پیام ساخته شد\n", prompt)
+            log.debug("📝 پیام ساخته شد\n%s", prompt)
 
+            progress.report("model")
             try:
-                response_raw = model.generate_content(prompt, generation_config=generation_config)
-                print("✅ خروجی خام Gemini:", response_raw)
-                response = response_raw.text.strip() if response_raw and response_raw.text else ""
-                print("📤 پاسخ اولیه Gemini:", response)
+                response = await router.complete("answer", chat_messages(prompt), draft)
+                log.debug("📤 پاسخ اولیه Gemini: %s", response)
+            except resilience.CircuitOpen as e:
+                log.warning("🔀 %s؛ ادامه با OpenRouter", e)
+                if draft is not None:
+                    await draft.reset()
+                response = await ask_openrouter(user_input, draft, fallback=False)
+                if failed(response):
+                    return response
+                response = response.strip()
+            except model_limits.Busy:
+                raise
             except Exception as e:
-                print("❌ خطا در فراخوانی Gemini:", e)
-                return "❌ خطا در دریافت پاسخ از Gemini."
+                log.error("❌ خطا در فراخوانی Gemini: %s", e)
+                return FailedReply("❌ خطا در دریافت پاسخ از Gemini.")
 
             if not response:
-                return "❌ Gemini پاسخی تولید نکرد."
+                return FailedReply("❌ Gemini پاسخی تولید نکرد.")
 
             try:
-                humanized_response = rewrite_ai_response(response)
-                print("🌀 خروجی بازنویسی‌شده اولیه:", humanized_response)
+                humanized_response = await rewrite_reply(response)
+                log.debug("🌀 خروجی بازنویسی‌شده اولیه: %s", humanized_response)
             except Exception as e:
-                print("❌ خطا در بازنویسی اولیه:", e)
-                return "❌ مشکلی در بازنویسی پاسخ پیش آمد."
+                log.error("❌ خطا در بازنویسی اولیه: %s", e)
+                return FailedReply("❌ مشکلی در بازنویسی پاسخ پیش آمد.")
 
-            # بررسی و بازنویسی با Gemini
-            check_prompt = f"""
-             کاربر: «{user_input}»
-            متن تولیدشده: «{humanized_response}»
-
-            بررسی کن که آیا این متن به اندازه کافی محاوره‌ای، صمیمی و مثل گفت‌وگوی روزمره هست یا نه.
-            اگر متن خیلی رسمی، خشک یا غیرمحاوره‌ایه، بازنویسیش کن تا:
-            - مثل یه چت دوستانه و طبیعی باشه.
-            - از عبارات محاوره‌ای، ساده و روزمره استفاده کن (مثل چیزی که تو مکالمه با رفیق می‌گی).
-            - از کلمات سنگین یا ادبی پرهیز کن.
-            اگر متن به اندازه کافی محاوره‌ای و خوبه، همون رو برگردون.
-            فقط متن نهایی (بازنویسی‌شده یا اصلی) رو بنویس.
-            """
+            # بررسی و بازنویسی محاوره‌ای
+            check_prompt = check_prompt_for(user_input, humanized_response)
             try:
-                conversational_response = model.generate_content(check_prompt, generation_config=generation_config).text.strip()
-                print("📝 متن محاوره‌ای Gemini:", conversational_response)
+                conversational_response = await conversational_check(
+                    "gemini", humanized_response, lambda: check_and_rewrite(check_prompt, humanized_response)
+                )
+                log.debug("📝 متن محاوره‌ای Gemini: %s", conversational_response)
             except Exception as e:
-                print("❌ خطا در بررسی و بازنویسی Gemini:", e)
+                log.warning("❌ خطا در بررسی و بازنویسی Gemini: %s", e)
                 conversational_response = humanized_response
 
             # انسانی‌سازی نهایی
             try:
-                final_response = rewrite_ai_response(conversational_response)
-                print("🌀 خروجی بازنویسی‌شده نهایی:", final_response)
+                final_response = await rewrite_reply(conversational_response)
+                log.debug("🌀 خروجی بازنویسی‌شده نهایی: %s", final_response)
             except Exception as e:
-                print("❌ خطا در بازنویسی نهایی:", e)
+                log.error("❌ خطا در بازنویسی نهایی: %s", e)
                 final_response = conversational_response
 
             return final_response
 
         elif mode == "openrouter":
-            response = await asyncio.to_thread(ask_openrouter, user_input)
-            if "❌" in response or not response.strip():
+            progress.report("model")
+            response = await ask_openrouter(user_input, draft)
+            if failed(response):
                 return response
+            if not response.strip():
+                return FailedReply(response)
 
-            humanized_response = rewrite_ai_response(response)
-            print("🌀 خروجی بازنویسی‌شده اولیه OpenRouter:", humanized_response)
+            humanized_response = await rewrite_reply(response)
+            log.debug("🌀 خروجی بازنویسی‌شده اولیه OpenRouter: %s", humanized_response)
 
-            conversational_response = await asyncio.to_thread(check_and_rewrite_openrouter, humanized_response, user_input)
-            print("📝 متن محاوره‌ای OpenRouter:", conversational_response)
+            check_prompt = check_prompt_for(user_input, humanized_response)
+            conversational_response = await conversational_check(
+                "openrouter", humanized_response,
+                lambda: check_and_rewrite(check_prompt, humanized_response, "check_openrouter"),
+            )
+            log.debug("📝 متن محاوره‌ای OpenRouter: %s", conversational_response)
 
-            final_response = rewrite_ai_response(conversational_response)
-            print("🌀 خروجی بازنویسی‌شده نهایی OpenRouter:", final_response)
+            final_response = await rewrite_reply(conversational_response)
+            log.debug("🌀 خروجی بازنویسی‌شده نهایی OpenRouter: %s", final_response)
             return final_response
 
         elif mode == "deepseek":
-            response = await asyncio.to_thread(ask_deepseek, user_input)
-            if "❌" in response or not response.strip():
+            progress.report("model")
+            response = await ask_deepseek(user_input, draft)
+            if failed(response):
                 return response
+            if not response.strip():
+                return FailedReply(response)
 
-            humanized_response = rewrite_ai_response(response)
-            print("🌀 خروجی بازنویسی‌شده اولیه DeepSeek:", humanized_response)
+            humanized_response = await rewrite_reply(response)
+            log.debug("🌀 خروجی بازنویسی‌شده اولیه DeepSeek: %s", humanized_response)
 
-            conversational_response = await asyncio.to_thread(check_and_rewrite_deepseek, humanized_response, user_input)
-            print("📝 متن محاوره‌ای DeepSeek:", conversational_response)
+            check_prompt = check_prompt_for(user_input, humanized_response)
+            conversational_response = await conversational_check(
+                "deepseek", humanized_response,
+                lambda: check_and_rewrite(check_prompt, humanized_response, "check_deepseek"),
+            )
+            log.debug("📝 متن محاوره‌ای DeepSeek: %s", conversational_response)
 
-            final_response = rewrite_ai_response(conversational_response)
-            print("🌀 خروجی بازنویسی‌شده نهایی DeepSeek:", final_response)
+            final_response = await rewrite_reply(conversational_response)
+            log.debug("🌀 خروجی بازنویسی‌شده نهایی DeepSeek: %s", final_response)
             return final_response
 
         elif mode == "refined":
-            openrouter_resp = await asyncio.to_thread(ask_openrouter, user_input)
-            deepseek_resp = await asyncio.to_thread(ask_deepseek, user_input)
+            timings = {}
+            progress.report("model")
+            openrouter_resp, deepseek_resp = await asyncio.gather(
+                fetch_with_deadline(
+                    "openrouter", ask_openrouter(user_input, fallback=False), REFINED_OPENROUTER_DEADLINE, timings
+                ),
+                fetch_with_deadline(
+                    "deepseek", ask_deepseek(user_input, fallback=False), REFINED_DEEPSEEK_DEADLINE, timings
+                ),
+            )
 
-            print(f"📨 پاسخ OpenRouter: {openrouter_resp}")
-            print(f"📨 پاسخ DeepSeek: {deepseek_resp}")
+            log.debug("📨 پاسخ OpenRouter: %s", openrouter_resp)
+            log.debug("📨 پاسخ DeepSeek: %s", deepseek_resp)
+            if openrouter_resp is None and deepseek_resp is None:
+                raise model_limits.Busy("refined", "all providers busy")
 
-            if not openrouter_resp or "❌" in openrouter_resp:
+            if not openrouter_resp or failed(openrouter_resp):
                 openrouter_resp = ""
-            if not deepseek_resp or "❌" in deepseek_resp:
+            if not deepseek_resp or failed(deepseek_resp):
                 deepseek_resp = ""
 
             if not openrouter_resp and not deepseek_resp:
-                return "❌ هیچ پاسخی از مدل‌ها دریافت نشد. لطفاً بعداً دوباره امتحان کن."
+                return FailedReply("❌ هیچ پاسخی از مدل‌ها دریافت نشد. لطفاً بعداً دوباره امتحان کن.")
 
             responses_combined = ""
             if openrouter_resp:
@@ -355,46 +403,53 @@ async def process_message(user_input, mode="gemini"):
             """
 
             try:
-                reply = model.generate_content(merge_prompt, generation_config=generation_config).text.strip()
+                progress.report("merge")
+                with stage_timer(timings, "merge"):
+                    try:
+                        reply = await router.complete("merge", chat_messages(merge_prompt), draft)
+                    except resilience.CircuitOpen as e:
+                        # بدون Gemini ترکیبی در کار نیست؛ بهترین پاسخ موجود ادامه می‌دهد
+                        log.warning("🔀 %s؛ ادامه بدون ترکیب", e)
+                        reply = openrouter_resp or deepseek_resp
                 if not reply:
-                    return "❌ پاسخ نهایی تولید نشد."
-
-                humanized_response = rewrite_ai_response(reply)
-                print("🌀 خروجی بازنویسی‌شده اولیه Refined:", humanized_response)
-
-                check_prompt = f"""
-                 کاربر: «{user_input}»
-                متن تولیدشده: «{humanized_response}»
-
-                بررسی کن که آیا این متن به اندازه کافی محاوره‌ای، صمیمی و مثل گفت‌وگوی روزمره هست یا نه.
-                اگر متن خیلی رسمی، خشک یا غیرمحاوره‌ایه، بازنویسیش کن تا:
-                - مثل یه چت دوستانه و طبیعی باشه.
-                - از عبارات محاوره‌ای، ساده و روزمره استفاده کن (مثل چیزی که تو مکالمه با رفیق می‌گی).
-                - از کلمات سنگین یا ادبی پرهیز کن.
-                اگر متن به اندازه کافی محاوره‌ای و خوبه، همون رو برگردون.
-                فقط متن نهایی (بازنویسی‌شده یا اصلی) رو بنویس.
-                """
-                conversational_response = model.generate_content(check_prompt, generation_config=generation_config).text.strip()
-                print("📝 متن محاوره‌ای Refined:", conversational_response)
-
-                final_response = rewrite_ai_response(conversational_response)
-                print("🌀 خروجی بازنویسی‌شده نهایی Refined:", final_response)
+                    return FailedReply("❌ پاسخ نهایی تولید نشد.")
+
+                with stage_timer(timings, "rewrite_1"):
+                    humanized_response = await rewrite_reply(reply)
+                log.debug("🌀 خروجی بازنویسی‌شده اولیه Refined: %s", humanized_response)
+
+                check_prompt = check_prompt_for(user_input, humanized_response)
+                with stage_timer(timings, "check"):
+                    conversational_response = await conversational_check(
+                        "gemini", humanized_response, lambda: check_and_rewrite(check_prompt, humanized_response)
+                    )
+                log.debug("📝 متن محاوره‌ای Refined: %s", conversational_response)
+
+                with stage_timer(timings, "rewrite_2"):
+                    final_response = await rewrite_reply(conversational_response)
+                log.debug("🌀 خروجی بازنویسی‌شده نهایی Refined: %s", final_response)
+                if log.isEnabledFor(logging.DEBUG):
+                    log.debug("⏱️ زمان‌بندی مراحل Refined: %s", format_timings(timings))
                 return final_response
+            except model_limits.Busy:
+                raise
             except Exception as e:
-                print("❌ خطا از Gemini:", e)
-                return "❌ مشکلی در تولید پاسخ نهایی پیش آمد."
+                log.error("❌ خطا از Gemini: %s", e)
+                return FailedReply("❌ مشکلی در تولید پاسخ نهایی پیش آمد.")
 
+    except model_limits.Busy:
+        raise
     except Exception as e:
-        print("❌ خطا در process_message:", e)
-        return f"خطا: {str(e)}"
+        log.exception("❌ خطا در process_message: %s", e)
+        return FailedReply(f"خطا: {str(e)}")
 
 # 🧠 پردازش تصویر
 async def process_image(image_path, caption, mode="gemini"):
     try:
         if mode == "gemini":
+            progress.report("image")
             # بارگذاری تصویر
-            with open(image_path, "rb") as img_file:
-                image_data = genai.upload_file(img_file.name)
+            image_data = await providers.PROVIDERS["gemini"].upload(image_path)
             
             # تنظیم پرامپت
             prompt = f"""
@@ -404,14 +459,10 @@ async def process_image(image_path, caption, mode="gemini"):
             """
             
             # ارسال به Gemini
-            response = model.generate_content(
-                [image_data, prompt],
-                generation_config=generation_config
-            )
-            response_text = response.text.strip() if response and response.text else "❌ پاسخی دریافت نشد."
+            response_text = await router.complete("vision", chat_messages([image_data, prompt])) or "❌ پاسخی دریافت نشد."
             
             # بازنویسی پاسخ برای محاوره‌ای شدن
-            humanized_response = rewrite_ai_response(response_text)
+            humanized_response = await rewrite_reply(response_text)
             
             # بررسی و بازنویسی نهایی
             check_prompt = f"""
@@ -425,15 +476,40 @@ async def process_image(image_path, caption, mode="gemini"):
             اگر متن به اندازه کافی محاوره‌ای و خوبه، همون رو برگردون.
             فقط متن نهایی رو بنویس.
             """
-            conversational_response = model.generate_content(check_prompt, generation_config=generation_config).text.strip()
-            final_response = rewrite_ai_response(conversational_response)
+            conversational_response = await conversational_check(
+                "gemini_image", humanized_response, lambda: check_and_rewrite(check_prompt, humanized_response)
+            )
+            final_response = await rewrite_reply(conversational_response)
             return final_response
         
         else:
-            return "❌ پردازش تصویر فقط با مدل Gemini امکان‌پذیر است. لطفاً مدل Gemini را انتخاب کنید."
+            return FailedReply("❌ پردازش تصویر فقط با مدل Gemini امکان‌پذیر است. لطفاً مدل Gemini را انتخاب کنید.")
             
+    except model_limits.Busy:
+        raise
     except Exception as e:
-        return f"❌ خطا در پردازش تصویر: {str(e)}"
+        return FailedReply(f"❌ خطا در پردازش تصویر: {str(e)}")
+
+# 🌊 نمایش تدریجی پاسخ مدل به جای انیمیشن «در حال پردازش»
+STREAM_REPLIES = os.getenv("STREAM_REPLIES", "0") == "1"
+
+# 🗃️ پاسخ از کش برای سؤال‌های تکراری؛ پاسخ کش‌شده دوباره انسانی‌سازی می‌شود تا تکراری به نظر نرسد
+RESPONSE_CACHE_REHUMANIZE = os.getenv("RESPONSE_CACHE_REHUMANIZE", "1") == "1"
+
+async def cached_process_message(user_input, mode="gemini", draft=None):
+    reply = response_cache.get(user_input, mode)
+    if reply is None:
+        # 🧲 سؤال تکراری نبود؛ شاید همان سؤال با عبارت دیگری قبلاً پرسیده شده باشد
+        reply = semantic_cache.get(user_input, mode)
+    if reply is not None:
+        log.debug("🗃️ پاسخ از کش (%s)", mode)
+        return await rewrite_reply(reply) if RESPONSE_CACHE_REHUMANIZE else reply
+    reply = await process_message(user_input, mode=mode, draft=draft)
+    # فقط پاسخ موفق پایپ‌لاین ذخیره می‌شود؛ پاسخ خطا نباید تا پایان TTL به همان سؤال برگردد
+    if not failed(reply):
+        response_cache.put(user_input, mode, reply)
+        semantic_cache.put(user_input, mode, reply)
+    return reply
 
 # 🎛️ کیبورد پایین چت
 def get_persistent_keyboard():
@@ -479,13 +555,11 @@ async def show_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # ♻️ ریست
 async def reset_session(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.chat_data.clear()
+    user_store.clear_mode(update.effective_chat.id)
     await update.message.reply_text("🔄 همه چیز ریست شد. از /start یا /menu دوباره شروع کن.", reply_markup=get_persistent_keyboard())
 
 # ✅ استارت
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user_id = update.effective_user.id
-    mode = load_user_mode(user_id)
-    context.chat_data["mode"] = mode
     await update.message.reply_text("سلام! من آماده‌ام 🧠", reply_markup=get_persistent_keyboard())
     await show_mode_selection(update, context)
 
@@ -493,7 +567,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def handle_mode(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
-    user_id = query.from_user.id
+    chat_id = update.effective_chat.id
 
     if query.data == "main_menu":
         await query.edit_message_text("لطفاً یک حالت هوش مصنوعی انتخاب کنید:")
@@ -507,45 +581,82 @@ async def handle_mode(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "set_refined": "refined"
     }
     selected_mode = mode_map.get(query.data, "gemini")
-    context.chat_data["mode"] = selected_mode
-    save_user_mode(user_id, selected_mode)
+    save_chat_mode(chat_id, selected_mode)
     await query.edit_message_text(f"✅ مدل انتخاب شد: {selected_mode.upper()}")
 
-# 🛠️ تابع تقسیم متن برای تلگرام
-def split_text_for_telegram(text, max_length=4000):
-    parts = []
-    current_part = ""
-    
-    sentences = re.split(r'(?<=[.!؟])\s+', text.strip()) if text else [""]
-    
-    for sentence in sentences:
-        if len(current_part) + len(sentence) + 1 > max_length:
-            if current_part:
-                parts.append(current_part.strip())
-                current_part = sentence
-            else:
-                while len(sentence) > max_length:
-                    split_index = sentence.rfind(" ", 0, max_length - 1)
-                    if split_index == -1:
-                        split_index = max_length
-                    parts.append(sentence[:split_index].strip())
-                    sentence = sentence[split_index:].strip()
-                current_part = sentence
-        else:
-            current_part += (" " + sentence if current_part else sentence)
-    
-    if current_part:
-        parts.append(current_part.strip())
-    
-    return parts if parts else [text]
+# 🎛️ حالت فعلی چت؛ در user_store (نه chat_data) تا بعد از ری‌استارت و بین پروسه‌ها یکسان بماند
+def get_chat_mode(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    return load_chat_mode(update.effective_chat.id)
+
+# 📤 ارسال پاسخ چندتکه از طریق زمان‌بند خروجی؛ همه‌ی تکه‌ها با اولویت پاسخ نهایی و به ترتیب
+async def reply_in_parts(message, text):
+    message_parts = split_text_for_telegram(text, max_length=4000)
+    futures = []
+    for i, part in enumerate(message_parts):
+        reply_markup = get_main_menu() if i == len(message_parts) - 1 else None
+        futures.append(outbound.submit(
+            message.chat_id,
+            lambda part=part, reply_markup=reply_markup: message.reply_text(part, reply_markup=reply_markup),
+            outbound.FINAL,
+        ))
+    await asyncio.gather(*futures)
+
+# 📝 نمایش پیام وضعیت (پاسخ خالی یا خطا): به جای پیام موقت، یا اگر پیام موقتی نیست به صورت پیام تازه
+async def show_status(message, loading_message, text):
+    chat_id = message.chat_id
+    if loading_message is not None:
+        try:
+            await outbound.send(
+                chat_id,
+                lambda: loading_message.edit_text(text, reply_markup=get_main_menu()),
+                outbound.FINAL,
+                ("message", chat_id, loading_message.message_id),
+            )
+            return
+        except Exception:
+            pass
+    await outbound.send(chat_id, lambda: message.reply_text(text, reply_markup=get_main_menu()), outbound.FINAL)
+
+# 📬 متن جایگزین پیامی که با پیام بعدی ادغام یا به خاطر آن لغو شد
+def superseded_text():
+    if chat_queue.CHAT_QUEUE_POLICY == "coalesce":
+        return "🔗 این پیام همراه پیام بعدی‌ات یکجا جواب داده می‌شود."
+    return "⏹️ این درخواست لغو شد؛ به پیام جدیدت جواب می‌دم."
+
+QUEUE_FULL_TEXT = "⏳ هنوز چند پیام قبلی‌ات در صفه؛ لطفاً کمی صبر کن و دوباره بفرست."
+BUSY_TEXT = "🚦 الان سرم خیلی شلوغه! لطفاً چند دقیقه‌ی دیگه دوباره بپرس."
 
 # 💬 مدیریت پیام متنی کاربر
 async def handle_user_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_input = update.message.text
-    mode = context.chat_data.get("mode", "gemini")
+    mode = get_chat_mode(update, context)
+    chat_id = update.effective_chat.id
 
-    print(f"\n📥 پیام کاربر: {user_input}")
-    print(f"🎛️ حالت انتخاب‌شده: {mode}")
+    log.debug("📥 پیام کاربر: %s", user_input)
+    log.debug("🎛️ حالت انتخاب‌شده: %s", mode)
+
+    if STREAM_REPLIES:
+        # تا رسیدن اولین تکه‌ی متن فقط «typing» نشان داده می‌شود؛ بعد پیش‌نویس زنده جای آن را می‌گیرد
+        draft = ProgressiveMessage(update.message)
+        try:
+            with telemetry.span("request", model=mode, kind="stream"):
+                async with progress.ProgressIndicator(context.bot, chat_id):
+                    reply = await chat_queue.submit(
+                        chat_id, user_input, lambda prompt: cached_process_message(prompt, mode=mode, draft=draft)
+                    )
+            await draft.finish(reply if reply and reply.strip() else "❌ پاسخ خالی بود.", reply_markup=get_main_menu())
+        except chat_queue.Superseded:
+            await draft.finish(superseded_text())
+        except chat_queue.QueueFull:
+            await draft.finish(QUEUE_FULL_TEXT)
+        except model_limits.Busy as e:
+            log.info("🚦 درخواست رد شد: %s", e)
+            await draft.finish(BUSY_TEXT, reply_markup=get_main_menu())
+        except Exception as e:
+            error_msg = f"❌ خطا هنگام ارسال پاسخ:\n{str(e)}"
+            log.error(error_msg)
+            await draft.finish(error_msg, reply_markup=get_main_menu())
+        return
 
     loading_texts = [
         "⏳ در حال پردازش.",
@@ -556,47 +667,49 @@ async def handle_user_message(update: Update, context: ContextTypes.DEFAULT_TYPE
         "⏳ در حال پردازش.......",
         "⏳ در حال پردازش. . ."
     ]
-    loading_message = await update.message.reply_text(random.choice(loading_texts))
-
-    async def animate_loading():
-        while not context.chat_data.get("done_processing", False):
-            await asyncio.sleep(0.8)
-            try:
-                await loading_message.edit_text(random.choice(loading_texts))
-            except:
-                pass
-
-    context.chat_data["done_processing"] = False
-    loading_task = asyncio.create_task(animate_loading())
+    loading_message = None
+    if progress.PROGRESS_STYLE == "edit":
+        loading_message = await outbound.send(chat_id, lambda: update.message.reply_text(random.choice(loading_texts)))
 
     try:
-        reply = await process_message(user_input, mode=mode)
-        context.chat_data["done_processing"] = True
-        await loading_task
+        with telemetry.span("request", model=mode, kind="text"):
+            async with progress.ProgressIndicator(context.bot, chat_id, loading_message):
+                reply = await chat_queue.submit(
+                    chat_id, user_input, lambda prompt: cached_process_message(prompt, mode=mode)
+                )
 
         if reply and reply.strip():
-            await loading_message.delete()
-            message_parts = split_text_for_telegram(reply, max_length=4000)
-            for i, part in enumerate(message_parts):
-                reply_markup = get_main_menu() if i == len(message_parts) - 1 else None
-                await update.message.reply_text(part, reply_markup=reply_markup)
+            if loading_message is not None:
+                await outbound.send(
+                    chat_id, loading_message.delete, outbound.FINAL, ("message", chat_id, loading_message.message_id)
+                )
+            await reply_in_parts(update.message, reply)
         else:
-            await loading_message.edit_text("❌ پاسخ خالی بود.", reply_markup=get_main_menu())
-
+            await show_status(update.message, loading_message, "❌ پاسخ خالی بود.")
+
+    except chat_queue.Superseded:
+        if loading_message is not None:
+            await outbound.send(
+                chat_id,
+                lambda: loading_message.edit_text(superseded_text()),
+                outbound.FINAL,
+                ("message", chat_id, loading_message.message_id),
+            )
+    except chat_queue.QueueFull:
+        await show_status(update.message, loading_message, QUEUE_FULL_TEXT)
+    except model_limits.Busy as e:
+        log.info("🚦 درخواست رد شد: %s", e)
+        await show_status(update.message, loading_message, BUSY_TEXT)
     except Exception as e:
-        context.chat_data["done_processing"] = True
-        await loading_task
         error_msg = f"❌ خطا هنگام ارسال پاسخ:\n{str(e)}"
-        print(error_msg)
-        try:
-            await loading_message.edit_text(error_msg, reply_markup=get_main_menu())
-        except:
-            await update.message.reply_text(error_msg, reply_markup=get_main_menu())
+        log.error(error_msg)
+        await show_status(update.message, loading_message, error_msg)
 
 # 📷 مدیریت پیام‌های حاوی عکس
 async def handle_user_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
-    mode = context.chat_data.get("mode", "gemini")
+    mode = get_chat_mode(update, context)
+    chat_id = update.effective_chat.id
     
     photo = update.message.photo[-1]
     file = await context.bot.get_file(photo.file_id)
@@ -606,30 +719,67 @@ async def handle_user_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "⏳ لطفاً صبر کنید...",
         "⏳ پردازش در جریان است..."
     ]
-    loading_message = await update.message.reply_text(random.choice(loading_texts))
+    loading_message = None
+    if progress.PROGRESS_STYLE == "edit":
+        loading_message = await outbound.send(chat_id, lambda: update.message.reply_text(random.choice(loading_texts)))
 
     photo_path = f"temp_{user_id}_{photo.file_id}.jpg"
     try:
-        await file.download_to_drive(photo_path)
-        
-        response = await process_image(photo_path, update.message.caption or "تصویر را توصیف کن", mode)
+        with telemetry.span("request", model=mode, kind="photo"):
+            async with progress.ProgressIndicator(context.bot, chat_id, loading_message):
+                await file.download_to_drive(photo_path)
+                response = await process_image(photo_path, update.message.caption or "تصویر را توصیف کن", mode)
         
-        await loading_message.delete()
-        
-        message_parts = split_text_for_telegram(response, max_length=4000)
-        for i, part in enumerate(message_parts):
-            reply_markup = get_main_menu() if i == len(message_parts) - 1 else None
-            await update.message.reply_text(part, reply_markup=reply_markup)
+        if loading_message is not None:
+            await outbound.send(
+                chat_id, loading_message.delete, outbound.FINAL, ("message", chat_id, loading_message.message_id)
+            )
+        await reply_in_parts(update.message, response)
             
+    except model_limits.Busy as e:
+        log.info("🚦 درخواست رد شد: %s", e)
+        await show_status(update.message, loading_message, BUSY_TEXT)
     except Exception as e:
-        await loading_message.edit_text(f"❌ خطا در پردازش تصویر: {str(e)}", reply_markup=get_main_menu())
+        await show_status(update.message, loading_message, f"❌ خطا در پردازش تصویر: {str(e)}")
     finally:
         if os.path.exists(photo_path):
             os.remove(photo_path)
 
-# 🚀 اجرای بات
-async def main():
-    app = ApplicationBuilder().token(TELEGRAM_TOKEN).build()
+# 🚀 آماده‌سازی منابع مشترک پیش از اولین آپدیت
+async def on_startup(app):
+    # hazm برای نرمال‌سازی کلید کش هم لازم است؛ هم‌زمان با گرم شدن بازنویسی بارگیری می‌شود
+    await asyncio.gather(rewrite_executor.start(), asyncio.to_thread(response_cache.normalize_text, ""))
+
+# 🛑 بستن منابع مشترک هنگام خاموش شدن
+async def on_shutdown(app):
+    await openrouter_client.aclose()
+    rewrite_executor.shutdown()
+    user_store.flush()
+    log.info("🗃️ آمار کش پاسخ: %s", response_cache.stats())
+    log.info("🧲 آمار کش معنایی: %s", semantic_cache.stats())
+    log.info("🗣️ آمار مرحله‌ی بررسی محاوره‌ای: %s", check_stats)
+    log.info("📮 آمار صف ارسال: %s", outbound.stats())
+    log.info("📬 آمار صف چت‌ها: %s", chat_queue.stats())
+    log.info("🚦 آمار محدودیت مدل‌ها: %s", model_limits.stats())
+    log.info("🛡️ آمار پایداری سرویس‌ها: %s", resilience.stats())
+    log.info("🧭 آمار مسیرهای مدل: %s", router.stats())
+    response_cache.purge_expired()
+    response_cache.close()
+
+# 🧩 ساخت اپلیکیشن و ثبت هندلرها (مشترک بین polling، webhook و workerهای sharding)
+def build_application(polling=True):
+    builder = (
+        ApplicationBuilder()
+        .token(TELEGRAM_TOKEN)
+        .concurrent_updates(CONCURRENT_UPDATES)
+        .post_init(on_startup)
+        .post_shutdown(on_shutdown)
+    )
+    if TELEGRAM_BASE_URL:
+        builder = builder.base_url(TELEGRAM_BASE_URL)
+    if not polling:
+        builder = builder.updater(None)
+    app = builder.build()
     
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("menu", show_main_menu))
@@ -639,8 +789,13 @@ async def main():
     
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_user_message))
     app.add_handler(MessageHandler(filters.PHOTO, handle_user_photo))
-    
-    print("🤖 ربات شروع شد")
+    return app
+
+# 🚀 اجرای بات
+async def main():
+    app = build_application()
+    telemetry.serve_metrics()
+    log.info("🤖 ربات شروع شد")
     await app.run_polling()
 
 if __name__ == "__main__":
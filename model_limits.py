@@ -0,0 +1,152 @@
+import os
+import json
+import time
+import asyncio
+from contextlib import asynccontextmanager
+
+from outbound import TokenBucket
+
+# 🚦 محدودیت و کنترل پذیرش برای تماس با مدل‌ها (جدا برای هر نام مدل)
+# - concurrency: حداکثر تماس هم‌زمان
+# - rpm: درخواست در دقیقه، tpm: توکن در دقیقه (تخمینی)؛ صفر یعنی بدون محدودیت
+# کاری که بیش از MODEL_MAX_QUEUE تماس منتظر جلویش باشد یا تا MODEL_MAX_WAIT ثانیه نوبتش نرسد
+# فوراً با Busy رد می‌شود تا کاربر به جای timeout پیام «شلوغ است» بگیرد.
+# مقادیر پیش‌فرض با MODEL_LIMITS (JSON) قابل تغییرند، مثلاً:
+#   MODEL_LIMITS='{"deepseek/deepseek-r1:free": {"concurrency": 2, "rpm": 10}}'
+MODEL_MAX_QUEUE = int(os.getenv("MODEL_MAX_QUEUE", "32"))
+MODEL_MAX_WAIT = float(os.getenv("MODEL_MAX_WAIT", "10"))
+ESTIMATED_OUTPUT_TOKENS = int(os.getenv("ESTIMATED_OUTPUT_TOKENS", "512"))
+
+# مدل‌های رایگان OpenRouter حدود 20 درخواست در دقیقه مجازند؛ Gemini با کلید رایگان حدود 15
+DEFAULT_LIMITS = {"concurrency": 4, "rpm": 20, "tpm": 0}
+MODEL_LIMITS = {
+    os.getenv("GEMINI_MODEL", "gemini-2.0-flash"): {
+        "concurrency": int(os.getenv("GEMINI_MAX_CONCURRENCY", "8")), "rpm": 15, "tpm": 1000000,
+    },
+    "gemini_upload": {"concurrency": 4, "rpm": 0, "tpm": 0},
+    "deepseek/deepseek-r1:free": {"concurrency": 3, "rpm": 20, "tpm": 0},
+    "deepseek/deepseek-chat-v3-0324:free": {"concurrency": 4, "rpm": 20, "tpm": 0},
+    "google/gemini-2.0-flash-thinking-exp-1219:free": {"concurrency": 4, "rpm": 20, "tpm": 0},
+}
+for _name, _overrides in json.loads(os.getenv("MODEL_LIMITS", "{}")).items():
+    MODEL_LIMITS[_name] = {**MODEL_LIMITS.get(_name, DEFAULT_LIMITS), **_overrides}
+
+
+class Busy(Exception):
+    """ظرفیت مدل پر است و درخواست پذیرفته نشد."""
+
+    def __init__(self, model, reason):
+        super().__init__(f"{model}: {reason}")
+        self.model = model
+        self.reason = reason
+
+
+class ModelLimiter:
+    def __init__(self, name, concurrency=0, rpm=0, tpm=0, max_queue=MODEL_MAX_QUEUE, max_wait=MODEL_MAX_WAIT):
+        self.name = name
+        self.semaphore = asyncio.Semaphore(concurrency) if concurrency else None
+        self.requests = TokenBucket(rpm / 60, rpm) if rpm else None
+        self.tokens = TokenBucket(tpm / 60, tpm) if tpm else None
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.waiting = 0
+        self.active = 0
+        self.stats = {"admitted": 0, "rejected": 0, "waited": 0.0}
+
+    def _reject(self, reason):
+        self.stats["rejected"] += 1
+        raise Busy(self.name, reason)
+
+    # ⏳ ثانیه تا آزاد شدن سهمیه‌ی rpm/tpm برای یک درخواست با tokens توکن
+    def _rate_wait(self, now, tokens):
+        wait = self.requests.wait_time(now) if self.requests else 0.0
+        if self.tokens:
+            wait = max(wait, self.tokens.wait_time(now, min(tokens, self.tokens.capacity)))
+        return wait
+
+    # 🟢 آیا تماسی همین حالا بدون انتظار پذیرفته می‌شود؟ (برای تصمیم‌گیری درباره‌ی درخواست‌های تکراری)
+    def has_capacity(self):
+        if self.semaphore is not None and self.semaphore.locked():
+            return False
+        return self._rate_wait(time.monotonic(), 0) <= 0
+
+    async def _admit(self, tokens):
+        start = time.monotonic()
+        deadline = start + self.max_wait
+        if self.semaphore is not None:
+            try:
+                await asyncio.wait_for(self.semaphore.acquire(), timeout=self.max_wait)
+            except asyncio.TimeoutError:
+                self._reject("concurrency")
+        try:
+            while True:
+                now = time.monotonic()
+                wait = self._rate_wait(now, tokens)
+                if wait <= 0:
+                    break
+                if now + wait > deadline:
+                    self._reject("rate")
+                await asyncio.sleep(wait)
+        except BaseException:
+            if self.semaphore is not None:
+                self.semaphore.release()
+            raise
+        if self.requests:
+            self.requests.consume(now)
+        if self.tokens:
+            self.tokens.consume(now, min(tokens, self.tokens.capacity))
+        self.stats["admitted"] += 1
+        self.stats["waited"] += now - start
+
+    @asynccontextmanager
+    async def slot(self, tokens=0):
+        if self.waiting >= self.max_queue:
+            self._reject("queue")
+        self.waiting += 1
+        try:
+            await self._admit(tokens)
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            if self.semaphore is not None:
+                self.semaphore.release()
+
+
+_limiters = {}
+
+
+def limiter(model):
+    if model not in _limiters:
+        _limiters[model] = ModelLimiter(model, **MODEL_LIMITS.get(model, DEFAULT_LIMITS))
+    return _limiters[model]
+
+
+# 🔧 تغییر محدودیت یک مدل در زمان اجرا (مثلاً در بنچمارک‌ها)
+def configure(model, **limits):
+    _limiters[model] = ModelLimiter(model, **{**MODEL_LIMITS.get(model, DEFAULT_LIMITS), **limits})
+
+
+# 🎫 گرفتن نوبت تماس با model؛ اگر ظرفیت پر باشد Busy بالا می‌رود
+def slot(model, tokens=0):
+    return limiter(model).slot(tokens)
+
+
+# 🔢 تخمین تقریبی توکن‌های متن (هر ~3 نویسه یک توکن)
+def estimate_text_tokens(*texts):
+    return sum(len(text) for text in texts if isinstance(text, str)) // 3
+
+
+# 🔢 تخمین توکن‌های یک درخواست: ورودی به‌علاوه‌ی خروجی مورد انتظار
+def estimate_tokens(*texts):
+    return estimate_text_tokens(*texts) + ESTIMATED_OUTPUT_TOKENS
+
+
+def stats():
+    return {
+        name: {**item.stats, "waited": round(item.stats["waited"], 3), "waiting": item.waiting, "active": item.active}
+        for name, item in _limiters.items()
+    }
@@ -0,0 +1,94 @@
+import os
+import json
+import asyncio
+from urllib.parse import urlsplit
+
+import httpx
+
+import model_limits
+import resilience
+
+# 🌐 کلاینت HTTP مشترک برای همه‌ی تماس‌های OpenRouter
+# (OPENROUTER_URL برای هر سرویس سازگار با OpenAI، مثلاً سرور جعلی بنچمارک، قابل تغییر است)
+OPENROUTER_URL = os.getenv("OPENROUTER_URL", "https://openrouter.ai/api/v1/chat/completions")
+
+# ⚙️ تنظیمات استخر اتصال و مهلت‌ها (قابل تغییر از .env)
+OPENROUTER_POOL_SIZE = int(os.getenv("OPENROUTER_POOL_SIZE", "20"))
+OPENROUTER_KEEPALIVE = int(os.getenv("OPENROUTER_KEEPALIVE", "10"))
+OPENROUTER_MAX_PER_HOST = int(os.getenv("OPENROUTER_MAX_PER_HOST", "10"))
+OPENROUTER_CONNECT_TIMEOUT = float(os.getenv("OPENROUTER_CONNECT_TIMEOUT", "5"))
+OPENROUTER_READ_TIMEOUT = float(os.getenv("OPENROUTER_READ_TIMEOUT", "60"))
+
+_client = None
+_host_semaphores = {}
+
+
+def get_client():
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=OPENROUTER_POOL_SIZE,
+                max_keepalive_connections=OPENROUTER_KEEPALIVE,
+            ),
+            timeout=httpx.Timeout(OPENROUTER_READ_TIMEOUT, connect=OPENROUTER_CONNECT_TIMEOUT),
+            headers={
+                "Authorization": f"Bearer {os.getenv('OPENROUTER_API_KEY')}",
+                "Content-Type": "application/json",
+            },
+        )
+    return _client
+
+
+def _host_semaphore(url):
+    host = urlsplit(url).hostname
+    if host not in _host_semaphores:
+        _host_semaphores[host] = asyncio.Semaphore(OPENROUTER_MAX_PER_HOST)
+    return _host_semaphores[host]
+
+
+async def _post(model, messages, url):
+    tokens = model_limits.estimate_tokens(*(message["content"] for message in messages))
+    async with model_limits.slot(model, tokens), _host_semaphore(url):
+        res = await get_client().post(url, json={"model": model, "messages": messages})
+    res.raise_for_status()
+    return res.json()
+
+
+# 📡 ارسال یک درخواست chat/completions و برگرداندن JSON پاسخ
+# (نوبت تماس با هر مدل از model_limits گرفته می‌شود؛ اگر ظرفیت پر باشد model_limits.Busy بالا می‌رود.
+# مهلت، تلاش دوباره، hedging و قطع‌کن مدار از resilience می‌آیند)
+async def chat_completion(model, messages, url=OPENROUTER_URL):
+    return await resilience.call(model, lambda: _post(model, messages, url))
+
+
+# 🌊 نسخه‌ی جریانی (SSE با stream: true): هر تکه‌ی متن به محض رسیدن yield می‌شود
+async def stream_chat_completion(model, messages, url=OPENROUTER_URL):
+    tokens = model_limits.estimate_tokens(*(message["content"] for message in messages))
+    async with model_limits.slot(model, tokens), _host_semaphore(url):
+        payload = {"model": model, "messages": messages, "stream": True}
+        async with get_client().stream("POST", url, json=payload) as res:
+            res.raise_for_status()
+            async for line in res.aiter_lines():
+                # خط‌های خالی و کامنت‌های SSE (مثل ": OPENROUTER PROCESSING") نادیده گرفته می‌شوند
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                if "error" in chunk:
+                    raise ValueError(chunk["error"])
+                choices = chunk.get("choices") or []
+                delta = choices[0].get("delta", {}).get("content") if choices else None
+                if delta:
+                    yield delta
+
+
+# 🛑 بستن تمیز اتصال‌ها هنگام خاموش شدن بات
+async def aclose():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
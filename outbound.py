@@ -0,0 +1,243 @@
+import os
+import time
+import heapq
+import asyncio
+import logging
+import itertools
+from collections import deque
+
+from telegram.error import BadRequest, RetryAfter
+
+import telemetry
+
+# 📮 زمان‌بند مرکزی ارسال/ویرایش پیام‌های تلگرام
+# - سطل توکن سراسری و برای هر چت (محدودیت‌های flood تلگرام: حدود 30 پیام در ثانیه در کل،
+#   یک پیام در ثانیه برای هر چت و 20 پیام در دقیقه برای گروه‌ها)
+# - اولویت: پاسخ نهایی (FINAL) قبل از پیام‌های عادی و فریم‌های انیمیشن (ANIMATION)
+# - ادغام: کار جدید با همان coalesce_key کار منتظرِ قبلی (با اولویت برابر یا پایین‌تر) را حذف می‌کند،
+#   پس از فریم‌های کهنه‌ی «در حال پردازش» فقط آخرینش ارسال می‌شود
+# - RetryAfter: چت تا پایان مهلت متوقف می‌شود و همان کار دوباره در صف می‌رود
+# در هر چت فقط یک تماس هم‌زمان در جریان است تا ترتیب پیام‌ها حفظ شود.
+OUTBOUND_GLOBAL_RATE = float(os.getenv("OUTBOUND_GLOBAL_RATE", "30"))
+OUTBOUND_GLOBAL_BURST = float(os.getenv("OUTBOUND_GLOBAL_BURST", "30"))
+OUTBOUND_CHAT_RATE = float(os.getenv("OUTBOUND_CHAT_RATE", "1"))
+OUTBOUND_CHAT_BURST = float(os.getenv("OUTBOUND_CHAT_BURST", "3"))
+OUTBOUND_GROUP_RATE = float(os.getenv("OUTBOUND_GROUP_RATE", str(20 / 60)))
+OUTBOUND_MAX_ATTEMPTS = int(os.getenv("OUTBOUND_MAX_ATTEMPTS", "5"))
+
+FINAL = 0
+NORMAL = 1
+ANIMATION = 2
+PRIORITY_NAMES = {FINAL: "final", NORMAL: "normal", ANIMATION: "animation"}
+
+log = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # ⏳ چند ثانیه تا آزاد شدن amount توکن
+    def wait_time(self, now, amount=1):
+        self._refill(now)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def consume(self, now, amount=1):
+        self._refill(now)
+        self.tokens -= amount
+
+    def is_full(self, now):
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class _Job:
+    __slots__ = ("priority", "seq", "chat_id", "key", "factory", "future", "enqueued", "attempts", "dropped")
+
+    def __init__(self, priority, seq, chat_id, key, factory, future):
+        self.priority, self.seq, self.chat_id, self.key = priority, seq, chat_id, key
+        self.factory, self.future = factory, future
+        self.enqueued = time.monotonic()
+        self.attempts = 0
+        self.dropped = False
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+_seq = itertools.count()
+_pending = {}
+_by_key = {}
+_chat_buckets = {}
+_blocked_until = {}
+_inflight = set()
+_global_bucket = None
+_wakeup = None
+_dispatcher = None
+_depth = 0
+_latencies = deque(maxlen=1000)
+_stats = {"sent": 0, "coalesced": 0, "retry_after": 0, "failed": 0, "max_queue_depth": 0}
+
+
+def _chat_bucket(chat_id):
+    bucket = _chat_buckets.get(chat_id)
+    if bucket is None:
+        rate = OUTBOUND_GROUP_RATE if chat_id < 0 else OUTBOUND_CHAT_RATE
+        bucket = _chat_buckets[chat_id] = TokenBucket(rate, OUTBOUND_CHAT_BURST)
+    return bucket
+
+
+def _ensure_dispatcher():
+    global _dispatcher, _wakeup, _global_bucket
+    if _dispatcher is None or _dispatcher.done():
+        _wakeup = asyncio.Event()
+        _global_bucket = _global_bucket or TokenBucket(OUTBOUND_GLOBAL_RATE, OUTBOUND_GLOBAL_BURST)
+        _dispatcher = asyncio.create_task(_dispatch_loop())
+
+
+def _push(job):
+    global _depth
+    heapq.heappush(_pending.setdefault(job.chat_id, []), job)
+    _depth += 1
+    _stats["max_queue_depth"] = max(_stats["max_queue_depth"], _depth)
+    _wakeup.set()
+
+
+# 📤 ثبت یک تماس با API تلگرام؛ factory تابعی بدون آرگومان است که coroutine تماس را می‌سازد.
+# خروجی future نتیجه‌ی تماس است (یا None اگر کار با ادغام حذف شد).
+def submit(chat_id, factory, priority=NORMAL, coalesce_key=None):
+    global _depth
+    _ensure_dispatcher()
+    future = asyncio.get_running_loop().create_future()
+    job = _Job(priority, next(_seq), chat_id, coalesce_key, factory, future)
+    if coalesce_key is not None:
+        old = _by_key.get(coalesce_key)
+        if old is not None and not old.dropped and old.priority >= priority:
+            old.dropped = True
+            _depth -= 1
+            _stats["coalesced"] += 1
+            if not old.future.done():
+                old.future.set_result(None)
+        _by_key[coalesce_key] = job
+    _push(job)
+    return future
+
+
+async def send(chat_id, factory, priority=NORMAL, coalesce_key=None):
+    return await submit(chat_id, factory, priority, coalesce_key)
+
+
+def _next_ready(now):
+    best, wake = None, None
+    for chat_id, heap in list(_pending.items()):
+        while heap and heap[0].dropped:
+            heapq.heappop(heap)
+        if not heap:
+            del _pending[chat_id]
+            continue
+        if chat_id in _inflight:
+            continue
+        wait = max(_chat_bucket(chat_id).wait_time(now), _blocked_until.get(chat_id, 0) - now)
+        if wait > 0:
+            wake = wait if wake is None else min(wake, wait)
+        elif best is None or heap[0] < best:
+            best = heap[0]
+    return best, wake
+
+
+async def _dispatch_loop():
+    global _depth
+    while True:
+        _wakeup.clear()
+        now = time.monotonic()
+        job, wake = _next_ready(now)
+        if job is not None:
+            global_wait = _global_bucket.wait_time(now)
+            if global_wait <= 0:
+                heapq.heappop(_pending[job.chat_id])
+                _depth -= 1
+                if _by_key.get(job.key) is job:
+                    del _by_key[job.key]
+                _global_bucket.consume(now)
+                _chat_bucket(job.chat_id).consume(now)
+                _inflight.add(job.chat_id)
+                asyncio.create_task(_run(job))
+                continue
+            wake = global_wait if wake is None else min(wake, global_wait)
+        if len(_chat_buckets) > 10000:
+            for chat_id in [c for c, b in _chat_buckets.items() if c not in _pending and b.is_full(now)]:
+                del _chat_buckets[chat_id]
+                _blocked_until.pop(chat_id, None)
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=wake)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def _run(job):
+    try:
+        job.attempts += 1
+        with telemetry.span("telegram_send", kind=PRIORITY_NAMES[job.priority]):
+            result = await job.factory()
+    except RetryAfter as e:
+        _stats["retry_after"] += 1
+        _blocked_until[job.chat_id] = time.monotonic() + float(e.retry_after)
+        log.warning("🚦 RetryAfter برای چت %s: %s ثانیه", job.chat_id, e.retry_after)
+        if job.key is not None and _by_key.get(job.key) not in (None, job):
+            # در این فاصله نسخه‌ی تازه‌تری با همان کلید در صف آمده؛ این یکی کهنه است
+            _stats["coalesced"] += 1
+            job.future.set_result(None)
+        elif job.attempts < OUTBOUND_MAX_ATTEMPTS:
+            if job.key is not None:
+                _by_key[job.key] = job
+            _push(job)
+        else:
+            _fail(job, e)
+    except Exception as e:
+        _fail(job, e)
+    else:
+        _stats["sent"] += 1
+        _latencies.append(time.monotonic() - job.enqueued)
+        if not job.future.done():
+            job.future.set_result(result)
+    finally:
+        _inflight.discard(job.chat_id)
+        _wakeup.set()
+
+
+def _fail(job, error):
+    if isinstance(error, BadRequest) and "not modified" in str(error).lower():
+        if not job.future.done():
+            job.future.set_result(None)
+        return
+    _stats["failed"] += 1
+    if job.future.done():
+        return
+    if job.priority == ANIMATION:
+        # فریم انیمیشن مهم نیست؛ خطایش فقط ثبت می‌شود (مثلاً پیامی که دیگر وجود ندارد)
+        log.info("⚠️ ویرایش انیمیشن انجام نشد: %s", error)
+        job.future.set_result(None)
+    else:
+        job.future.set_exception(error)
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+
+def stats():
+    return {
+        **_stats,
+        "queue_depth": _depth,
+        "inflight": len(_inflight),
+        "latency_p50": round(_percentile(_latencies, 0.5), 3),
+        "latency_p99": round(_percentile(_latencies, 0.99), 3),
+    }
@@ -0,0 +1,93 @@
+import os
+import asyncio
+import contextvars
+
+from telegram.constants import ChatAction
+
+import outbound
+
+# ⏳ نشانگر پیشرفت هر درخواست (جدا از درخواست‌های دیگر همان چت)
+#   PROGRESS_STYLE=edit   → پیام «در حال پردازش» فقط وقتی مرحله‌ی واقعی پایپ‌لاین عوض می‌شود ویرایش می‌شود
+#   PROGRESS_STYLE=typing → بدون پیام موقت؛ فقط وضعیت «typing» هر چند ثانیه یک بار تمدید می‌شود
+# پایپ‌لاین با report(stage) مرحله را اعلام می‌کند؛ نشانگر فعال از طریق contextvar پیدا می‌شود،
+# پس لازم نیست به تک‌تک توابع پاس داده شود.
+PROGRESS_STYLE = os.getenv("PROGRESS_STYLE", "edit")
+TYPING_INTERVAL = float(os.getenv("TYPING_INTERVAL", "4.5"))
+
+STAGE_TEXTS = {
+    "model": "🔎 در حال گرفتن پاسخ از مدل...",
+    "image": "🖼️ در حال بررسی تصویر...",
+    "merge": "🧪 در حال ترکیب پاسخ‌ها...",
+    "rewrite": "✍️ در حال بازنویسی پاسخ...",
+    "check": "🗣️ در حال بررسی لحن پاسخ...",
+}
+
+_current = contextvars.ContextVar("progress_indicator", default=None)
+
+
+class ProgressIndicator:
+    """با async with فعال می‌شود و با خروج از بلوک (یا لغو تسک) بدون هیچ فلگ مشترکی متوقف می‌شود."""
+
+    def __init__(self, bot, chat_id, message=None, style=PROGRESS_STYLE):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.message = message
+        self.style = style if message is not None else "typing"
+        self.stage = None
+        self._changed = asyncio.Event()
+        self._stopped = asyncio.Event()
+        self._task = None
+        self._token = None
+
+    async def __aenter__(self):
+        self._token = _current.set(self)
+        loop = self._typing_loop() if self.style == "typing" else self._edit_loop()
+        self._task = asyncio.create_task(loop)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        _current.reset(self._token)
+        await self.stop()
+
+    def set_stage(self, stage):
+        if stage != self.stage:
+            self.stage = stage
+            self._changed.set()
+
+    async def stop(self):
+        self._stopped.set()
+        self._changed.set()
+        if self._task is not None:
+            await self._task
+
+    async def _edit_loop(self):
+        key = ("message", self.chat_id, self.message.message_id)
+        while True:
+            await self._changed.wait()
+            self._changed.clear()
+            if self._stopped.is_set():
+                return
+            text = STAGE_TEXTS.get(self.stage)
+            if text:
+                # منتظر نمی‌مانیم؛ اگر مرحله‌ی بعدی زودتر برسد همین ویرایش در صف outbound جایگزین می‌شود
+                outbound.submit(self.chat_id, lambda text=text: self.message.edit_text(text), outbound.ANIMATION, key)
+
+    async def _typing_loop(self):
+        while not self._stopped.is_set():
+            outbound.submit(
+                self.chat_id,
+                lambda: self.bot.send_chat_action(self.chat_id, ChatAction.TYPING),
+                outbound.ANIMATION,
+                ("typing", self.chat_id),
+            )
+            try:
+                await asyncio.wait_for(self._stopped.wait(), timeout=TYPING_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+
+# 📍 اعلام مرحله‌ی فعلی پایپ‌لاین به نشانگر همین درخواست (اگر نشانگری فعال نباشد کاری نمی‌کند)
+def report(stage):
+    indicator = _current.get()
+    if indicator is not None:
+        indicator.set_stage(stage)
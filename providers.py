@@ -0,0 +1,140 @@
+import os
+import asyncio
+
+import model_limits
+import resilience
+import openrouter_client
+import telemetry
+
+# 🔌 سرویس‌دهنده‌های مدل با یک رابط مشترک:
+#   complete(model, messages)        → متن کامل پاسخ
+#   stream(model, messages, draft)   → هر تکه به پیش‌نویس داده می‌شود و متن کامل برمی‌گردد
+# messages همان قالب chat/completions است ([{"role": ..., "content": ...}])؛ Gemini در content
+# فهرست اجزا (مثلاً تصویر آپلودشده و متن) را هم می‌پذیرد.
+# مسیرها به شکل "provider:model" نوشته می‌شوند، مثلاً "openrouter:deepseek/deepseek-r1:free".
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+STUB_LATENCY = float(os.getenv("STUB_LATENCY", "0.5"))
+STUB_REPLY = os.getenv("STUB_REPLY", "")
+
+# 🧠 پیکربندی تولید محتوا (SDK همان dict را به جای GenerationConfig می‌پذیرد)
+generation_config = dict(
+    temperature=0.5,
+    top_p=0.95,
+    top_k=40,
+    max_output_tokens=2048,
+)
+
+
+# 📦 SDK جمینای (و gRPC/protobufش) سنگین‌ترین import بات است؛ با اولین تماس Gemini بارگیری می‌شود
+def _genai():
+    import google.generativeai as genai
+    return genai
+
+
+def _estimate(messages):
+    return model_limits.estimate_tokens(*(message["content"] for message in messages))
+
+
+class GeminiProvider:
+    name = "gemini"
+
+    def __init__(self):
+        self.models = {}
+        self._configured = False
+
+    def model(self, name):
+        if name not in self.models:
+            genai = _genai()
+            if not self._configured:
+                genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+                self._configured = True
+            self.models[name] = genai.GenerativeModel(name)
+        return self.models[name]
+
+    # پیام سیستمی و کاربر در Gemini یک متن می‌شوند؛ پیام تکی (مثلاً [تصویر، متن]) همان‌طور فرستاده می‌شود
+    @staticmethod
+    def contents(messages):
+        if len(messages) == 1:
+            return messages[0]["content"]
+        return "\n\n".join(message["content"] for message in messages)
+
+    async def _generate(self, model, contents, tokens):
+        async with model_limits.slot(model, tokens):
+            return await self.model(model).generate_content_async(contents, generation_config=generation_config)
+
+    async def complete(self, model, messages):
+        contents, tokens = self.contents(messages), _estimate(messages)
+        response = await resilience.call(model, lambda: self._generate(model, contents, tokens))
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            telemetry.annotate(tokens_in=usage.prompt_token_count, tokens_out=usage.candidates_token_count)
+        return response.text.strip() if response and response.text else ""
+
+    async def stream(self, model, messages, draft):
+        parts = []
+        async with resilience.guarded(model), model_limits.slot(model, _estimate(messages)):
+            response = await self.model(model).generate_content_async(
+                self.contents(messages), generation_config=generation_config, stream=True
+            )
+            async for chunk in response:
+                if chunk.text:
+                    parts.append(chunk.text)
+                    await draft.append(chunk.text)
+        return "".join(parts).strip()
+
+    # 🖼️ بارگذاری فایل (تابع همگام SDK در thread جدا و با سقف هم‌زمانی خودش)
+    async def upload(self, path):
+        self.model(GEMINI_MODEL)
+        async with model_limits.slot("gemini_upload"):
+            return await asyncio.to_thread(_genai().upload_file, path)
+
+
+class OpenRouterProvider:
+    name = "openrouter"
+
+    async def complete(self, model, messages):
+        res_json = await openrouter_client.chat_completion(model, messages)
+        choices = res_json.get("choices") if isinstance(res_json, dict) else None
+        if not choices:
+            raise ValueError(f"پاسخ نامعتبر از OpenRouter: {res_json}")
+        usage = res_json.get("usage")
+        if usage:
+            telemetry.annotate(tokens_in=usage.get("prompt_tokens"), tokens_out=usage.get("completion_tokens"))
+        return (choices[0].get("message", {}).get("content") or "").strip()
+
+    async def stream(self, model, messages, draft):
+        parts = []
+        async with resilience.guarded(model):
+            async for delta in openrouter_client.stream_chat_completion(model, messages):
+                parts.append(delta)
+                await draft.append(delta)
+        return "".join(parts).strip()
+
+
+class StubProvider:
+    """مدل محلی برای اجرا بدون کلید و شبکه: بعد از STUB_LATENCY ثانیه STUB_REPLY (یا خود پیام کاربر) را برمی‌گرداند."""
+
+    name = "stub"
+
+    def reply(self, model, messages):
+        return STUB_REPLY or f"[{model}] {messages[-1]['content']}"
+
+    async def complete(self, model, messages):
+        await asyncio.sleep(STUB_LATENCY)
+        return self.reply(model, messages)
+
+    async def stream(self, model, messages, draft):
+        words = self.reply(model, messages).split(" ")
+        for i, word in enumerate(words):
+            await asyncio.sleep(STUB_LATENCY / len(words))
+            await draft.append(word if i == 0 else " " + word)
+        return " ".join(words)
+
+
+PROVIDERS = {provider.name: provider for provider in (GeminiProvider(), OpenRouterProvider(), StubProvider())}
+
+
+# 🔎 "provider:model" → (سرویس‌دهنده، نام مدل)
+def resolve(route):
+    provider, model = route.split(":", 1)
+    return PROVIDERS[provider], model
@@ -0,0 +1,83 @@
+"""ارسال آپدیت‌های ضبط‌شده به وب‌هوک محلی برای تست.
+
+    python replay_updates.py updates.jsonl --url http://127.0.0.1:8080/webhook --secret s3cret
+    python replay_updates.py --sample 50 --concurrency 10
+
+فایل ورودی در هر خط یک آپدیت JSON تلگرام دارد (همان چیزی که getUpdates یا لاگ وب‌هوک برمی‌گرداند).
+با --sample به‌جای فایل، پیام‌های متنی ساختگی از چند چت مختلف ساخته می‌شوند.
+"""
+import argparse
+import json
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def sample_updates(count, chats=5):
+    now = int(time.time())
+    for i in range(count):
+        chat_id = 100000 + i % chats
+        yield {
+            "update_id": 1000 + i,
+            "message": {
+                "message_id": i + 1,
+                "date": now,
+                "chat": {"id": chat_id, "type": "private", "first_name": "Test"},
+                "from": {"id": chat_id, "is_bot": False, "first_name": "Test"},
+                "text": f"سلام، سوال شماره {i} رو جواب بده",
+            },
+        }
+
+
+def load_updates(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def post_update(url, secret, update):
+    body = json.dumps(update).encode("utf-8")
+    req = urllib.request.Request(url, data=body, method="POST", headers={"Content-Type": "application/json"})
+    if secret:
+        req.add_header("X-Telegram-Bot-Api-Secret-Token", secret)
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=10) as res:
+            status = res.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except urllib.error.URLError as e:
+        status = f"error: {e.reason}"
+    return status, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path", nargs="?")
+    parser.add_argument("--url", default="http://127.0.0.1:8080/webhook")
+    parser.add_argument("--secret")
+    parser.add_argument("--sample", type=int, default=0)
+    parser.add_argument("--concurrency", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.path:
+        updates = load_updates(args.path)
+    else:
+        updates = list(sample_updates(args.sample or 10))
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(lambda u: post_update(args.url, args.secret, u), updates))
+
+    statuses = {}
+    for status, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    latencies = sorted(latency for _, latency in results)
+    print(f"📤 {len(results)} آپدیت ارسال شد: {statuses}")
+    if latencies:
+        p50 = latencies[len(latencies) // 2]
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        print(f"⏱️ p50={p50 * 1000:.1f}ms p99={p99 * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+import os
+import time
+import random
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+
+import logging
+
+import httpx
+
+import model_limits
+
+# 🛡️ لایه‌ی پایداری دور تماس با سرویس‌های مدل (کلید هر تماس همان نام مدل در model_limits است)
+# - مهلت هر تلاش: UPSTREAM_TIMEOUT، با مقدار جدا برای هر مدل در UPSTREAM_TIMEOUTS
+# - تلاش دوباره روی 429/5xx، قطعی شبکه و timeout با عقب‌نشینی نمایی و jitter (یا Retry-After سرور)
+# - hedging: اگر پاسخ از p95 تأخیرهای اخیر همان مدل دیرتر شد و ظرفیت آزاد بود، یک درخواست
+#   تکراری هم فرستاده می‌شود و اولین پاسخ موفق برنده است
+# - قطع‌کن مدار: بعد از BREAKER_FAILURES خطای پشت سر هم، تا BREAKER_COOLDOWN ثانیه تماس‌ها
+#   فوراً با CircuitOpen رد می‌شوند (تا فراخوان بتواند سراغ سرویس دیگری برود)، بعد یک تماس آزمایشی
+UPSTREAM_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", "30"))
+# مثلاً "deepseek/deepseek-r1:free=60,gemini-2.0-flash=20"
+UPSTREAM_TIMEOUTS = {
+    "deepseek/deepseek-r1:free": 60.0,
+    **{
+        key.strip(): float(value)
+        for key, value in (
+            item.rsplit("=", 1) for item in os.getenv("UPSTREAM_TIMEOUTS", "").split(",") if "=" in item
+        )
+    },
+}
+UPSTREAM_RETRIES = int(os.getenv("UPSTREAM_RETRIES", "2"))
+BACKOFF_BASE = float(os.getenv("BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.getenv("BACKOFF_MAX", "8"))
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "1") == "1"
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "1"))
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "30"))
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class CircuitOpen(Exception):
+    """مدار این سرویس باز است؛ تماس انجام نشد."""
+
+    def __init__(self, key):
+        super().__init__(f"{key}: circuit open")
+        self.key = key
+
+
+class CircuitBreaker:
+    def __init__(self, failures=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN):
+        self.threshold = failures
+        self.cooldown = cooldown
+        self.failures = 0
+        self.open_until = 0.0
+
+    # ✅ آیا تماس مجاز است؟ پس از پایان مهلت فقط یک تماس آزمایشی رد می‌شود و مهلت دوباره شروع می‌شود
+    def allow(self):
+        if self.failures < self.threshold:
+            return True
+        now = time.monotonic()
+        if now >= self.open_until:
+            self.open_until = now + self.cooldown
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.open_until = 0.0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures == self.threshold:
+            self.open_until = time.monotonic() + self.cooldown
+
+    @property
+    def state(self):
+        if self.failures < self.threshold:
+            return "closed"
+        return "open" if time.monotonic() < self.open_until else "half_open"
+
+
+log = logging.getLogger(__name__)
+_breakers = {}
+_latencies = {}
+_stats = {}
+
+
+def breaker(key):
+    if key not in _breakers:
+        _breakers[key] = CircuitBreaker()
+    return _breakers[key]
+
+
+def is_open(key):
+    return breaker(key).state == "open"
+
+
+def _key_stats(key):
+    if key not in _stats:
+        _stats[key] = {"calls": 0, "retries": 0, "timeouts": 0, "hedged": 0, "hedge_wins": 0, "short_circuited": 0}
+    return _stats[key]
+
+
+def timeout_for(key):
+    return UPSTREAM_TIMEOUTS.get(key, UPSTREAM_TIMEOUT)
+
+
+def status_of(error):
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code
+    # خطاهای google.api_core کد HTTP را در code نگه می‌دارند
+    code = getattr(error, "code", None)
+    return code if isinstance(code, int) else None
+
+
+def is_retryable(error):
+    if isinstance(error, (asyncio.TimeoutError, httpx.TransportError)):
+        return True
+    return status_of(error) in RETRYABLE_STATUS
+
+
+def retry_delay(error, attempt):
+    if isinstance(error, httpx.HTTPStatusError):
+        retry_after = error.response.headers.get("retry-after")
+        if retry_after and retry_after.replace(".", "", 1).isdigit():
+            return min(BACKOFF_MAX, float(retry_after))
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+# ⏱️ تأخیر hedging: p95 تأخیر تماس‌های موفق اخیر (تا نمونه‌ی کافی جمع نشده hedging انجام نمی‌شود)
+def hedge_delay(key):
+    samples = _latencies.get(key)
+    if not samples or len(samples) < HEDGE_MIN_SAMPLES:
+        return None
+    ordered = sorted(samples)
+    return max(HEDGE_MIN_DELAY, ordered[int(len(ordered) * 0.95) - 1])
+
+
+async def _attempt(key, factory, timeout):
+    start = time.monotonic()
+    result = await asyncio.wait_for(factory(), timeout=timeout)
+    _latencies.setdefault(key, deque(maxlen=200)).append(time.monotonic() - start)
+    return result
+
+
+async def _hedged(key, factory, timeout):
+    delay = hedge_delay(key)
+    primary = asyncio.create_task(_attempt(key, factory, timeout))
+    if delay is None:
+        return await primary
+    hedge = None
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done or not model_limits.limiter(key).has_capacity():
+            return await primary
+        _key_stats(key)["hedged"] += 1
+        hedge = asyncio.create_task(_attempt(key, factory, timeout))
+        pending, error = {primary, hedge}, None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        _key_stats(key)["hedge_wins"] += 1
+                    return task.result()
+                if task is primary or error is None:
+                    error = task.exception()
+        raise error
+    finally:
+        for task in (primary, hedge):
+            if task is not None and not task.done():
+                task.cancel()
+
+
+# 📞 اجرای factory() (تابعی که coroutine تماس را می‌سازد) با مهلت، تلاش دوباره، hedging و قطع‌کن مدار
+async def call(key, factory, timeout=None, retries=UPSTREAM_RETRIES, hedge=HEDGE_ENABLED):
+    circuit = breaker(key)
+    stats = _key_stats(key)
+    timeout = timeout or timeout_for(key)
+    stats["calls"] += 1
+    for attempt in range(retries + 1):
+        if not circuit.allow():
+            stats["short_circuited"] += 1
+            raise CircuitOpen(key)
+        try:
+            result = await (_hedged(key, factory, timeout) if hedge else _attempt(key, factory, timeout))
+        except model_limits.Busy:
+            # شلوغی سمت خود ما نشانه‌ی خرابی سرویس نیست
+            raise
+        except Exception as e:
+            # خطای دائمی (مثلاً 400 یا کلید نامعتبر 401/403) نه سلامت سرویس را نشان می‌دهد نه قطعی گذرا؛
+            # شمارنده‌ی قطع‌کن مدار دست نمی‌خورد
+            if not is_retryable(e):
+                raise
+            if isinstance(e, asyncio.TimeoutError):
+                stats["timeouts"] += 1
+            circuit.record_failure()
+            if attempt == retries:
+                raise
+            stats["retries"] += 1
+            delay = retry_delay(e, attempt)
+            log.warning("🔁 تلاش دوباره برای %s پس از %.1f ثانیه (%s: %s)", key, delay, type(e).__name__, e)
+            await asyncio.sleep(delay)
+        else:
+            circuit.record_success()
+            return result
+
+
+# 🌊 برای تماس‌های جریانی فقط قطع‌کن مدار اعمال می‌شود (متن نیمه‌کاره‌ی پیش‌نویس را نمی‌شود دوباره فرستاد)
+@asynccontextmanager
+async def guarded(key):
+    circuit = breaker(key)
+    if not circuit.allow():
+        _key_stats(key)["short_circuited"] += 1
+        raise CircuitOpen(key)
+    try:
+        yield
+    except model_limits.Busy:
+        raise
+    except Exception as e:
+        if is_retryable(e):
+            circuit.record_failure()
+        raise
+    else:
+        circuit.record_success()
+
+
+def stats():
+    return {
+        key: {**values, "breaker": breaker(key).state, "hedge_delay": round(hedge_delay(key) or 0.0, 3)}
+        for key, values in _stats.items()
+    }
@@ -0,0 +1,142 @@
+import os
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+
+# 🗃️ کش پاسخ‌ها: کلید = متن نرمال‌شده‌ی کاربر + حالت مدل
+# لایه‌ی اول LRU در حافظه با TTL و سقف حجم؛ لایه‌ی دوم (اختیاری) SQLite روی دیسک که بعد از ری‌استارت
+# و بین چند پروسه هم معتبر می‌ماند. با RESPONSE_CACHE_DB خالی لایه‌ی دیسک خاموش است.
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "1") == "1"
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+RESPONSE_CACHE_DB = os.getenv("RESPONSE_CACHE_DB", "")
+
+log = logging.getLogger(__name__)
+_lock = threading.Lock()
+_entries = OrderedDict()
+_size = 0
+_normalizer = None
+_db = None
+_stats = {"hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0}
+
+
+# ✏️ نرمال‌سازی hazm (نویسه‌های عربی/فارسی، نیم‌فاصله، فاصله‌ها) و یکسان‌سازی فاصله‌ها
+# (hazm با اولین پیام import می‌شود، نه هنگام بالا آمدن بات)
+def normalize_text(text):
+    global _normalizer
+    if _normalizer is None:
+        from hazm import Normalizer
+        _normalizer = Normalizer()
+    return " ".join(_normalizer.normalize(text).split())
+
+
+# 🔑 کلید کش
+def make_key(user_input, mode):
+    return hashlib.sha256(f"{mode}\0{normalize_text(user_input)}".encode("utf-8")).hexdigest()
+
+
+def _entry_size(key, reply):
+    return len(key) + len(reply.encode("utf-8"))
+
+
+def _get_db():
+    global _db
+    if _db is None and RESPONSE_CACHE_DB:
+        _db = sqlite3.connect(RESPONSE_CACHE_DB, check_same_thread=False, isolation_level=None)
+        _db.execute("PRAGMA journal_mode=WAL")
+        _db.execute("PRAGMA synchronous=NORMAL")
+        _db.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, reply TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+    return _db
+
+
+def _remember(key, reply, expires_at):
+    global _size
+    old = _entries.pop(key, None)
+    if old is not None:
+        _size -= _entry_size(key, old[1])
+    _entries[key] = (expires_at, reply)
+    _size += _entry_size(key, reply)
+    while _size > RESPONSE_CACHE_MAX_BYTES and _entries:
+        old_key, (_, old_reply) = _entries.popitem(last=False)
+        _size -= _entry_size(old_key, old_reply)
+        _stats["evictions"] += 1
+
+
+# 🔍 خواندن از کش؛ None یعنی باید پاسخ را از مدل گرفت
+def get(user_input, mode):
+    global _size
+    if not RESPONSE_CACHE_ENABLED:
+        return None
+    key = make_key(user_input, mode)
+    now = time.time()
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                _entries.move_to_end(key)
+                _stats["hits"] += 1
+                return entry[1]
+            del _entries[key]
+            _size -= _entry_size(key, entry[1])
+            _stats["expired"] += 1
+
+        db = _get_db()
+        if db is not None:
+            row = db.execute(
+                "SELECT reply, expires_at FROM responses WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is not None:
+                _remember(key, row[0], row[1])
+                _stats["disk_hits"] += 1
+                return row[0]
+
+        _stats["misses"] += 1
+        return None
+
+
+# 💾 ذخیره‌ی پاسخ (فراخوان فقط پاسخ موفق پایپ‌لاین را می‌دهد؛ main.failed)
+def put(user_input, mode, reply):
+    if not RESPONSE_CACHE_ENABLED or not reply or not reply.strip():
+        return
+    key = make_key(user_input, mode)
+    expires_at = time.time() + RESPONSE_CACHE_TTL
+    with _lock:
+        _remember(key, reply, expires_at)
+        _stats["stores"] += 1
+        db = _get_db()
+        if db is not None:
+            try:
+                db.execute(
+                    "INSERT OR REPLACE INTO responses (key, reply, expires_at) VALUES (?, ?, ?)",
+                    (key, reply, expires_at),
+                )
+            except sqlite3.Error as e:
+                log.warning("❌ خطا در ذخیره‌ی کش روی دیسک: %s", e)
+
+
+# 🧹 پاک کردن ردیف‌های منقضی‌شده‌ی SQLite (مثلاً هنگام خاموش شدن)
+def purge_expired():
+    with _lock:
+        db = _get_db()
+        if db is not None:
+            db.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+
+
+def stats():
+    with _lock:
+        lookups = _stats["hits"] + _stats["disk_hits"] + _stats["misses"]
+        hit_rate = (_stats["hits"] + _stats["disk_hits"]) / lookups if lookups else 0.0
+        return {**_stats, "entries": len(_entries), "bytes": _size, "hit_rate": round(hit_rate, 3)}
+
+
+def close():
+    global _db
+    with _lock:
+        if _db is not None:
+            _db.close()
+            _db = None
@@ -0,0 +1,92 @@
+import os
+import sys
+import types
+import asyncio
+import threading
+from multiprocessing.context import SpawnContext, SpawnProcess
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import rewrite_tools
+
+# 🧵 اجرای rewrite_ai_response بیرون از event loop
+#   REWRITE_EXECUTOR=inline  → مثل قبل، مستقیم روی loop
+#   REWRITE_EXECUTOR=thread  → در thread pool (پیش‌فرض؛ loop آزاد می‌ماند ولی GIL همچنان مشترک است)
+#   REWRITE_EXECUTOR=process → در process pool با workerهای گرم
+# در benchmarks/loop_lag.py (۱۶ چت، متن ۲۰k) process تأخیر loop را کمی کمتر می‌کند ولی کل کار را کندتر تمام
+# می‌کند و هر worker حافظه‌ی جدا دارد؛ پس process فقط وقتی ارزش دارد که چند هسته‌ی آزاد باشد.
+# متن‌های کوتاه‌تر از REWRITE_OFFLOAD_MIN_CHARS همیشه inline اجرا می‌شوند؛ هزینه‌ی ارسال به pool از خود کار بیشتر است.
+REWRITE_EXECUTOR = os.getenv("REWRITE_EXECUTOR", "thread")
+REWRITE_OFFLOAD_MIN_CHARS = int(os.getenv("REWRITE_OFFLOAD_MIN_CHARS", "400"))
+REWRITE_POOL_SIZE = int(os.getenv("REWRITE_POOL_SIZE", str(min(4, os.cpu_count() or 1))))
+
+_executor = None
+_spawn_lock = threading.Lock()
+
+
+# 🔥 گرم کردن worker: rewrite_tools، الگوهای کامپایل‌شده‌اش و اشیای hazm یک بار در هر پروسه بارگیری می‌شوند
+def _warm_up():
+    rewrite_tools.warm_up()
+
+
+class _WorkerProcess(SpawnProcess):
+    """پروسه‌ی spawn که اسکریپت اصلی (مثلاً main.py و کل بات) را در worker دوباره اجرا نمی‌کند."""
+
+    @staticmethod
+    def _Popen(process_obj):
+        # spawn مسیر __main__ را می‌فرستد تا فرزند آن را دوباره اجرا کند؛ worker فقط rewrite_tools را
+        # لازم دارد، پس هنگام ساختن پروسه __main__ یک ماژول خالی است
+        with _spawn_lock:
+            main_module = sys.modules["__main__"]
+            sys.modules["__main__"] = types.ModuleType("__main__")
+            try:
+                return SpawnProcess._Popen(process_obj)
+            finally:
+                sys.modules["__main__"] = main_module
+
+
+class _WorkerContext(SpawnContext):
+    Process = _WorkerProcess
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        if REWRITE_EXECUTOR == "process":
+            # spawn تا کلاینت‌ها و threadهای پروسه‌ی اصلی (gRPC جمینای، httpx) در workerها کپی نشوند
+            _executor = ProcessPoolExecutor(
+                max_workers=REWRITE_POOL_SIZE,
+                mp_context=_WorkerContext(),
+                initializer=_warm_up,
+            )
+        elif REWRITE_EXECUTOR == "thread":
+            _executor = ThreadPoolExecutor(max_workers=REWRITE_POOL_SIZE, thread_name_prefix="rewrite")
+    return _executor
+
+
+# ✍️ نسخه‌ی غیرمسدودکننده‌ی rewrite_ai_response
+async def rewrite(text):
+    executor = get_executor()
+    if executor is None or not text or len(text) < REWRITE_OFFLOAD_MIN_CHARS:
+        return rewrite_tools.rewrite_ai_response(text)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, rewrite_tools.rewrite_ai_response, text)
+
+
+# 🚀 ساختن workerها قبل از اولین پیام تا اولین کاربر منتظر بالا آمدن pool نماند
+# (متن‌های کوتاه همیشه در همین پروسه بازنویسی می‌شوند، پس خود پروسه هم گرم می‌شود)
+async def start():
+    executor = get_executor()
+    loop = asyncio.get_running_loop()
+    warm_ups = [loop.run_in_executor(None, _warm_up)]
+    if isinstance(executor, ProcessPoolExecutor):
+        warm_ups += [loop.run_in_executor(executor, _warm_up) for _ in range(REWRITE_POOL_SIZE)]
+    await asyncio.gather(*warm_ups)
+
+
+# 🛑 بستن pool هنگام خاموش شدن
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+_spawn_lock = threading.Lock()
@@ -1,6 +1,11 @@
+import os
 import random
 import re
-from hazm import Normalizer, WordTokenizer, POSTagger
+import logging
+import threading
+from bisect import bisect_left
+
+log = logging.getLogger(__name__)
 
 # 🔥 اسلنگ‌ها و واژگان عامیانه
 slang_replacements = {
@@ -159,8 +164,8 @@ human_touch = [
 ]
 
 
-def paraphrase_structure(text):
-    patterns = [
+# 🔀 الگوهای بازنویسی ساختار جمله
+paraphrase_patterns = [
     (r"(من فکر می‌کنم که)\s+(.+?)", r"\2 به نظرم"),
     (r"(مهم است که)\s+(.+?)", r"بهتره که \2"),
     (r"(اگر)\s+(.+?)،\s+(آن‌گاه)", r"اگه \2، اون‌وقت"),
@@ -192,14 +197,16 @@ def paraphrase_structure(text):
     (r"(لازم به ذکر است که)\s+(.+?)", r"بد نیست بدونی که \2"),
 ]
 
-    for pattern, repl in patterns:
-        text = re.sub(pattern, repl, text)
+
+def paraphrase_structure(text):
+    for pattern, repl in _paraphrase_compiled:
+        text = pattern.sub(repl, text)
     return text
 
 
 
-def insert_minor_irrelevance(text):
-    fillers = [
+# 💭 جمله‌های بی‌ربط کوتاه
+irrelevant_fillers = [
     "راستی دیروز یادم افتاد یه همچین چیزی شنیده بودم.",
     "حالا به این ربطی نداره ولی یه بار همچین چیزی دیدم!",
     "اینم بگم، شاید بی‌ربط باشه ولی جالبه بدونی.",
@@ -228,11 +235,9 @@ def insert_minor_irrelevance(text):
     "بی‌خیال موضوع اصلی، یه چیز جالب بگم!",
 ]
 
-    sentences = re.split(r'(?<=[.!؟])\s+', text)
-    if len(sentences) > 2 and random.random() < 0.3:
-        idx = random.randint(1, len(sentences)-2)
-        sentences.insert(idx, random.choice(fillers))
-    return " ".join(sentences)
+
+def insert_minor_irrelevance(text):
+    return _apply_edits(text, _irrelevance_edits(text))
 
 
 
@@ -602,8 +607,8 @@ style_mix = [
 ]
 
 
-def simulate_typo(text):
-    replacements = {
+# ✍️ غلط‌های تایپی و محاوره‌ای
+typo_replacements = {
     "می‌شود": ["میشود", "می شه", "می‌تونه بشه"],
     "نمی‌شود": ["نمی شه", "نمیشه", "نمی‌تونه بشه"],
     "است": ["هست", "هستش", "یه جوراییه"],
@@ -633,73 +638,303 @@ def simulate_typo(text):
     "بر اساس": ["طبقِ", "بر پایه‌ی", "با توجه به"],
 }
 
-    for k, v in replacements.items():
-        text = re.sub(rf"\b{k}\b", random.choice(v), text)
+
+# ⚡ موتور بازنویسی تک‌گذر
+# هر جدول یک بار هنگام import به یک الگوی یکپارچه کامپایل می‌شود و متن فقط یک بار
+# پیمایش می‌شود. ترتیب گزینه‌ها همان ترتیب جدول است تا خروجی با اجرای کلید‌به‌کلید
+# قدیمی (برای seed ثابت) یکسان بماند.
+_WORD_CHAR = re.compile(r"\w")
+_MAX_KEY_LEN = max(map(len, list(slang_replacements) + list(typo_replacements)))
+
+
+def _joins_later_key(option, later):
+    # آیا جایگزین با کلمه‌های کناری‌اش یک کلید بعدی می‌سازد؟ (مثل «ساده» ← «راحت راحت» کنار «با خیال»)
+    words, option_words = later.split(), option.split()
+    return any(
+        option_words[-n:] == words[:n] or option_words[:n] == words[-n:]
+        for n in range(1, len(words))
+    )
+
+
+def _compile_word_table(table):
+    keys = list(table)
+    # کلیدی که یک کلید قبلی داخلش هست در اجرای ترتیبی هیچ‌وقت تطبیق نمی‌خورد
+    live = [
+        key for i, key in enumerate(keys)
+        if not any(re.search(rf"\b{re.escape(prev)}\b", key) for prev in keys[:i])
+    ]
+    pattern = re.compile(r"\b(?:" + "|".join(map(re.escape, live)) + r")\b")
+    sequential = [(key, re.compile(rf"\b{re.escape(key)}\b")) for key in keys]
+    # کلیدهایی با لبه‌ی غیرحرفی (مثل تنوین در «ترجیحاً») می‌توانند به کلمه‌ی کناری چسبیده باشند
+    glued = {key for key in keys if not (_WORD_CHAR.match(key[0]) and _WORD_CHAR.match(key[-1]))}
+    cascading = {}
+    for i, key in enumerate(keys):
+        for option in table[key]:
+            later = [k for k in keys[i + 1:] if _joins_later_key(option, k)]
+            if later:
+                cascading[key, option] = re.compile(r"\b(?:" + "|".join(map(re.escape, later)) + r")\b")
+    priority = {key: i for i, key in enumerate(live)}
+    return pattern, sequential, glued, cascading, priority
+
+
+# 📍 از میان همه‌ی تطبیق‌های (هم‌پوشان) همان‌هایی را برمی‌گرداند که الگوی یکپارچه انتخاب می‌کرد:
+# چپ‌ترین تطبیق و در یک نقطه‌ی شروع، کلیدی که در جدول زودتر آمده
+def _leftmost_matches(spans, priority):
+    by_start = {}
+    for start, end, key in spans:
+        if key in priority and (start not in by_start or priority[key] < priority[by_start[start][1]]):
+            by_start[start] = (end, key)
+    matches, pos = [], 0
+    for start in sorted(by_start):
+        if start >= pos:
+            end, key = by_start[start]
+            matches.append((start, end, key))
+            pos = end
+    return matches
+
+
+def _word_table_edits(text, compiled, picks, spans=None):
+    # فهرست تغییرها (start, end, replacement)؛ None یعنی ترتیب اعمال کلیدها در نتیجه اثر دارد
+    pattern, sequential, glued, cascading, priority = compiled
+    if spans is None:
+        matches = [(m.start(), m.end(), m.group(0)) for m in pattern.finditer(text)]
+    else:
+        matches = _leftmost_matches(spans, priority)
+
+    edits = []
+    for start, end, key in matches:
+        if (key, picks[key]) in cascading and _forms_later_key(text, start, end, picks[key], cascading[key, picks[key]]):
+            return None
+        if key in glued and (_WORD_CHAR.match(text[end:end + 1]) or _WORD_CHAR.match(text[start - 1:start])):
+            return None
+        edits.append((start, end, picks[key]))
+    return edits
+
+
+def _forms_later_key(text, start, end, replacement, later_pattern):
+    margin = _MAX_KEY_LEN
+    local = text[max(0, start - margin):start] + replacement + text[end:end + margin]
+    return later_pattern.search(local) is not None
+
+
+def _apply_word_table(text, compiled, picks, spans=None):
+    edits = _word_table_edits(text, compiled, picks, spans)
+    if edits is not None:
+        return _apply_edits(text, edits)
+    # موارد نادر: همان اجرای ترتیبی قدیمی با همان انتخاب‌ها
+    for key, key_pattern in compiled[1]:
+        text = key_pattern.sub(picks[key], text)
     return text
 
 
+def _apply_edits(text, edits):
+    pieces, pos = [], 0
+    for start, end, replacement in edits:
+        pieces.append(text[pos:start])
+        pieces.append(replacement)
+        pos = end
+    pieces.append(text[pos:])
+    return "".join(pieces)
+
+
+def _pick(table):
+    return {key: random.choice(options) for key, options in table.items()}
+
+
+def _compile_overlapping_scan(keys):
+    # lookahead همه‌ی تطبیق‌ها را حتی وقتی هم‌پوشانی دارند پیدا می‌کند؛ کلید بلندتر اول می‌آید
+    # و کلیدهای کوتاه‌تری که از همان نقطه شروع می‌شوند از روی پیشوند‌ها اضافه می‌شوند
+    ordered = sorted(keys, key=len, reverse=True)
+    pattern = re.compile(r"(?=\b(" + "|".join(map(re.escape, ordered)) + r")\b)")
+    prefixes = {
+        key: [other for other in keys if other != key and re.match(rf"{re.escape(other)}\b", key)]
+        for key in keys
+    }
+    return pattern, prefixes
+
+
+_slang_table = _compile_word_table(slang_replacements)
+_typo_table = _compile_word_table(typo_replacements)
+_formal_scan, _formal_prefixes = _compile_overlapping_scan(list(slang_replacements))
+_paraphrase_compiled = [(re.compile(pattern), repl) for pattern, repl in paraphrase_patterns]
+
+
+# 🧠 امتیاز رسمی بودن متن در یک پیمایش: تعداد عبارت‌های رسمی متمایز و محل همه‌ی تطبیق‌ها
+# به صورت (start, end, key). مراحل بعدی (مثل apply_slang) می‌توانند همین spans را دوباره استفاده کنند.
+def formality_score(text):
+    spans = _scan_formal(text, 0, len(text))
+    return _distinct_keys(spans), spans
+
+
+def _scan_formal(text, pos, endpos):
+    spans = []
+    for m in _formal_scan.finditer(text, pos, endpos):
+        start, key = m.start(), m.group(1)
+        spans.append((start, start + len(key), key))
+        spans.extend((start, start + len(prefix), prefix) for prefix in _formal_prefixes[key])
+    return spans
+
+
+def _distinct_keys(spans):
+    return len({key for _, _, key in spans})
+
+
+# 📐 امتیاز افزایشی: بعد از هر تغییر فقط اطراف جاهای تغییرکرده دوباره پیمایش می‌شود.
+# تطبیق (a, b) فقط به نویسه‌های a-1 تا b وابسته است، پس اگر به تغییری نچسبد فقط جابه‌جا می‌شود.
+# تعداد کلمات (len(text.split())) هم با شمردن شروع توکن‌ها در همان محدوده‌ها به‌روز می‌شود.
+_MAX_FORMAL_LEN = max(map(len, slang_replacements))
+_TOKEN_START = re.compile(r"(?<!\S)\S")
+
+
+def _rescore(text, spans, words, edits):
+    if not edits:
+        return text, spans, words
+    new_text = _apply_edits(text, edits)
+    moved, delta = [], 0
+    for start, end, replacement in edits:
+        moved.append((start, end, start + delta, start + delta + len(replacement)))
+        delta += len(replacement) - (end - start)
+
+    kept, i, shift = [], 0, 0
+    for a, b, key in spans:
+        while i < len(moved) and moved[i][1] < a:
+            shift = moved[i][3] - moved[i][1]
+            i += 1
+        if i == len(moved) or moved[i][0] > b:
+            kept.append((a + shift, b + shift, key))
+
+    windows = []
+    for _, _, new_start, new_end in moved:
+        lo, hi = max(0, new_start - _MAX_FORMAL_LEN), new_end + _MAX_FORMAL_LEN + 1
+        if windows and lo <= windows[-1][1]:
+            windows[-1][1] = hi
+        else:
+            windows.append([lo, hi])
+    new_starts = [m[2] for m in moved]
+    new_ends = [m[3] for m in moved]
+    for lo, hi in windows:
+        for a, b, key in _scan_formal(new_text, lo, min(hi, len(new_text))):
+            k = bisect_left(new_ends, a)
+            if k < len(moved) and new_starts[k] <= b:
+                kept.append((a, b, key))
+
+    clusters = []
+    for start, end, new_start, new_end in moved:
+        if clusters and start <= clusters[-1][1]:
+            clusters[-1][1], clusters[-1][3] = end, new_end
+        else:
+            clusters.append([start, end, new_start, new_end])
+    for start, end, new_start, new_end in clusters:
+        words += len(_TOKEN_START.findall(new_text, new_start, new_end + 1))
+        words -= len(_TOKEN_START.findall(text, start, end + 1))
+
+    kept.sort()
+    return new_text, kept, words
+
+
+def _rescore_word_table(text, spans, words, compiled, picks, match_spans=None):
+    edits = _word_table_edits(text, compiled, picks, match_spans)
+    if edits is not None:
+        return _rescore(text, spans, words, edits)
+    text = _apply_word_table(text, compiled, picks)
+    _, spans = formality_score(text)
+    return text, spans, len(text.split())
+
+
+def _regex_edits(pattern, repl, text):
+    return [(m.start(), m.end(), m.expand(repl)) for m in pattern.finditer(text)]
+
+
+# ✂️ بازچینی جمله‌ها با یک فاصله، معادل " ".join(re.split(...)) به صورت فهرست تغییرها
+_SENTENCE_BREAK = re.compile(r'(?<=[.!؟])\s+')
+
+
+def _sentence_starts(text):
+    starts, edits = [0], []
+    for m in _SENTENCE_BREAK.finditer(text):
+        if m.group(0) != " ":
+            edits.append((m.start(), m.end(), " "))
+        starts.append(m.end())
+    return starts, edits
+
+
+def _human_touch_edits(text):
+    starts, edits = _sentence_starts(text)
+    for start in starts:
+        if random.random() < 0.2:
+            edits.append((start, start, random.choice(human_touch) + " "))
+    return sorted(edits)
+
+
+def _irrelevance_edits(text):
+    starts, edits = _sentence_starts(text)
+    if len(starts) > 2 and random.random() < 0.3:
+        idx = random.randint(1, len(starts) - 2)
+        edits.append((starts[idx], starts[idx], random.choice(irrelevant_fillers) + " "))
+    return sorted(edits)
+
+
+def _minor_disorder_edits(text):
+    dots = text.count('.')
+    if not dots:
+        return []
+    idx = random.randint(0, dots - 1)
+    pos = -1
+    for _ in range(idx + 1):
+        pos = text.index('.', pos + 1)
+    return [(pos, pos, '...')]
+
+
+def simulate_typo(text):
+    return _apply_word_table(text, _typo_table, _pick(typo_replacements))
+
+
 
 
 # 🔁 جایگزینی رسمی با عامیانه
-def apply_slang(text):
-    for formal, informal_options in slang_replacements.items():
-        informal = random.choice(informal_options)
-        pattern = rf"\b{re.escape(formal)}\b"
-        text = re.sub(pattern, informal, text)
-    return text
+def apply_slang(text, spans=None):
+    return _apply_word_table(text, _slang_table, _pick(slang_replacements), spans)
 
 
 
 # 🗣️ افزودن حس انسانی
 def add_human_touch(text):
-    sentences = re.split(r'(?<=[.!؟])\s+', text)
-    modified = []
-    for s in sentences:
-        if random.random() < 0.2:
-            prefix = random.choice(human_touch)
-            s = f"{prefix} {s}"
-        modified.append(s)
-    return " ".join(modified)
+    return _apply_edits(text, _human_touch_edits(text))
 
 # 😀 افزودن اموجی
 
 # 🧠 بررسی رسمی بودن متن
-def is_too_formal(text):
-    formal_keywords = list(slang_replacements.keys())
-    score = sum(1 for word in formal_keywords if re.search(rf"\b{re.escape(word)}\b", text))
-    return score >= 3 or len(text.split()) > 100
+def is_too_formal(text, score=None):
+    if score is None:
+        score, _ = formality_score(text)
+    return _too_formal(score, len(text.split()))
+
+
+def _too_formal(score, words):
+    return score >= 3 or words > 100
 
 # 🌀 کمی اختلال عمدی طبیعی
 def add_minor_disorder(text):
-    parts = text.split('.')
-    if len(parts) > 1:
-        parts[random.randint(0, len(parts)-2)] += '...'
-        text = '.'.join(parts)
-    return text
+    return _apply_edits(text, _minor_disorder_edits(text))
 
 # 🧩 تابع نهایی بازنویسی چندمرحله‌ای برای عبور از ZeroGPT
+# امتیاز و تعداد کلمات فقط یک بار کامل حساب می‌شوند و بعد از هر مرحله از روی تغییرها به‌روز می‌شوند
 def make_more_human_if_needed(text, iterations=5):
     current_text = text
+    score, spans = formality_score(current_text)
+    words = len(current_text.split())
     for i in range(iterations):
-        if is_too_formal(current_text):
-            print(f"🌀 تلاش {i+1} برای انسانی‌سازی متن...")
-            current_text = apply_slang(current_text)
-            current_text = add_human_touch(current_text)
+        if _too_formal(score, words):
+            log.debug("🌀 تلاش %s برای انسانی‌سازی متن...", i + 1)
+            current_text, spans, words = _rescore_word_table(current_text, spans, words, _slang_table, _pick(slang_replacements), spans)
+            current_text, spans, words = _rescore(current_text, spans, words, _human_touch_edits(current_text))
             if random.random() < 0.4:
-                current_text = add_minor_disorder(current_text)
+                current_text, spans, words = _rescore(current_text, spans, words, _minor_disorder_edits(current_text))
+            score = _distinct_keys(spans)
         else:
             break
     return current_text
 
-# 🎯 تابع ساده‌تر بازنویسی (در صورت نیاز)
-def rewrite_ai_response(text):
-    try:
-        return make_more_human_if_needed(text)
-    
-    except Exception as e:
-        print(f"❌ خطا در بازنویسی: {e}")
-        return text
-
 def split_text_for_telegram(text, max_length=4000):
     parts = []
     while len(text) > max_length:
@@ -721,16 +956,20 @@ def split_text_for_telegram(text, max_length=4000):
 
 def super_humanize(text, iterations=5):
     current_text = text
+    score, spans = formality_score(current_text)
+    words = len(current_text.split())
     for i in range(iterations):
-        if is_too_formal(current_text):
-            print(f"✨ ارتقاء انسانی‌سازی – مرحله {i+1}")
-            current_text = apply_slang(current_text)
-            current_text = paraphrase_structure(current_text)
-            current_text = add_human_touch(current_text)
-            current_text = insert_minor_irrelevance(current_text)
-            current_text = simulate_typo(current_text)
+        if _too_formal(score, words):
+            log.debug("✨ ارتقاء انسانی‌سازی – مرحله %s", i + 1)
+            current_text, spans, words = _rescore_word_table(current_text, spans, words, _slang_table, _pick(slang_replacements), spans)
+            for pattern, repl in _paraphrase_compiled:
+                current_text, spans, words = _rescore(current_text, spans, words, _regex_edits(pattern, repl, current_text))
+            current_text, spans, words = _rescore(current_text, spans, words, _human_touch_edits(current_text))
+            current_text, spans, words = _rescore(current_text, spans, words, _irrelevance_edits(current_text))
+            current_text, spans, words = _rescore_word_table(current_text, spans, words, _typo_table, _pick(typo_replacements))
             if random.random() < 0.4:
-                current_text = add_minor_disorder(current_text)
+                current_text, spans, words = _rescore(current_text, spans, words, _minor_disorder_edits(current_text))
+            score = _distinct_keys(spans)
         else:
             break
     return current_text
@@ -747,8 +986,10 @@ def humanize_text(text):
     ref = " " + random.choice(references)
     
     # مرحله 5: تغییر ساختار زبانی
+    # قواعد این جدول بدون مرز کلمه و آبشاری‌اند (مثل «نباید» ← «اصلاً نباید حتما»)، پس ترتیب
+    # حفظ می‌شود؛ همه‌ی الگوها لفظی‌اند و str.replace همان نتیجه‌ی re.sub را سریع‌تر می‌دهد
     for pattern, replacement in structure_replacements:
-        text = re.sub(pattern, replacement, text)
+        text = text.replace(pattern, replacement)
     
     # مرحله 6: تغییر سبک
     text = random.choice(style_mix)(text)
@@ -757,48 +998,128 @@ def humanize_text(text):
     return pre_text + text + ref
 
 
-from hazm import Normalizer, WordTokenizer, POSTagger, Lemmatizer, SentenceTokenizer
-import random
+# 🔬 انسانی‌سازی با تحلیل زبانی hazm: فعل‌ها، صفت‌ها و قیدهای رسمی با برچسب نقش دستوری پیدا و
+# عامیانه می‌شوند. اشیای hazm (به‌خصوص مدل POSTagger که از دیسک خوانده می‌شود) در هر پروسه فقط یک بار
+# ساخته می‌شوند و همه‌ی جمله‌های متن با یک تماس tag_sents برچسب می‌خورند.
+#   REWRITE_HAZM=auto → اگر فایل مدل HAZM_POSTAGGER_MODEL موجود باشد، جزو rewrite_ai_response است (پیش‌فرض)
+#   REWRITE_HAZM=1 / 0 → همیشه / هیچ‌وقت
+REWRITE_HAZM = os.getenv("REWRITE_HAZM", "auto")
+HAZM_POSTAGGER_MODEL = os.getenv("HAZM_POSTAGGER_MODEL", "resources/postagger.model")
+
+_hazm_lock = threading.Lock()
+_hazm = None
+_VERB_TAGS = {"V", "VERB", "AUX"}
+_MODIFIER_TAGS = {"ADJ", "ADV"}
+_SPACE_BEFORE_PUNCT = re.compile(r"\s+([.,،;؛:!?؟»)\]])")
+_SPACE_AFTER_OPEN = re.compile(r"([«(\[])\s+")
+
+
+def hazm_enabled():
+    if REWRITE_HAZM == "auto":
+        return os.path.exists(HAZM_POSTAGGER_MODEL)
+    return REWRITE_HAZM == "1"
+
+
+# 🧰 اشیای hazm این پروسه (در workerهای بازنویسی هر worker نسخه‌ی خودش را دارد)؛
+# hazm و مدل‌هایش فقط با اولین فراخوانی بارگیری می‌شوند تا بالا آمدن بات معطل آن‌ها نماند
+def hazm_pipeline():
+    global _hazm
+    if _hazm is None:
+        with _hazm_lock:
+            if _hazm is None:
+                from hazm import Normalizer, WordTokenizer, POSTagger, Lemmatizer, SentenceTokenizer
+                _hazm = {
+                    "normalizer": Normalizer(),
+                    "word_tokenizer": WordTokenizer(),
+                    "sentence_tokenizer": SentenceTokenizer(),
+                    "tagger": POSTagger(model=HAZM_POSTAGGER_MODEL),
+                    "lemmatizer": Lemmatizer(),
+                }
+    return _hazm
+
+
+def _colloquial_word(word, tag, lemmatizer):
+    if tag in _VERB_TAGS or tag in _MODIFIER_TAGS:
+        if word in slang_replacements:
+            return random.choice(slang_replacements[word])
+    if tag in _VERB_TAGS:
+        # لم فعل‌ها به شکل «گذشته#حال» است؛ هر کدام که در جدول بود
+        for lemma in lemmatizer.lemmatize(word).split("#"):
+            if lemma in slang_replacements:
+                return random.choice(slang_replacements[lemma])
+    return word
+
+
+# 🪟 بیشتر کلیدهای جدول عامیانه چندکلمه‌ای‌اند («توصیه می‌شود»، «در حال حاضر»)؛ جمله‌ی توکن‌شده با الگوی
+# یکپارچه‌ی _slang_table پیمایش می‌شود و هر تطبیقی که دقیقاً روی مرز توکن‌ها شروع و تمام شود (یک پنجره از
+# توکن‌ها) جایگزین می‌شود. کلید تک‌کلمه‌ای فقط وقتی برچسبش فعل، صفت یا قید باشد عوض می‌شود.
+def _colloquial_sentence(tagged, lemmatizer):
+    # hazm اجزای فعل‌های چندبخشی را با "_" به هم می‌چسباند؛ در متن خروجی فاصله‌ی معمولی می‌شود
+    words = [word.replace("_", " ") for word, _ in tagged]
+    # برچسب‌های hazm جدید ممکن است پسوند داشته باشند (مثل "ADJ,EZ")
+    tags = [tag.split(",")[0] for _, tag in tagged]
+    token_starts, token_ends, pos = {}, {}, 0
+    for i, word in enumerate(words):
+        token_starts[pos] = i
+        token_ends[pos + len(word)] = i
+        pos += len(word) + 1
+
+    result, next_token = [], 0
+    for match in _slang_table[0].finditer(" ".join(words)):
+        first, last = token_starts.get(match.start()), token_ends.get(match.end())
+        if first is None or last is None or first < next_token:
+            continue
+        if first == last and tags[first] not in _VERB_TAGS and tags[first] not in _MODIFIER_TAGS:
+            continue
+        result += [_colloquial_word(w, t, lemmatizer) for w, t in zip(words[next_token:first], tags[next_token:first])]
+        result.append(random.choice(slang_replacements[match.group(0)]))
+        next_token = last + 1
+    result += [_colloquial_word(w, t, lemmatizer) for w, t in zip(words[next_token:], tags[next_token:])]
+    return _detokenize(result)
+
+
+def _detokenize(words):
+    text = _SPACE_BEFORE_PUNCT.sub(r"\1", " ".join(words))
+    return _SPACE_AFTER_OPEN.sub(r"\1", text)
+
 
 def hazm_humanize(text):
-    normalizer = Normalizer()
-    word_tokenizer = WordTokenizer()
-    sentence_tokenizer = SentenceTokenizer()
-    tagger = POSTagger(model='resources/postagger.model')
-    lemmatizer = Lemmatizer()
-    
-    # نرمال‌سازی متن
-    text = normalizer.normalize(text)
-    
-    # تقسیم به جملات
-    sentences = sentence_tokenizer.tokenize(text)
-    modified_sentences = []
-    
-    for sentence in sentences:
-        # توکن‌سازی و تحلیل ساختاری
-        words = word_tokenizer.tokenize(sentence)
-        tagged = tagger.tag(words)
-        
-        # جایگزینی کلمات رسمی با عامیانه
-        for i, (word, tag) in enumerate(tagged):
-            # جایگزینی افعال
-            if tag in ['V', 'AUX'] and word in slang_replacements:
-                words[i] = random.choice(slang_replacements[word])
-            # جایگزینی صفت‌ها یا قیدها
-            elif tag in ['ADJ', 'ADV'] and word in slang_replacements:
-                words[i] = random.choice(slang_replacements[word])
-            # ساده‌سازی با لماتیزه کردن
-            elif tag == 'V' and random.random() < 0.2:
-                lemma = lemmatizer.lemmatize(word)
-                words[i] = lemma if lemma in slang_replacements else random.choice(slang_replacements.get(word, [word]))
-    
-    return " ".join(modified_sentences)
+    pipeline = hazm_pipeline()
+    text = pipeline["normalizer"].normalize(text)
+
+    # جمله‌های همه‌ی پاراگراف‌ها یک‌جا برچسب می‌خورند؛ شکست خطوط پاراگراف‌ها حفظ می‌شود
+    paragraphs = text.split("\n")
+    sentences, owners = [], []
+    for index, paragraph in enumerate(paragraphs):
+        for sentence in pipeline["sentence_tokenizer"].tokenize(paragraph):
+            sentences.append(pipeline["word_tokenizer"].tokenize(sentence))
+            owners.append(index)
+    if not sentences:
+        return text
+
+    lemmatizer = pipeline["lemmatizer"]
+    modified = [[] for _ in paragraphs]
+    for index, tagged in zip(owners, pipeline["tagger"].tag_sents(sentences)):
+        modified[index].append(_colloquial_sentence(tagged, lemmatizer))
+    return "\n".join(" ".join(parts) if parts else paragraph for parts, paragraph in zip(modified, paragraphs))
+
+
+# 🔥 گرم کردن این پروسه: ساخت اشیای hazm (در صورت فعال بودن) و الگوهای بازنویسی قبل از اولین پیام
+def warm_up():
+    if hazm_enabled():
+        hazm_pipeline()
+    rewrite_ai_response("در حال حاضر توصیه می‌شود که این کار را انجام دهید.")
 
 
-# 🎯 تابع ساده‌تر بازنویسی (در صورت نیاز)
+# 🎯 بازنویسی پیش‌فرض پاسخ مدل: گذر زبانی hazm (اگر فعال باشد) و بعد انسانی‌سازی تا وقتی متن رسمی است
 def rewrite_ai_response(text):
     try:
+        if hazm_enabled() and is_too_formal(text):
+            try:
+                text = hazm_humanize(text)
+            except Exception as e:
+                log.warning("❌ خطا در بازنویسی hazm: %s", e)
         return make_more_human_if_needed(text)
     except Exception as e:
-        print(f"❌ خطا در بازنویسی: {e}")
+        log.warning("❌ خطا در بازنویسی: %s", e)
         return text
@@ -0,0 +1,137 @@
+import os
+import json
+import time
+import random
+
+import logging
+
+import model_limits
+import providers
+import resilience
+import telemetry
+
+# 🧭 انتخاب مدل هر مرحله‌ی پایپ‌لاین بر اساس آمار زنده
+# برای هر مرحله چند مسیر نامزد ("provider:model") تعریف می‌شود؛ امتیاز هر مسیر
+#   (EWMA تأخیر + ROUTER_ERROR_PENALTY ثانیه × EWMA خطا) × وزن هزینه
+# است و کم‌ترین امتیاز اول امتحان می‌شود (مسیری که هنوز تماسی نداشته تأخیر ROUTER_PRIOR_LATENCY
+# فرض می‌شود؛ با صفر، هر مسیر تازه یک بار زودتر امتحان می‌شود).
+# مسیرهایی که مدارشان باز است یا ظرفیت آزاد ندارند به ته صف می‌روند، و اگر مسیری شلوغ، ناسالم
+# یا با خطای گذرا ناموفق بود نامزد بعدی امتحان می‌شود.
+# با احتمال ROUTER_EXPLORE یک نامزد تصادفی جلو می‌افتد تا آمار مسیرهای دیگر هم تازه بماند.
+#   ROUTES='{"check": ["gemini:gemini-2.0-flash", "openrouter:deepseek/deepseek-chat-v3-0324:free"]}'
+#   ROUTE_COSTS='{"gemini:gemini-2.0-flash": 1.5}'
+GEMINI_ROUTE = f"gemini:{providers.GEMINI_MODEL}"
+ROUTES = {
+    "answer": [GEMINI_ROUTE],
+    "direct": ["openrouter:deepseek/deepseek-chat-v3-0324:free"],
+    "reason": ["openrouter:deepseek/deepseek-r1:free"],
+    "friendly": ["openrouter:deepseek/deepseek-chat-v3-0324:free"],
+    # بررسی محاوره‌ای هر حالت اول سراغ سرویس همان حالت می‌رود و بقیه فقط جایگزین‌اند
+    "check": [
+        GEMINI_ROUTE,
+        "openrouter:deepseek/deepseek-chat-v3-0324:free",
+        "openrouter:google/gemini-2.0-flash-thinking-exp-1219:free",
+    ],
+    "check_openrouter": [
+        "openrouter:google/gemini-2.0-flash-thinking-exp-1219:free",
+        "openrouter:deepseek/deepseek-chat-v3-0324:free",
+        GEMINI_ROUTE,
+    ],
+    "check_deepseek": [
+        "openrouter:deepseek/deepseek-chat-v3-0324:free",
+        "openrouter:google/gemini-2.0-flash-thinking-exp-1219:free",
+        GEMINI_ROUTE,
+    ],
+    "merge": [GEMINI_ROUTE],
+    "vision": [GEMINI_ROUTE],
+}
+ROUTES.update(json.loads(os.getenv("ROUTES", "{}")))
+ROUTE_COSTS = json.loads(os.getenv("ROUTE_COSTS", "{}"))
+ROUTER_EWMA_ALPHA = float(os.getenv("ROUTER_EWMA_ALPHA", "0.2"))
+ROUTER_PRIOR_LATENCY = float(os.getenv("ROUTER_PRIOR_LATENCY", "0"))
+ROUTER_ERROR_PENALTY = float(os.getenv("ROUTER_ERROR_PENALTY", "10"))
+ROUTER_EXPLORE = float(os.getenv("ROUTER_EXPLORE", "0.05"))
+
+log = logging.getLogger(__name__)
+_stats = {}
+
+
+def _route_stats(route):
+    if route not in _stats:
+        _stats[route] = {"latency": None, "error": 0.0, "calls": 0, "failures": 0}
+    return _stats[route]
+
+
+def record(route, latency=None, failed=False):
+    stats = _route_stats(route)
+    stats["calls"] += 1
+    stats["error"] += ROUTER_EWMA_ALPHA * ((1.0 if failed else 0.0) - stats["error"])
+    if failed:
+        stats["failures"] += 1
+    if latency is not None:
+        previous = stats["latency"]
+        stats["latency"] = latency if previous is None else previous + ROUTER_EWMA_ALPHA * (latency - previous)
+
+
+def score(route):
+    stats = _route_stats(route)
+    latency = ROUTER_PRIOR_LATENCY if stats["latency"] is None else stats["latency"]
+    return (latency + ROUTER_ERROR_PENALTY * stats["error"]) * ROUTE_COSTS.get(route, 1.0)
+
+
+def _available(route):
+    _, model = providers.resolve(route)
+    return not resilience.is_open(model) and model_limits.limiter(model).has_capacity()
+
+
+# 📋 نامزدهای یک مرحله به ترتیب امتحان
+def ranked(stage):
+    routes = sorted(ROUTES[stage], key=lambda route: (not _available(route), score(route)))
+    if len(routes) > 1 and random.random() < ROUTER_EXPLORE:
+        routes.insert(0, routes.pop(random.randrange(1, len(routes))))
+    return routes
+
+
+async def _call(stage, route, messages, draft):
+    provider, model = providers.resolve(route)
+    tokens_in = model_limits.estimate_text_tokens(*(message["content"] for message in messages))
+    with telemetry.span("model", model=route, kind=stage, tokens_in=tokens_in) as span:
+        if draft is not None:
+            text = await provider.stream(model, messages, draft)
+        else:
+            text = await provider.complete(model, messages)
+        # اگر سرویس‌دهنده توکن واقعی را اعلام نکرده باشد، تخمین ثبت می‌شود
+        span.attributes.setdefault("tokens_out", model_limits.estimate_text_tokens(text))
+        span.set(bytes=len(text.encode("utf-8")))
+    return text
+
+
+# 📡 پاسخ مرحله‌ی stage از بهترین مسیر فعلی (با draft به صورت جریانی)
+async def complete(stage, messages, draft=None):
+    error = None
+    for route in ranked(stage):
+        start = time.monotonic()
+        try:
+            text = await _call(stage, route, messages, draft)
+        except (model_limits.Busy, resilience.CircuitOpen) as e:
+            error = e
+        except Exception as e:
+            record(route, time.monotonic() - start, failed=True)
+            if not resilience.is_retryable(e):
+                raise
+            log.warning("🧭 مسیر %s برای %s ناموفق بود (%s)؛ نامزد بعدی", route, stage, type(e).__name__)
+            error = e
+        else:
+            record(route, time.monotonic() - start)
+            return text
+        if draft is not None:
+            await draft.reset()
+    raise error
+
+
+def stats():
+    return {
+        route: {**values, "latency": round(values["latency"] or 0.0, 3), "error": round(values["error"], 3),
+                "score": round(score(route), 3)}
+        for route, values in _stats.items()
+    }
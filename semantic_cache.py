@@ -0,0 +1,224 @@
+import os
+import re
+import time
+import zlib
+import threading
+
+from response_cache import normalize_text
+
+# 🧲 کش معنایی (اختیاری): سؤال‌هایی که با عبارت دیگری پرسیده شده‌اند هم پاسخ کش‌شده می‌گیرند.
+# متن با یک بردارساز هش n-gram حرفی (بدون مدل و فقط CPU) به بردار تبدیل می‌شود و نزدیک‌ترین
+# سؤال قبلی همان حالت با شباهت کسینوسی پیدا می‌شود. تا SEMANTIC_CACHE_ANN_MIN_ENTRIES جست‌وجو
+# کامل (brute force با NumPy) است و بعد از آن با LSH (ابرصفحه‌های تصادفی) فقط نامزدها مقایسه می‌شوند.
+# n-gramها به عددها حساس نیستند («جدول ضرب 7» و «جدول ضرب 8» شباهت ~0.9 دارند)، پس فقط سؤال‌هایی
+# با دقیقاً همان عددها (رقم‌های فارسی، عربی یا لاتین) نامزد می‌شوند.
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "0") == "1"
+SEMANTIC_CACHE_DIM = int(os.getenv("SEMANTIC_CACHE_DIM", "256"))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "100000"))
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9"))
+# آستانه‌ی جدا برای هر حالت، مثلاً "refined=0.95,gemini=0.9"
+SEMANTIC_CACHE_THRESHOLDS = {
+    mode.strip(): float(value)
+    for mode, value in (
+        item.split("=") for item in os.getenv("SEMANTIC_CACHE_THRESHOLDS", "").split(",") if "=" in item
+    )
+}
+SEMANTIC_CACHE_ANN_MIN_ENTRIES = int(os.getenv("SEMANTIC_CACHE_ANN_MIN_ENTRIES", "50000"))
+SEMANTIC_CACHE_LSH_TABLES = int(os.getenv("SEMANTIC_CACHE_LSH_TABLES", "12"))
+SEMANTIC_CACHE_LSH_BITS = int(os.getenv("SEMANTIC_CACHE_LSH_BITS", "10"))
+NGRAM_SIZES = (2, 3, 4)
+LSH_MERGE_BATCH = 1024
+_PUNCTUATION = re.compile(r"[^\w\s\u200c]+")
+_NUMBER = re.compile(r"\d+")
+
+_lock = threading.Lock()
+_indexes = {}
+_stats = {"hits": 0, "misses": 0, "stores": 0}
+np = None
+
+
+# 📦 numpy فقط وقتی کش معنایی واقعاً استفاده شود بارگیری می‌شود (پیش‌فرض خاموش است)
+def _load_numpy():
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+
+
+# 🔢 بردارساز هش: هر n-gram حرفی با crc32 به یک بُعد و یک علامت (±1) نگاشت می‌شود.
+# علائم نگارشی حذف می‌شوند تا «؟» یا «!» در سؤال‌های کوتاه شباهت را پایین نیاورند.
+def embed(text, dim=SEMANTIC_CACHE_DIM):
+    _load_numpy()
+    padded = f" {' '.join(_PUNCTUATION.sub(' ', normalize_text(text)).split())} "
+    hashes = [
+        zlib.crc32(padded[i:i + n].encode("utf-8"))
+        for n in NGRAM_SIZES
+        for i in range(len(padded) - n + 1)
+    ]
+    vector = np.zeros(dim, dtype=np.float32)
+    if hashes:
+        hashes = np.array(hashes, dtype=np.uint32)
+        signs = np.where(hashes & 0x80000000, 1.0, -1.0).astype(np.float32)
+        vector += np.bincount(hashes % dim, weights=signs, minlength=dim).astype(np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+# 🔢 کلید عددهای متن: عددهای متن به ترتیب، با رقم‌های یکسان‌شده؛ متن بدون عدد کلید 0 دارد
+def numbers_key(text):
+    numbers = [str(int(number)) for number in _NUMBER.findall(text)]
+    return zlib.crc32(" ".join(numbers).encode("ascii")) if numbers else 0
+
+
+class VectorIndex:
+    """بردارهای نرمال‌شده‌ی یک حالت در یک آرایه‌ی پیوسته؛ وقتی پر شد قدیمی‌ترین‌ها بازنویسی می‌شوند."""
+
+    def __init__(self, dim=SEMANTIC_CACHE_DIM, max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+                 ann_min_entries=SEMANTIC_CACHE_ANN_MIN_ENTRIES, tables=SEMANTIC_CACHE_LSH_TABLES,
+                 bits=SEMANTIC_CACHE_LSH_BITS, seed=0):
+        _load_numpy()
+        self.dim = dim
+        self.max_entries = max_entries
+        self.ann_min_entries = ann_min_entries
+        self.count = 0
+        self._next = 0
+        self._vectors = np.zeros((min(1024, max_entries), dim), dtype=np.float32)
+        self._expires = np.zeros(len(self._vectors), dtype=np.float64)
+        self._keys = np.zeros(len(self._vectors), dtype=np.int64)
+        self._replies = [None] * len(self._vectors)
+
+        # LSH: tables جدول، هر کدام با bits ابرصفحه؛ امضای هر بردار در هر جدول یک عدد bits-بیتی است
+        self._planes = np.random.default_rng(seed).standard_normal((dim, tables * bits)).astype(np.float32)
+        self._tables, self._bits = tables, bits
+        self._powers = (1 << np.arange(bits)).astype(np.int64)
+        self._sorted_positions = None
+        self._sorted_signatures = None
+        self._unindexed = []
+
+    def _signatures(self, vectors):
+        bits = (vectors @ self._planes > 0).reshape(len(vectors), self._tables, self._bits)
+        return bits @ self._powers
+
+    def _grow(self):
+        size = min(self.max_entries, len(self._vectors) * 2)
+        vectors = np.zeros((size, self.dim), dtype=np.float32)
+        vectors[:self.count] = self._vectors[:self.count]
+        expires = np.zeros(size, dtype=np.float64)
+        expires[:self.count] = self._expires[:self.count]
+        keys = np.zeros(size, dtype=np.int64)
+        keys[:self.count] = self._keys[:self.count]
+        self._vectors, self._expires, self._keys = vectors, expires, keys
+        self._replies.extend([None] * (size - len(self._replies)))
+
+    # 🏗️ ساختن (یا بازسازی) جدول‌های LSH به صورت آرایه‌های مرتب‌شده برای searchsorted
+    def _build_ann(self):
+        signatures = self._signatures(self._vectors[:self.count])
+        order = np.argsort(signatures, axis=0, kind="stable")
+        self._sorted_positions = order.T.copy()
+        self._sorted_signatures = np.take_along_axis(signatures, order, axis=0).T.copy()
+        self._unindexed = []
+
+    # ➕ افزودن دسته‌ی موقعیت‌های تازه به جدول‌های مرتب بدون مرتب‌سازی دوباره‌ی کل ایندکس.
+    # موقعیت‌های بازنویسی‌شده با امضای قدیمی در جدول می‌مانند (فقط نامزد اضافه‌اند، چون امتیاز دقیق
+    # دوباره حساب می‌شود)؛ وقتی تعدادشان به اندازه‌ی خود ایندکس شد، کل جدول از نو ساخته می‌شود.
+    def _merge_unindexed(self):
+        if self._sorted_positions.shape[1] + len(self._unindexed) > 2 * self.count:
+            self._build_ann()
+            return
+        positions = np.array(self._unindexed, dtype=np.int64)
+        signatures = self._signatures(self._vectors[positions])
+        merged_positions, merged_signatures = [], []
+        for table in range(self._tables):
+            order = np.argsort(signatures[:, table], kind="stable")
+            at = np.searchsorted(self._sorted_signatures[table], signatures[order, table])
+            merged_positions.append(np.insert(self._sorted_positions[table], at, positions[order]))
+            merged_signatures.append(np.insert(self._sorted_signatures[table], at, signatures[order, table]))
+        self._sorted_positions = np.stack(merged_positions)
+        self._sorted_signatures = np.stack(merged_signatures)
+        self._unindexed = []
+
+    def add(self, vector, reply, expires_at, key=0):
+        if self.count < self.max_entries:
+            if self.count == len(self._vectors):
+                self._grow()
+            position = self.count
+            self.count += 1
+        else:
+            position = self._next
+            self._next = (self._next + 1) % self.max_entries
+        self._vectors[position] = vector
+        self._expires[position] = expires_at
+        self._keys[position] = key
+        self._replies[position] = reply
+
+        if self._sorted_positions is not None:
+            # موقعیت‌های تازه تا ادغام بعدی جدا و کامل جست‌وجو می‌شوند
+            self._unindexed.append(position)
+            if len(self._unindexed) >= LSH_MERGE_BATCH:
+                self._merge_unindexed()
+        elif self.count >= self.ann_min_entries:
+            self._build_ann()
+
+    def _candidates(self, vector):
+        signatures = self._signatures(vector[None, :])[0]
+        parts = [np.array(self._unindexed, dtype=np.int64)]
+        for table, signature in enumerate(signatures):
+            sorted_signatures = self._sorted_signatures[table]
+            start = np.searchsorted(sorted_signatures, signature, side="left")
+            end = np.searchsorted(sorted_signatures, signature, side="right")
+            parts.append(self._sorted_positions[table, start:end])
+        return np.unique(np.concatenate(parts))
+
+    # 🔍 نزدیک‌ترین بردار زنده با همان کلید عددها؛ خروجی (شباهت، پاسخ) یا (0، None)
+    def search(self, vector, now, key=0):
+        if self._sorted_positions is None:
+            candidates = None
+            vectors, expires, keys = self._vectors[:self.count], self._expires[:self.count], self._keys[:self.count]
+        else:
+            candidates = self._candidates(vector)
+            vectors, expires, keys = self._vectors[candidates], self._expires[candidates], self._keys[candidates]
+        if len(vectors) == 0:
+            return 0.0, None
+        scores = vectors @ vector
+        scores[(expires <= now) | (keys != key)] = -1.0
+        best = int(np.argmax(scores))
+        if scores[best] < 0:
+            return 0.0, None
+        position = best if candidates is None else int(candidates[best])
+        return float(scores[best]), self._replies[position]
+
+
+def threshold_for(mode):
+    return SEMANTIC_CACHE_THRESHOLDS.get(mode, SEMANTIC_CACHE_THRESHOLD)
+
+
+# 🔍 پاسخ سؤال مشابه قبلی، اگر شباهت از آستانه‌ی این حالت بیشتر باشد
+def get(user_input, mode):
+    if not SEMANTIC_CACHE_ENABLED:
+        return None
+    vector = embed(user_input)
+    with _lock:
+        index = _indexes.get(mode)
+        score, reply = index.search(vector, time.time(), numbers_key(user_input)) if index else (0.0, None)
+        if reply is not None and score >= threshold_for(mode):
+            _stats["hits"] += 1
+            return reply
+        _stats["misses"] += 1
+        return None
+
+
+def put(user_input, mode, reply):
+    if not SEMANTIC_CACHE_ENABLED or not reply or not reply.strip():
+        return
+    vector = embed(user_input)
+    with _lock:
+        if mode not in _indexes:
+            _indexes[mode] = VectorIndex()
+        _indexes[mode].add(vector, reply, time.time() + SEMANTIC_CACHE_TTL, numbers_key(user_input))
+        _stats["stores"] += 1
+
+
+def stats():
+    with _lock:
+        return {**_stats, "entries": sum(index.count for index in _indexes.values())}
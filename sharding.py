@@ -0,0 +1,214 @@
+import os
+import asyncio
+import bisect
+import signal
+import hashlib
+import logging
+import multiprocessing
+from queue import Full
+
+from dotenv import load_dotenv
+
+# 📦 .env پیش از import ماژول‌های محلی که تنظیماتشان را هنگام import می‌خوانند
+load_dotenv()
+
+from telegram import Bot, Update
+
+import telemetry
+
+# 🧩 حالت چندپروسه‌ای: یک پروسه‌ی جلویی آپدیت‌ها را از تلگرام می‌گیرد و هر چت را با هش سازگار
+# (consistent hashing) به یکی از SHARD_WORKERS پروسه‌ی worker می‌فرستد.
+#
+#   SHARD_WORKERS=4 python sharding.py
+#
+# هر چت همیشه به یک worker می‌رسد، پس chat_data و صف چت (chat_queue) همان worker معتبر می‌مانند و
+# سیاست CHAT_QUEUE_POLICY برای پیام‌های یک چت اعمال می‌شود؛ چت‌های مختلف روی workerهای مختلف
+# (و در هر worker هم‌زمان) پیش می‌روند.
+# حالت انتخاب‌شده‌ی کاربر در user_store است که بین پروسه‌ها مشترک است.
+TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
+SHARD_WORKERS = int(os.getenv("SHARD_WORKERS", str(os.cpu_count() or 1)))
+SHARD_REPLICAS = int(os.getenv("SHARD_REPLICAS", "100"))
+SHARD_QUEUE_SIZE = int(os.getenv("SHARD_QUEUE_SIZE", "1000"))
+POLL_TIMEOUT = int(os.getenv("POLL_TIMEOUT", "30"))
+SHARD_PUT_TIMEOUT = float(os.getenv("SHARD_PUT_TIMEOUT", "5"))
+
+log = logging.getLogger(__name__)
+
+
+# 🔁 حلقه‌ی هش سازگار: با اضافه/کم شدن worker فقط بخش کوچکی از چت‌ها جابه‌جا می‌شوند
+class HashRing:
+    def __init__(self, nodes, replicas=SHARD_REPLICAS):
+        self._ring = sorted(
+            (self._hash(f"{node}:{i}"), node) for node in nodes for i in range(replicas)
+        )
+        self._keys = [h for h, _ in self._ring]
+
+    @staticmethod
+    def _hash(key):
+        return int.from_bytes(hashlib.blake2b(str(key).encode(), digest_size=8).digest(), "big")
+
+    def node_for(self, key):
+        index = bisect.bisect(self._keys, self._hash(key)) % len(self._keys)
+        return self._ring[index][1]
+
+
+# 🔑 کلید مسیریابی: شناسه‌ی چت، و اگر آپدیت چت ندارد (مثلاً inline query) شناسه‌ی کاربر
+def shard_key(update):
+    if update.effective_chat:
+        return update.effective_chat.id
+    if update.effective_user:
+        return update.effective_user.id
+    return update.update_id
+
+
+# 💬 پیام متنی عادی (نه فرمان) از handle_user_message به chat_queue می‌رسد و ترتیب، ادغام و لغوش همان‌جاست
+def _chat_queued(update):
+    message = update.message
+    return bool(message and message.text and not message.text.startswith("/"))
+
+
+# 🧵 ترتیب آپدیت‌های هر چت درون worker: فرمان‌ها، دکمه‌ها و عکس‌ها پشت سر هم اجرا می‌شوند و هر آپدیت
+# منتظر تمام شدن آخرین‌شان در همان چت می‌ماند (مثلاً پیام بعد از تغییر حالت، حالت تازه را می‌بیند).
+# پیام‌های متنی بعد از آن بلافاصله تسک خودشان را می‌گیرند تا chat_queue بتواند ادغام یا لغوشان کند.
+class ChatOrder:
+    def __init__(self, application):
+        self.application = application
+        self.barriers = {}
+        self.inflight = set()
+
+    def dispatch(self, update):
+        key = shard_key(update)
+        barrier = self.barriers.get(key)
+        task = asyncio.create_task(self._run(update, barrier))
+        self.inflight.add(task)
+        task.add_done_callback(self.inflight.discard)
+        if not _chat_queued(update):
+            self.barriers[key] = task
+            task.add_done_callback(lambda done: self._release(key, done))
+        return task
+
+    def _release(self, key, task):
+        if self.barriers.get(key) is task:
+            del self.barriers[key]
+
+    async def _run(self, update, barrier):
+        if barrier is not None:
+            await asyncio.wait({barrier})
+        await self.application.process_update(update)
+
+    async def drain(self):
+        if self.inflight:
+            await asyncio.gather(*self.inflight, return_exceptions=True)
+
+
+# 👷 worker: اپلیکیشن main را بدون updater اجرا می‌کند و آپدیت‌ها را از صف خودش می‌خواند
+def run_worker(index, queue):
+    # Ctrl+C فقط به پروسه‌ی جلویی می‌رسد؛ او با None در صف workerها را تمیز می‌بندد
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_worker_loop(index, queue))
+
+
+async def _worker_loop(index, queue):
+    import main as bot
+
+    application = bot.build_application(polling=False)
+    await application.initialize()
+    await bot.on_startup(application)
+    await application.start()
+    # هر worker متریک‌های خودش را روی پورت جدا (METRICS_PORT + شماره‌ی worker) می‌دهد
+    telemetry.serve_metrics(telemetry.METRICS_PORT + index if telemetry.METRICS_PORT else 0)
+    log.info("👷 worker %s آماده است (pid=%s)", index, os.getpid())
+
+    order = ChatOrder(application)
+    try:
+        while True:
+            data = await asyncio.to_thread(queue.get)
+            if data is None:
+                break
+            order.dispatch(Update.de_json(data, application.bot))
+        await order.drain()
+    finally:
+        await application.stop()
+        await application.shutdown()
+        await bot.on_shutdown(application)
+
+
+# 🏭 workerها و صف‌هایشان در پروسه‌ی جلویی
+class Shards:
+    def __init__(self, count, ctx, target=run_worker, queue_size=SHARD_QUEUE_SIZE):
+        self.ctx = ctx
+        self.target = target
+        self.queue_size = queue_size
+        self.queues = [None] * count
+        self.workers = [None] * count
+        for index in range(count):
+            self.start(index)
+
+    def start(self, index):
+        self.queues[index] = self.ctx.Queue(self.queue_size)
+        self.workers[index] = self.ctx.Process(
+            target=self.target, args=(index, self.queues[index]), name=f"shard-{index}"
+        )
+        self.workers[index].start()
+
+    # 📮 تحویل آپدیت به worker؛ worker مرده با صف تازه دوباره راه‌اندازی می‌شود (صف قبلی ممکن است
+    # با قفلی که آن پروسه نگه داشته بود قفل مانده باشد)، و اگر صف تا SHARD_PUT_TIMEOUT پر ماند
+    # آپدیت با لاگ کنار گذاشته می‌شود تا پروسه‌ی جلویی برای همه‌ی چت‌ها متوقف نشود
+    def deliver(self, index, data, timeout=None):
+        worker = self.workers[index]
+        if not worker.is_alive():
+            log.error("💀 worker %s از کار افتاد (exitcode=%s)؛ راه‌اندازی دوباره", index, worker.exitcode)
+            self.start(index)
+        try:
+            self.queues[index].put(data, timeout=SHARD_PUT_TIMEOUT if timeout is None else timeout)
+            return True
+        except Full:
+            log.error("🗑️ صف worker %s پر است؛ آپدیت %s کنار گذاشته شد", index, data.get("update_id"))
+            return False
+
+    def stop(self, timeout=10):
+        for index, worker in enumerate(self.workers):
+            if worker.is_alive():
+                try:
+                    self.queues[index].put(None, timeout=timeout)
+                except Full:
+                    worker.terminate()
+        for worker in self.workers:
+            worker.join(timeout)
+            if worker.is_alive():
+                worker.terminate()
+
+
+# 📡 پروسه‌ی جلویی: long polling و پخش آپدیت‌ها بین workerها
+async def _front_loop(shards):
+    ring = HashRing(range(len(shards.workers)))
+    offset = None
+    async with Bot(TELEGRAM_TOKEN) as telegram_bot:
+        await telegram_bot.delete_webhook()
+        log.info("🤖 ربات با %s worker شروع شد", len(shards.workers))
+        while True:
+            try:
+                updates = await telegram_bot.get_updates(offset=offset, timeout=POLL_TIMEOUT)
+            except Exception as e:
+                log.error("❌ خطا در دریافت آپدیت‌ها: %s", e)
+                await asyncio.sleep(1)
+                continue
+            for update in updates:
+                await asyncio.to_thread(shards.deliver, ring.node_for(shard_key(update)), update.to_dict())
+                offset = update.update_id + 1
+
+
+def main():
+    telemetry.setup_logging()
+    # spawn تا هر worker کلاینت‌های Gemini/HTTP و event loop خودش را از صفر بسازد
+    shards = Shards(SHARD_WORKERS, multiprocessing.get_context("spawn"))
+    try:
+        asyncio.run(_front_loop(shards))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        shards.stop()
+
+
+if __name__ == "__main__":
+    main()
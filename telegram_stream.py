@@ -0,0 +1,135 @@
+import os
+import re
+import time
+import asyncio
+import logging
+
+import outbound
+
+# 📝 نمایش تدریجی پاسخ: متن در حال تولید با ویرایش‌های محدودشده روی پیام(های) تلگرام نشان داده می‌شود.
+# حداکثر هر STREAM_EDIT_INTERVAL ثانیه یک دور ویرایش؛ همه‌ی تماس‌ها از زمان‌بند outbound می‌گذرند
+# (ویرایش‌های میانی با اولویت انیمیشن، متن نهایی با اولویت پاسخ نهایی).
+STREAM_EDIT_INTERVAL = float(os.getenv("STREAM_EDIT_INTERVAL", "1.0"))
+STREAM_CURSOR = " ▌"
+
+log = logging.getLogger(__name__)
+
+
+# 🛠️ تابع تقسیم متن برای تلگرام
+def split_text_for_telegram(text, max_length=4000):
+    parts = []
+    current_part = ""
+
+    sentences = re.split(r'(?<=[.!؟])\s+', text.strip()) if text else [""]
+
+    for sentence in sentences:
+        if len(current_part) + len(sentence) + 1 > max_length:
+            if current_part:
+                parts.append(current_part.strip())
+                current_part = sentence
+            else:
+                while len(sentence) > max_length:
+                    split_index = sentence.rfind(" ", 0, max_length - 1)
+                    if split_index == -1:
+                        split_index = max_length
+                    parts.append(sentence[:split_index].strip())
+                    sentence = sentence[split_index:].strip()
+                current_part = sentence
+        else:
+            current_part += (" " + sentence if current_part else sentence)
+
+    if current_part:
+        parts.append(current_part.strip())
+
+    return parts if parts else [text]
+
+
+class ProgressiveMessage:
+    """پیش‌نویس زنده‌ی یک پاسخ؛ وقتی متن از max_length بیشتر شد ادامه‌اش در پیام بعدی می‌آید."""
+
+    def __init__(self, reply_to, message=None, interval=STREAM_EDIT_INTERVAL, max_length=4000):
+        self.reply_to = reply_to
+        self.messages = [message] if message is not None else []
+        self.shown = [message.text] if message is not None else []
+        self.text = ""
+        self.interval = interval
+        self.max_length = max_length
+        self._dirty = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._flusher = None
+        self._last_flush = 0.0
+
+    # ➕ اضافه شدن تکه‌ی تازه از مدل
+    async def append(self, delta):
+        self.text += delta
+        self._mark_dirty()
+
+    # 🔄 شروع مرحله‌ی بعدی (مثلاً بازنویسی دوم DeepSeek) از متن خالی
+    async def reset(self):
+        self.text = ""
+
+    def _mark_dirty(self):
+        self._dirty.set()
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while not self._closing.is_set():
+            await self._dirty.wait()
+            wait = self._last_flush + self.interval - time.monotonic()
+            if wait > 0:
+                try:
+                    await asyncio.wait_for(self._closing.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+            if self._closing.is_set():
+                return
+            self._dirty.clear()
+            if self.text.strip():
+                try:
+                    await self._render(self.text + STREAM_CURSOR)
+                except Exception as e:
+                    log.warning("❌ خطا در ویرایش پیش‌نویس: %s", e)
+            self._last_flush = time.monotonic()
+
+    async def _render(self, text, reply_markup=None, priority=outbound.ANIMATION):
+        chat_id = self.reply_to.chat_id
+        parts = split_text_for_telegram(text, self.max_length) if text.strip() else []
+        for i, part in enumerate(parts):
+            markup = reply_markup if i == len(parts) - 1 else None
+            if i < len(self.messages):
+                message = self.messages[i]
+                if self.shown[i] != part or markup is not None:
+                    await outbound.send(
+                        chat_id,
+                        lambda: message.edit_text(part, reply_markup=markup),
+                        priority,
+                        ("message", chat_id, message.message_id),
+                    )
+                self.shown[i] = part
+            else:
+                message = await outbound.send(
+                    chat_id, lambda: self.reply_to.reply_text(part, reply_markup=markup), priority
+                )
+                if message is None:
+                    break
+                self.messages.append(message)
+                self.shown.append(part)
+        return parts
+
+    # ✅ متن نهایی جای پیش‌نویس را می‌گیرد و پیام‌های اضافه‌ی پیش‌نویس پاک می‌شوند
+    async def finish(self, text, reply_markup=None):
+        self._closing.set()
+        self._dirty.set()
+        if self._flusher is not None:
+            await self._flusher
+        parts = await self._render(text, reply_markup, outbound.FINAL)
+        for message in self.messages[len(parts):]:
+            try:
+                await outbound.send(
+                    self.reply_to.chat_id, message.delete, outbound.FINAL, ("message", message.chat_id, message.message_id)
+                )
+            except Exception:
+                pass
+        del self.messages[len(parts):]
+        del self.shown[len(parts):]
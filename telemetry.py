@@ -0,0 +1,175 @@
+import os
+import time
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager, ExitStack
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 📊 ردیابی مراحل پایپ‌لاین پاسخ
+# هر مرحله (تماس مدل، بازنویسی، بررسی محاوره‌ای، ارسال تلگرام، کل درخواست) یک span است با مدت،
+# تعداد توکن ورودی/خروجی، حجم متن و نام مدل. spanها در متریک‌های Prometheus جمع می‌شوند
+# (/metrics در webhook، یا METRICS_PORT در حالت polling) و اگر OTEL_ENABLED=1 باشد و
+# opentelemetry نصب باشد، به شکل span واقعی OpenTelemetry هم ساخته می‌شوند.
+# لاگ‌ها با LOG_LEVEL کنترل می‌شوند؛ جزئیات هر پیام (پرامپت‌ها و پاسخ‌ها) در سطح DEBUG است.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+OTEL_ENABLED = os.getenv("OTEL_ENABLED", "0") == "1"
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 60)
+
+log = logging.getLogger(__name__)
+
+_tracer = None
+if OTEL_ENABLED:
+    try:
+        from opentelemetry import trace
+        _tracer = trace.get_tracer("telegram_ai_bot")
+    except ImportError:
+        log.warning("opentelemetry نصب نیست؛ spanها فقط در متریک‌ها ثبت می‌شوند")
+
+
+def setup_logging():
+    logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    # httpx هر درخواست را در سطح INFO لاگ می‌کند
+    logging.getLogger("httpx").setLevel(max(logging.WARNING, logging.getLogger().level))
+
+
+class Span:
+    __slots__ = ("name", "attributes", "start", "duration", "error")
+
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = attributes
+        self.start = time.perf_counter()
+        self.duration = 0.0
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+
+_current = contextvars.ContextVar("telemetry_span", default=None)
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+
+
+# ⏱️ اندازه‌گیری یک مرحله؛ ویژگی‌ها (model، kind، tokens_in، tokens_out، bytes) را می‌شود بعداً با set اضافه کرد
+@contextmanager
+def span(name, **attributes):
+    current = Span(name, attributes)
+    token = _current.set(current)
+    with ExitStack() as stack:
+        otel_span = stack.enter_context(_tracer.start_as_current_span(name)) if _tracer else None
+        try:
+            yield current
+        except Exception as e:
+            current.error = type(e).__name__
+            raise
+        finally:
+            current.duration = time.perf_counter() - current.start
+            _current.reset(token)
+            _record(current)
+            if otel_span is not None:
+                otel_span.set_attributes({
+                    key: value for key, value in current.attributes.items() if isinstance(value, (str, int, float))
+                })
+                if current.error:
+                    otel_span.set_attribute("error.type", current.error)
+
+
+# 🏷️ افزودن ویژگی به span جاری (مثلاً توکن‌های واقعی که سرویس‌دهنده برگردانده)
+def annotate(**attributes):
+    current = _current.get()
+    if current is not None:
+        current.set(**attributes)
+
+
+def _record(current):
+    attributes = current.attributes
+    labels = (current.name, str(attributes.get("model", "")), str(attributes.get("kind", "")))
+    with _lock:
+        histogram = _histograms.get(labels)
+        if histogram is None:
+            histogram = _histograms[labels] = [0] * len(DURATION_BUCKETS) + [0.0, 0]
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if current.duration <= bound:
+                histogram[i] += 1
+        histogram[-2] += current.duration
+        histogram[-1] += 1
+        for metric, value in (
+            (("bot_stage_tokens_total", "in"), attributes.get("tokens_in")),
+            (("bot_stage_tokens_total", "out"), attributes.get("tokens_out")),
+            (("bot_stage_bytes_total", ""), attributes.get("bytes")),
+            (("bot_stage_errors_total", current.error or ""), 1 if current.error else None),
+        ):
+            if value:
+                key = metric + labels
+                _counters[key] = _counters.get(key, 0) + value
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("span %s %.3fs %s%s", current.name, current.duration, attributes,
+                  f" error={current.error}" if current.error else "")
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(stage, model, kind, **extra):
+    pairs = {"stage": stage, "model": model, "kind": kind, **extra}
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs.items()) + "}"
+
+
+# 📄 متریک‌ها در قالب متنی Prometheus
+def render_prometheus():
+    lines = [
+        "# HELP bot_stage_duration_seconds Duration of reply pipeline stages.",
+        "# TYPE bot_stage_duration_seconds histogram",
+    ]
+    with _lock:
+        histograms = {labels: list(values) for labels, values in _histograms.items()}
+        counters = dict(_counters)
+    for (stage, model, kind), values in sorted(histograms.items()):
+        for bound, count in zip(DURATION_BUCKETS, values):
+            lines.append(f"bot_stage_duration_seconds_bucket{_labels(stage, model, kind, le=str(bound))} {count}")
+        lines.append(f"bot_stage_duration_seconds_bucket{_labels(stage, model, kind, le='+Inf')} {values[-1]}")
+        lines.append(f"bot_stage_duration_seconds_sum{_labels(stage, model, kind)} {values[-2]}")
+        lines.append(f"bot_stage_duration_seconds_count{_labels(stage, model, kind)} {values[-1]}")
+    for metric, extra_label, help_text in (
+        ("bot_stage_tokens_total", "direction", "Tokens sent to and received from models."),
+        ("bot_stage_bytes_total", None, "Bytes of text produced by each stage."),
+        ("bot_stage_errors_total", "error", "Failed stages by exception type."),
+    ):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} counter")
+        for (name, extra, stage, model, kind), value in sorted(counters.items()):
+            if name == metric:
+                extra_labels = {extra_label: extra} if extra_label else {}
+                lines.append(f"{metric}{_labels(stage, model, kind, **extra_labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# 🌐 سرور کوچک /metrics برای حالت polling (در webhook همان اپ Flask مسیر /metrics را دارد)
+def serve_metrics(port=METRICS_PORT):
+    if not port:
+        return None
+    server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    log.info("متریک‌ها روی پورت %s/metrics", port)
+    return server
@@ -0,0 +1,50 @@
+import os
+import sys
+import tempfile
+from collections import deque
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 🧪 تنظیمات پیش از import ماژول‌های بات (که تنظیماتشان را هنگام import می‌خوانند):
+# بدون کش پاسخ، بازنویسی درون همین پروسه و فایل حالت کاربران در یک پوشه‌ی موقت
+_workdir = tempfile.mkdtemp(prefix="bot-tests-")
+for _name, _value in (
+    ("USER_MODE_FILE", os.path.join(_workdir, "user_modes.json")),
+    ("RESPONSE_CACHE_ENABLED", "0"),
+    ("SEMANTIC_CACHE_ENABLED", "0"),
+    ("REWRITE_EXECUTOR", "inline"),
+    ("REWRITE_HAZM", "0"),
+    ("LOG_LEVEL", "WARNING"),
+):
+    os.environ.setdefault(_name, _value)
+
+
+# 🌐 سرورهای جعلی OpenRouter و Bot API بنچمارک‌ها (benchmarks/fakes.py) در پروسه‌ی جدا، برای کل جلسه
+@pytest.fixture(scope="session")
+def fake_servers():
+    from benchmarks import fakes
+
+    # بدون تأخیر؛ OpenRouter جعلی همیشه خطای گذرا (429/503) می‌دهد تا مسیر تلاش دوباره آزموده شود
+    process, openrouter_url, telegram_url = fakes.serve(openrouter="0,0,1", telegram="0,0,0", reply_chars=200)
+    try:
+        yield {"openrouter": openrouter_url, "telegram": telegram_url}
+    finally:
+        process.terminate()
+
+
+# 📤 صف ارسال outbound با حالت تازه و سقف‌های عملاً نامحدود (هر تست سقف موردنظرش را خودش کم می‌کند)
+@pytest.fixture
+def fresh_outbound(monkeypatch):
+    import outbound
+
+    for name, value in (
+        ("_pending", {}), ("_by_key", {}), ("_chat_buckets", {}), ("_blocked_until", {}), ("_inflight", set()),
+        ("_global_bucket", None), ("_wakeup", None), ("_dispatcher", None), ("_depth", 0),
+        ("_latencies", deque(maxlen=1000)), ("_stats", dict.fromkeys(outbound._stats, 0)),
+        ("OUTBOUND_GLOBAL_RATE", 1000.0), ("OUTBOUND_GLOBAL_BURST", 1000.0),
+        ("OUTBOUND_CHAT_RATE", 1000.0), ("OUTBOUND_CHAT_BURST", 1000.0), ("OUTBOUND_GROUP_RATE", 1000.0),
+    ):
+        monkeypatch.setattr(outbound, name, value)
+    return outbound
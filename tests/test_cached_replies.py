@@ -0,0 +1,58 @@
+import asyncio
+from collections import OrderedDict
+
+import pytest
+
+import main
+import response_cache
+import router
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.setattr(response_cache, "RESPONSE_CACHE_ENABLED", True)
+    monkeypatch.setattr(response_cache, "_entries", OrderedDict())
+    monkeypatch.setattr(response_cache, "_size", 0)
+    monkeypatch.setattr(response_cache, "_stats", dict.fromkeys(response_cache._stats, 0))
+    monkeypatch.setattr(main, "RESPONSE_CACHE_REHUMANIZE", False)
+    return response_cache
+
+
+def pipeline(monkeypatch, *replies):
+    calls = []
+
+    async def process_message(user_input, mode="gemini", draft=None):
+        calls.append(user_input)
+        return replies[len(calls) - 1]
+
+    monkeypatch.setattr(main, "process_message", process_message)
+    return calls
+
+
+def test_catch_all_error_is_a_failed_reply(monkeypatch):
+    async def broken(stage, messages, draft=None):
+        raise RuntimeError("API key not valid")
+
+    monkeypatch.setattr(router, "complete", broken)
+    reply = asyncio.run(main.process_message("سلام", mode="openrouter"))
+    assert main.failed(reply)
+    assert reply.startswith("خطا:")
+
+
+def test_failed_reply_is_not_cached(cache, monkeypatch):
+    calls = pipeline(monkeypatch, main.FailedReply("خطا: API key not valid"), "جواب درست")
+    first = asyncio.run(main.cached_process_message("سلام", mode="openrouter"))
+    assert main.failed(first)
+    assert cache.stats()["stores"] == 0
+    second = asyncio.run(main.cached_process_message("سلام", mode="openrouter"))
+    assert second == "جواب درست"
+    assert len(calls) == 2
+
+
+def test_successful_reply_is_cached_even_with_cross_emoji(cache, monkeypatch):
+    calls = pipeline(monkeypatch, "این کار رو نکن ❌ اون یکی رو بکن ✅")
+    first = asyncio.run(main.cached_process_message("چی کار کنم؟", mode="gemini"))
+    second = asyncio.run(main.cached_process_message("چی کار کنم؟", mode="gemini"))
+    assert first == second
+    assert len(calls) == 1
+    assert cache.stats()["stores"] == 1
@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+
+import chat_queue
+
+
+class Work:
+    """کار ساختگی: هر prompt را ثبت می‌کند و تا باز شدن gate منتظر می‌ماند."""
+
+    def __init__(self):
+        self.prompts = []
+        self.gate = asyncio.Event()
+        self.active = 0
+        self.max_active = 0
+
+    async def __call__(self, prompt):
+        self.prompts.append(prompt)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await self.gate.wait()
+            return f"reply:{prompt}"
+        finally:
+            self.active -= 1
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_serialize_runs_one_message_at_a_time_in_order():
+    async def run():
+        work = Work()
+        tasks = [asyncio.create_task(chat_queue.submit(1, text, work, "serialize")) for text in ("a", "b", "c")]
+        await _settle()
+        assert work.prompts == ["a"]
+        work.gate.set()
+        results = await asyncio.gather(*tasks)
+        assert results == ["reply:a", "reply:b", "reply:c"]
+        assert work.prompts == ["a", "b", "c"]
+        assert work.max_active == 1
+        assert 1 not in chat_queue._chats
+
+    asyncio.run(run())
+
+
+def test_coalesce_merges_messages_that_arrive_while_busy():
+    async def run():
+        work = Work()
+        first = asyncio.create_task(chat_queue.submit(2, "a", work, "coalesce"))
+        await _settle()
+        later = [asyncio.create_task(chat_queue.submit(2, text, work, "coalesce")) for text in ("b", "c")]
+        await _settle()
+        work.gate.set()
+        assert await first == "reply:a"
+        with pytest.raises(chat_queue.Superseded):
+            await later[0]
+        merged = "b" + chat_queue.COALESCE_SEPARATOR + "c"
+        assert await later[1] == f"reply:{merged}"
+        assert work.prompts == ["a", merged]
+
+    asyncio.run(run())
+
+
+def test_cancel_aborts_running_and_waiting_messages():
+    async def run():
+        work = Work()
+        first = asyncio.create_task(chat_queue.submit(3, "a", work, "cancel"))
+        await _settle()
+        second = asyncio.create_task(chat_queue.submit(3, "b", work, "cancel"))
+        await _settle()
+        third = asyncio.create_task(chat_queue.submit(3, "c", work, "cancel"))
+        await _settle()
+        work.gate.set()
+        with pytest.raises(chat_queue.Superseded):
+            await first
+        with pytest.raises(chat_queue.Superseded):
+            await second
+        assert await third == "reply:c"
+
+    asyncio.run(run())
+
+
+def test_queue_full_rejects_beyond_max_pending(monkeypatch):
+    monkeypatch.setattr(chat_queue, "CHAT_QUEUE_MAX_PENDING", 2)
+
+    async def run():
+        work = Work()
+        tasks = [asyncio.create_task(chat_queue.submit(4, str(n), work, "serialize")) for n in range(3)]
+        await _settle()
+        with pytest.raises(chat_queue.QueueFull):
+            await chat_queue.submit(4, "overflow", work, "serialize")
+        work.gate.set()
+        assert len(await asyncio.gather(*tasks)) == 3
+
+    asyncio.run(run())
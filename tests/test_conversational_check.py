@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+
+import main
+import model_limits
+import providers
+import router
+
+ANSWER = "برای شروع توصیه می‌شود ابتدا با مفاهیم پایه آشنا شوید و پروژه‌های کوچک انجام دهید."
+
+
+class FailingProvider:
+    """سرویس‌دهنده‌ای که مثل کلید نامعتبر Gemini با خطای غیرقابل‌تکرار شکست می‌خورد."""
+
+    name = "failing"
+
+    def __init__(self):
+        self.calls = 0
+
+    async def complete(self, model, messages):
+        self.calls += 1
+        raise PermissionError("API key not valid")
+
+    async def stream(self, model, messages, draft):
+        return await self.complete(model, messages)
+
+
+@pytest.fixture
+def routes(monkeypatch):
+    failing = FailingProvider()
+    monkeypatch.setitem(providers.PROVIDERS, "failing", failing)
+    monkeypatch.setattr(providers, "STUB_LATENCY", 0)
+    monkeypatch.setattr(providers, "STUB_REPLY", ANSWER)
+    monkeypatch.setattr(main, "CHECK_SKIP_BELOW_SCORE", 0)
+    monkeypatch.setattr(main, "check_memo", main.OrderedDict())
+    for stage in ("direct", "reason", "friendly"):
+        monkeypatch.setitem(router.ROUTES, stage, ["stub:answer"])
+    for stage in ("check", "check_openrouter", "check_deepseek"):
+        monkeypatch.setitem(router.ROUTES, stage, ["failing:check"])
+    return failing
+
+
+@pytest.mark.parametrize("mode", ["openrouter", "deepseek"])
+def test_failed_check_keeps_the_answer(routes, mode):
+    reply = asyncio.run(main.process_message("برنامه‌نویسی را از کجا شروع کنم؟", mode=mode))
+    assert routes.calls == 1
+    assert reply and not reply.startswith(("خطا:", "❌"))
+
+
+def test_check_routes_start_with_the_mode_provider():
+    assert router.ROUTES["check"][0] == router.GEMINI_ROUTE
+    assert router.ROUTES["check_openrouter"][0].startswith("openrouter:")
+    assert router.ROUTES["check_deepseek"][0] == "openrouter:deepseek/deepseek-chat-v3-0324:free"
+
+
+FORMAL = "توصیه می‌شود ابتدا مطمئن شوید و تلاش کنید که پروژه را بررسی کنید."
+
+
+@pytest.fixture
+def check(monkeypatch):
+    monkeypatch.setattr(main, "CHECK_SKIP_BELOW_SCORE", 3)
+    monkeypatch.setattr(main, "check_memo", main.OrderedDict())
+    monkeypatch.setattr(main, "check_stats", dict.fromkeys(main.check_stats, 0))
+    calls = []
+
+    def run(stage, text, result="متن محاوره‌ای", error=None):
+        async def run_check():
+            calls.append(stage)
+            if error is not None:
+                raise error
+            return result
+        return asyncio.run(main.conversational_check(stage, text, run_check))
+
+    run.calls = calls
+    return run
+
+
+def test_informal_text_skips_the_check(check):
+    assert check("check", "سلام! خوبی؟ چه خبر") == "سلام! خوبی؟ چه خبر"
+    assert check.calls == []
+    assert main.check_stats["skipped"] == 1
+
+
+def test_same_text_is_answered_from_the_memo(check):
+    assert main.formality_score(FORMAL)[0] >= 3
+    assert check("check", FORMAL) == "متن محاوره‌ای"
+    assert check("check", FORMAL, result="نباید صدا زده شود") == "متن محاوره‌ای"
+    assert check.calls == ["check"]
+    assert main.check_stats["calls"] == 1
+    assert main.check_stats["memo_hits"] == 1
+
+
+def test_memo_is_kept_per_stage_and_bounded(check, monkeypatch):
+    monkeypatch.setattr(main, "CHECK_MEMO_SIZE", 1)
+    check("check", FORMAL)
+    check("check_deepseek", FORMAL)
+    assert check.calls == ["check", "check_deepseek"]
+    assert len(main.check_memo) == 1
+    # قدیمی‌ترین ورودی بیرون رفته است
+    check("check", FORMAL)
+    assert check.calls == ["check", "check_deepseek", "check"]
+
+
+def test_busy_model_returns_the_text_without_memo(check):
+    busy = model_limits.Busy("gemini", "queue full")
+    assert check("check", FORMAL, error=busy) == FORMAL
+    assert main.check_stats["busy"] == 1
+    assert not main.check_memo
+    assert check("check", FORMAL) == "متن محاوره‌ای"
+    assert check.calls == ["check", "check"]
+
+
+def test_empty_result_is_not_memoized(check):
+    assert check("check", FORMAL, result="") == ""
+    assert not main.check_memo
@@ -0,0 +1,75 @@
+import asyncio
+import time
+
+import pytest
+
+import main
+import model_limits
+import providers
+import resilience
+from benchmarks.fakes import FakeGeminiModel, Latency
+
+
+@pytest.fixture
+def gemini(monkeypatch):
+    monkeypatch.setattr(resilience, "_breakers", {})
+    monkeypatch.setattr(resilience, "_stats", {})
+    monkeypatch.setattr(resilience, "BACKOFF_BASE", 0.0)
+    model_limits.configure(providers.GEMINI_MODEL, concurrency=0, rpm=0, tpm=0)
+
+    def install(latency):
+        model = FakeGeminiModel(latency, reply_chars=200)
+        monkeypatch.setitem(providers.PROVIDERS["gemini"].models, providers.GEMINI_MODEL, model)
+        return model
+
+    return install
+
+
+class Draft:
+    def __init__(self):
+        self.parts = []
+
+    async def append(self, text):
+        self.parts.append(text)
+
+    async def reset(self):
+        self.parts.clear()
+
+
+def test_gemini_mode_replies_through_async_client(gemini):
+    model = gemini(Latency(0.01, 0))
+    reply = asyncio.run(main.process_message("پایتون را از کجا شروع کنم؟", mode="gemini"))
+    assert reply and not reply.startswith("❌")
+    assert model.calls == 1
+
+
+def test_concurrent_gemini_calls_do_not_block_the_loop(gemini):
+    model = gemini(Latency(0.3, 0))
+
+    async def run():
+        start = time.perf_counter()
+        replies = await asyncio.gather(*(main.process_message(f"سوال {n}", mode="gemini") for n in range(6)))
+        return replies, time.perf_counter() - start
+
+    replies, elapsed = asyncio.run(run())
+    assert all(not reply.startswith("❌") for reply in replies)
+    assert model.calls == 6
+    # شش تماس 0.3 ثانیه‌ای هم‌پوشانی دارند؛ اجرای پشت سر هم دست کم 1.8 ثانیه می‌شد
+    assert elapsed < 1.2
+
+
+def test_transient_gemini_errors_are_retried_then_reported(gemini):
+    model = gemini(Latency(0, 0, error_rate=1.0))
+    reply = asyncio.run(main.process_message("سلام", mode="gemini"))
+    assert reply == "❌ خطا در دریافت پاسخ از Gemini."
+    assert model.calls == resilience.UPSTREAM_RETRIES + 1
+
+
+def test_gemini_stream_feeds_draft(gemini):
+    gemini(Latency(0.01, 0))
+    draft = Draft()
+    text = asyncio.run(providers.PROVIDERS["gemini"].stream(
+        providers.GEMINI_MODEL, [{"role": "user", "content": "سلام"}], draft,
+    ))
+    assert len(draft.parts) > 1
+    assert text == "".join(draft.parts).strip()
@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+import model_limits
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_slot_admits_within_limits():
+    async def run():
+        limiter = model_limits.ModelLimiter("m", concurrency=2, rpm=60, tpm=6000)
+        async with limiter.slot(100):
+            assert limiter.active == 1
+        assert limiter.stats["admitted"] == 1
+        assert limiter.active == 0
+
+    asyncio.run(run())
+
+
+def test_busy_when_queue_is_full():
+    async def run():
+        limiter = model_limits.ModelLimiter("m", concurrency=1, max_queue=1, max_wait=1)
+        release = asyncio.Event()
+
+        async def hold():
+            async with limiter.slot():
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await _settle()
+        waiter = asyncio.create_task(hold())
+        await _settle()
+        with pytest.raises(model_limits.Busy) as info:
+            async with limiter.slot():
+                pass
+        assert info.value.reason == "queue"
+        release.set()
+        await asyncio.gather(holder, waiter)
+
+    asyncio.run(run())
+
+
+def test_busy_when_concurrency_wait_exceeds_max_wait():
+    async def run():
+        limiter = model_limits.ModelLimiter("m", concurrency=1, max_wait=0.05)
+        release = asyncio.Event()
+
+        async def hold():
+            async with limiter.slot():
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await _settle()
+        assert not limiter.has_capacity()
+        with pytest.raises(model_limits.Busy) as info:
+            async with limiter.slot():
+                pass
+        assert info.value.reason == "concurrency"
+        release.set()
+        await holder
+        # پس از رد شدن، نوبت آزاد می‌شود و درخواست بعدی پذیرفته می‌شود
+        async with limiter.slot():
+            pass
+
+    asyncio.run(run())
+
+
+def test_busy_when_rate_wait_exceeds_max_wait():
+    async def run():
+        limiter = model_limits.ModelLimiter("m", concurrency=1, rpm=1, max_wait=0.05)
+        async with limiter.slot():
+            pass
+        with pytest.raises(model_limits.Busy) as info:
+            async with limiter.slot():
+                pass
+        assert info.value.reason == "rate"
+        assert limiter.stats == {**limiter.stats, "admitted": 1, "rejected": 1}
+        # نوبت هم‌زمانی درخواست ردشده پس داده شده است
+        assert not limiter.semaphore.locked()
+
+    asyncio.run(run())
@@ -0,0 +1,177 @@
+import asyncio
+import time
+
+import pytest
+from telegram.error import BadRequest, RetryAfter
+
+import outbound
+
+
+pytestmark = pytest.mark.usefixtures("fresh_outbound")
+
+
+class Calls:
+    """factoryهای ساختگی که زمان و برچسب هر تماس را ثبت می‌کنند."""
+
+    def __init__(self):
+        self.log = []
+        self.start = time.monotonic()
+
+    def factory(self, label, delay=0, error=None):
+        async def call():
+            self.log.append((label, time.monotonic() - self.start))
+            await asyncio.sleep(delay)
+            if error is not None:
+                raise error
+            return label
+        return call
+
+    def labels(self):
+        return [label for label, _ in self.log]
+
+    def times(self):
+        return [at for _, at in self.log]
+
+
+def test_per_chat_bucket_paces_one_chat(monkeypatch):
+    monkeypatch.setattr(outbound, "OUTBOUND_CHAT_RATE", 20.0)
+    monkeypatch.setattr(outbound, "OUTBOUND_CHAT_BURST", 1.0)
+
+    async def run():
+        calls = Calls()
+        results = await asyncio.gather(*(outbound.send(1, calls.factory(n)) for n in range(3)))
+        return calls, results
+
+    calls, results = asyncio.run(run())
+    assert results == [0, 1, 2]
+    gaps = [b - a for a, b in zip(calls.times(), calls.times()[1:])]
+    assert all(gap >= 0.04 for gap in gaps)
+
+
+def test_group_chats_use_the_group_rate(monkeypatch):
+    monkeypatch.setattr(outbound, "OUTBOUND_GROUP_RATE", 10.0)
+    monkeypatch.setattr(outbound, "OUTBOUND_CHAT_BURST", 1.0)
+
+    async def run():
+        calls = Calls()
+        await asyncio.gather(*(outbound.send(-100, calls.factory(n)) for n in range(2)))
+        return calls
+
+    calls = asyncio.run(run())
+    assert calls.times()[1] - calls.times()[0] >= 0.09
+
+
+def test_global_bucket_paces_across_chats(monkeypatch):
+    monkeypatch.setattr(outbound, "OUTBOUND_GLOBAL_RATE", 20.0)
+    monkeypatch.setattr(outbound, "OUTBOUND_GLOBAL_BURST", 1.0)
+
+    async def run():
+        calls = Calls()
+        await asyncio.gather(*(outbound.send(chat_id, calls.factory(chat_id)) for chat_id in (1, 2, 3)))
+        return calls
+
+    calls = asyncio.run(run())
+    assert calls.times()[-1] - calls.times()[0] >= 0.09
+
+
+def test_slow_chat_does_not_hold_back_others(monkeypatch):
+    monkeypatch.setattr(outbound, "OUTBOUND_CHAT_RATE", 1.0)
+    monkeypatch.setattr(outbound, "OUTBOUND_CHAT_BURST", 1.0)
+
+    async def run():
+        calls = Calls()
+        first = outbound.submit(1, calls.factory("a1"))
+        second = outbound.submit(1, calls.factory("a2"))
+        other = outbound.submit(2, calls.factory("b1"))
+        await asyncio.gather(first, other)
+        second.cancel()
+        return calls
+
+    calls = asyncio.run(run())
+    assert calls.labels() == ["a1", "b1"]
+
+
+def test_retry_after_blocks_the_chat_and_retries():
+    async def run():
+        calls = Calls()
+        attempts = [RetryAfter(0.1), None]
+
+        async def flaky():
+            error = attempts.pop(0)
+            calls.log.append(("try", time.monotonic() - calls.start))
+            if error is not None:
+                raise error
+            return "ok"
+
+        return await outbound.send(1, flaky), calls
+
+    result, calls = asyncio.run(run())
+    assert result == "ok"
+    assert calls.times()[1] - calls.times()[0] >= 0.1
+    assert outbound.stats()["retry_after"] == 1
+    assert outbound.stats()["sent"] == 1
+
+
+def test_retry_after_gives_up_after_max_attempts(monkeypatch):
+    monkeypatch.setattr(outbound, "OUTBOUND_MAX_ATTEMPTS", 2)
+
+    async def run():
+        calls = Calls()
+        return await outbound.send(1, calls.factory("x", error=RetryAfter(0))), calls
+
+    with pytest.raises(RetryAfter):
+        asyncio.run(run())
+    assert outbound.stats()["failed"] == 1
+
+
+def test_coalesce_key_keeps_only_the_latest_frame():
+    async def run():
+        calls = Calls()
+        blocker = outbound.submit(1, calls.factory("busy", delay=0.05))
+        # اول ارسال در جریان شروع شود تا بقیه در صف همان چت بمانند
+        await asyncio.sleep(0.01)
+        frames = [outbound.submit(1, calls.factory(f"frame{n}"), outbound.ANIMATION, "progress:1") for n in range(3)]
+        results = await asyncio.gather(blocker, *frames)
+        return calls, results
+
+    calls, results = asyncio.run(run())
+    assert results == ["busy", None, None, "frame2"]
+    assert calls.labels() == ["busy", "frame2"]
+    assert outbound.stats()["coalesced"] == 2
+
+
+def test_coalesce_never_drops_a_higher_priority_job():
+    async def run():
+        calls = Calls()
+        blocker = outbound.submit(1, calls.factory("busy", delay=0.05))
+        await asyncio.sleep(0.01)
+        final = outbound.submit(1, calls.factory("final"), outbound.FINAL, "reply:1")
+        frame = outbound.submit(1, calls.factory("frame"), outbound.ANIMATION, "reply:1")
+        return await asyncio.gather(blocker, final, frame), calls
+
+    results, calls = asyncio.run(run())
+    assert results == ["busy", "final", "frame"]
+
+
+def test_final_reply_jumps_ahead_of_animation_frames():
+    async def run():
+        calls = Calls()
+        blocker = outbound.submit(1, calls.factory("busy", delay=0.05))
+        await asyncio.sleep(0.01)
+        frame = outbound.submit(1, calls.factory("frame"), outbound.ANIMATION)
+        final = outbound.submit(1, calls.factory("final"), outbound.FINAL)
+        await asyncio.gather(blocker, frame, final)
+        return calls
+
+    assert asyncio.run(run()).labels() == ["busy", "final", "frame"]
+
+
+def test_failed_animation_and_not_modified_edits_resolve_to_none():
+    async def run():
+        calls = Calls()
+        frame = outbound.send(1, calls.factory("frame", error=BadRequest("message to edit not found")),
+                              outbound.ANIMATION)
+        same = outbound.send(2, calls.factory("edit", error=BadRequest("Message is not modified")))
+        return await asyncio.gather(frame, same)
+
+    assert asyncio.run(run()) == [None, None]
@@ -0,0 +1,110 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import progress
+
+pytestmark = pytest.mark.usefixtures("fresh_outbound")
+
+
+class FakeBot:
+    """پیام «در حال پردازش» و وضعیت typing ساختگی که هر ویرایش و هر اکشن را ثبت می‌کند."""
+
+    def __init__(self, message_id=10):
+        self.edits = []
+        self.actions = []
+        self.message = SimpleNamespace(message_id=message_id, edit_text=self.edit_text)
+
+    async def edit_text(self, text):
+        self.edits.append(text)
+
+    async def send_chat_action(self, chat_id, action):
+        self.actions.append((chat_id, action))
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_edit_style_edits_only_when_the_stage_changes():
+    bot = FakeBot()
+
+    async def run():
+        async with progress.ProgressIndicator(bot, 1, bot.message, style="edit") as indicator:
+            for stage in ("model", "model", "rewrite", "unknown"):
+                progress.report(stage)
+                await settle()
+        await settle()
+        return indicator
+
+    indicator = asyncio.run(run())
+    assert bot.edits == [progress.STAGE_TEXTS["model"], progress.STAGE_TEXTS["rewrite"]]
+    assert indicator._task.done()
+
+
+def test_report_without_indicator_does_nothing():
+    progress.report("model")
+    assert progress._current.get() is None
+
+
+def test_typing_style_renews_until_exit(monkeypatch):
+    monkeypatch.setattr(progress, "TYPING_INTERVAL", 0.02)
+    bot = FakeBot()
+
+    async def run():
+        async with progress.ProgressIndicator(bot, 1):
+            await asyncio.sleep(0.07)
+        renewed = len(bot.actions)
+        await asyncio.sleep(0.05)
+        return renewed
+
+    renewed = asyncio.run(run())
+    # بدون پیام موقت سبک typing انتخاب می‌شود و پس از خروج دیگر تمدید نمی‌شود
+    assert renewed >= 3
+    assert len(bot.actions) == renewed
+    assert bot.edits == []
+
+
+def test_cancelled_request_stops_its_indicator(monkeypatch):
+    monkeypatch.setattr(progress, "TYPING_INTERVAL", 0.01)
+    bot = FakeBot()
+    indicators = []
+
+    async def request():
+        async with progress.ProgressIndicator(bot, 1) as indicator:
+            indicators.append(indicator)
+            await asyncio.sleep(10)
+
+    async def run():
+        task = asyncio.create_task(request())
+        await asyncio.sleep(0.03)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        stopped_at = len(bot.actions)
+        await asyncio.sleep(0.05)
+        return stopped_at
+
+    stopped_at = asyncio.run(run())
+    assert indicators[0]._task.done()
+    assert len(bot.actions) == stopped_at
+
+
+def test_concurrent_requests_keep_separate_indicators():
+    first, second = FakeBot(10), FakeBot(11)
+
+    async def request(bot, chat_id, stage):
+        async with progress.ProgressIndicator(bot, chat_id, bot.message, style="edit"):
+            await asyncio.sleep(0)
+            progress.report(stage)
+            await asyncio.sleep(0.02)
+
+    async def run():
+        # دو درخواست هم‌زمان در یک چت، هر کدام با پیام «در حال پردازش» خودش
+        await asyncio.gather(request(first, 1, "model"), request(second, 1, "merge"))
+
+    asyncio.run(run())
+    assert first.edits == [progress.STAGE_TEXTS["model"]]
+    assert second.edits == [progress.STAGE_TEXTS["merge"]]
@@ -0,0 +1,151 @@
+import asyncio
+
+import httpx
+import pytest
+
+import model_limits
+import openrouter_client
+import resilience
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(resilience, "_breakers", {})
+    monkeypatch.setattr(resilience, "_latencies", {})
+    monkeypatch.setattr(resilience, "_stats", {})
+    monkeypatch.setattr(resilience, "BACKOFF_BASE", 0.0)
+
+
+def status_error(status, headers=None):
+    request = httpx.Request("POST", "https://example.test/chat/completions")
+    response = httpx.Response(status, headers=headers, request=request)
+    return httpx.HTTPStatusError(f"{status}", request=request, response=response)
+
+
+class Flaky:
+    """factory تماس: خطاهای errors را به ترتیب بالا می‌برد و بعد "ok" برمی‌گرداند."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self._run()
+
+    async def _run(self):
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+def test_breaker_opens_after_threshold_and_half_opens_after_cooldown(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: now[0])
+    circuit = resilience.CircuitBreaker(failures=2, cooldown=10)
+
+    circuit.record_failure()
+    assert circuit.state == "closed" and circuit.allow()
+    circuit.record_failure()
+    assert circuit.state == "open"
+    assert not circuit.allow()
+
+    now[0] += 10
+    assert circuit.state == "half_open"
+    # فقط یک تماس آزمایشی؛ تا نتیجه‌اش معلوم نشده بقیه رد می‌شوند
+    assert circuit.allow()
+    assert not circuit.allow()
+    assert circuit.state == "open"
+
+    circuit.record_success()
+    assert circuit.state == "closed" and circuit.allow()
+
+
+def test_failed_probe_keeps_breaker_open(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: now[0])
+    circuit = resilience.CircuitBreaker(failures=1, cooldown=10)
+    circuit.record_failure()
+    now[0] += 10
+    assert circuit.allow()
+    circuit.record_failure()
+    assert circuit.state == "open"
+    assert not circuit.allow()
+
+
+def test_retry_delay_honours_retry_after(monkeypatch):
+    monkeypatch.setattr(resilience, "BACKOFF_MAX", 8.0)
+    assert resilience.retry_delay(status_error(429, {"retry-after": "2.5"}), 0) == 2.5
+    assert resilience.retry_delay(status_error(503, {"retry-after": "120"}), 0) == 8.0
+
+
+def test_retry_delay_without_retry_after_uses_full_jitter(monkeypatch):
+    monkeypatch.setattr(resilience, "BACKOFF_BASE", 0.5)
+    monkeypatch.setattr(resilience, "BACKOFF_MAX", 8.0)
+    # تاریخ HTTP در Retry-After پشتیبانی نمی‌شود و به عقب‌نشینی نمایی برمی‌گردد
+    error = status_error(503, {"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"})
+    delays = [resilience.retry_delay(error, 3) for _ in range(200)]
+    assert all(0 <= delay <= 4.0 for delay in delays)
+    assert max(delays) > 2.0
+
+
+def test_call_retries_transient_errors_then_succeeds():
+    flaky = Flaky(status_error(503), status_error(429, {"retry-after": "0"}))
+    result = asyncio.run(resilience.call("m", flaky, timeout=1, retries=2, hedge=False))
+    assert result == "ok"
+    assert flaky.calls == 3
+    assert resilience._stats["m"]["retries"] == 2
+    assert resilience.breaker("m").state == "closed"
+    assert resilience.breaker("m").failures == 0
+
+
+def test_call_raises_non_retryable_without_touching_breaker():
+    circuit = resilience.breaker("m")
+    circuit.failures = 1
+    flaky = Flaky(status_error(400))
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(resilience.call("m", flaky, timeout=1, retries=2, hedge=False))
+    assert flaky.calls == 1
+    assert circuit.failures == 1
+
+
+def test_call_short_circuits_when_breaker_is_open(monkeypatch):
+    monkeypatch.setitem(resilience._breakers, "m", resilience.CircuitBreaker(failures=2, cooldown=60))
+    flaky = Flaky(status_error(503), status_error(503))
+    with pytest.raises(resilience.CircuitOpen):
+        asyncio.run(resilience.call("m", flaky, timeout=1, retries=5, hedge=False))
+    assert flaky.calls == 2
+    assert resilience._stats["m"]["short_circuited"] == 1
+    assert resilience.is_open("m")
+
+
+def test_guarded_leaves_breaker_alone_on_non_retryable_error():
+    circuit = resilience.breaker("m")
+    circuit.failures = 1
+
+    async def run():
+        async with resilience.guarded("m"):
+            raise status_error(401)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(run())
+    assert circuit.failures == 1
+
+
+def test_chat_completion_retries_against_fake_openrouter(fake_servers):
+    model = "test/always-failing"
+    model_limits.configure(model, concurrency=0, rpm=0, tpm=0)
+
+    async def run():
+        try:
+            await openrouter_client.chat_completion(model, [{"role": "user", "content": "سلام"}],
+                                                    url=fake_servers["openrouter"])
+        finally:
+            await openrouter_client.aclose()
+
+    with pytest.raises(httpx.HTTPStatusError) as info:
+        asyncio.run(run())
+    assert info.value.response.status_code in (429, 503)
+    assert resilience._stats[model]["retries"] == resilience.UPSTREAM_RETRIES
+    stats = httpx.get(fake_servers["openrouter"].split("/api/", 1)[0] + "/_stats").json()
+    assert stats[model] == resilience.UPSTREAM_RETRIES + 1
@@ -0,0 +1,62 @@
+import asyncio
+import sys
+import types
+
+import pytest
+
+import rewrite_executor
+import rewrite_tools
+
+FORMAL = "در حال حاضر توصیه می‌شود که ابتدا مطمئن شوید و سپس این کار را انجام دهید. " * 4
+
+
+def worker_modules():
+    return getattr(sys.modules["__main__"], "__file__", None), "main" in sys.modules, "rewrite_tools" in sys.modules
+
+
+@pytest.fixture
+def process_pool(monkeypatch):
+    monkeypatch.setattr(rewrite_executor, "REWRITE_EXECUTOR", "process")
+    monkeypatch.setattr(rewrite_executor, "REWRITE_POOL_SIZE", 1)
+    monkeypatch.setattr(rewrite_executor, "REWRITE_OFFLOAD_MIN_CHARS", 0)
+    monkeypatch.setattr(rewrite_executor, "_executor", None)
+    yield rewrite_executor
+    rewrite_executor.shutdown()
+
+
+def test_process_workers_do_not_rerun_the_main_script(process_pool, tmp_path, monkeypatch):
+    # اسکریپت اصلی ساختگی؛ spawn معمولی آن را در هر worker دوباره اجرا می‌کرد
+    marker = tmp_path / "main_ran"
+    script = tmp_path / "bot.py"
+    script.write_text(f"open({str(marker)!r}, 'w').close()\n")
+    fake_main = types.ModuleType("__main__")
+    fake_main.__file__ = str(script)
+    monkeypatch.setitem(sys.modules, "__main__", fake_main)
+
+    executor = process_pool.get_executor()
+    assert executor.submit(worker_modules).result(timeout=60) == (None, False, True)
+    assert not marker.exists()
+    assert sys.modules["__main__"] is fake_main
+
+
+def test_process_rewrite_returns_the_worker_result(process_pool):
+    async def run():
+        await process_pool.start()
+        return await process_pool.rewrite(FORMAL)
+
+    result = asyncio.run(run())
+    assert result and result != FORMAL
+    assert not rewrite_tools.is_too_formal(result)
+
+
+@pytest.mark.parametrize("mode", ["inline", "thread"])
+def test_short_texts_and_inline_mode_stay_on_the_loop(mode, monkeypatch):
+    monkeypatch.setattr(rewrite_executor, "REWRITE_EXECUTOR", mode)
+    monkeypatch.setattr(rewrite_executor, "_executor", None)
+    calls = []
+    monkeypatch.setattr(rewrite_tools, "rewrite_ai_response", lambda text: calls.append(text) or text)
+    try:
+        assert asyncio.run(rewrite_executor.rewrite("کوتاه")) == "کوتاه"
+    finally:
+        rewrite_executor.shutdown()
+    assert calls == ["کوتاه"]
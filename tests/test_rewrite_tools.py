@@ -0,0 +1,127 @@
+import os
+import random
+
+import pytest
+
+import rewrite_tools
+
+FORMAL = (
+    "برای شروع، توصیه می‌شود ابتدا با مفاهیم پایه آشنا شوید. مطمئن شوید که پروژه‌ها را انجام دهید.\n"
+    "در نتیجه می‌توانید پیشرفت کنید."
+)
+
+
+class FakeTagger:
+    """برچسب‌زن ساده به جای مدل POSTagger: کلمه‌های فعلی رایج فعل، بقیه اسم."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def tag_sents(self, sentences):
+        self.calls += 1
+        return [[(word, "VERB" if word.endswith(("ید", "ود", "ند")) else "NOUN") for word in s] for s in sentences]
+
+
+@pytest.fixture
+def hazm_with_fake_tagger(monkeypatch):
+    hazm = pytest.importorskip("hazm")
+    tagger = FakeTagger()
+    monkeypatch.setattr(rewrite_tools, "_hazm", {
+        "normalizer": hazm.Normalizer(),
+        "word_tokenizer": hazm.WordTokenizer(),
+        "sentence_tokenizer": hazm.SentenceTokenizer(),
+        "tagger": tagger,
+        "lemmatizer": hazm.Lemmatizer(),
+    })
+    return tagger
+
+
+def test_hazm_humanize_rewrites_formal_phrases(hazm_with_fake_tagger):
+    random.seed(0)
+    result = rewrite_tools.hazm_humanize(FORMAL)
+
+    assert result and result != FORMAL
+    # کلیدهای چندکلمه‌ای جدول (مثل «توصیه می‌شود» و «انجام دهید») روی پنجره‌ی توکن‌ها پیدا می‌شوند
+    for phrase in ("توصیه می‌شود", "آشنا شوید", "مطمئن شوید", "انجام دهید", "پیشرفت کنید"):
+        assert phrase not in result
+    assert result.count("\n") == FORMAL.count("\n")
+    assert " ." not in result and " ،" not in result
+
+
+def test_hazm_humanize_tags_all_sentences_in_one_call(hazm_with_fake_tagger):
+    rewrite_tools.hazm_humanize(FORMAL)
+    assert hazm_with_fake_tagger.calls == 1
+
+
+def test_single_word_key_needs_matching_tag(hazm_with_fake_tagger):
+    # «ساده» کلید تک‌کلمه‌ای است ولی برچسب اسم دارد؛ عوض نمی‌شود
+    assert rewrite_tools.hazm_humanize("این ساده است.") == "این ساده است."
+
+
+def test_hazm_pipeline_is_built_once(monkeypatch):
+    pytest.importorskip("hazm")
+    if not os.path.exists(rewrite_tools.HAZM_POSTAGGER_MODEL):
+        pytest.skip("مدل POSTagger hazm موجود نیست")
+    monkeypatch.setattr(rewrite_tools, "_hazm", None)
+    assert rewrite_tools.hazm_pipeline() is rewrite_tools.hazm_pipeline()
+    assert rewrite_tools.hazm_humanize(FORMAL) != FORMAL
+
+
+# 🎲 خروجی ثبت‌شده‌ی هر تبدیل عمومی با seed ثابت؛ همان خروجی نسخه‌ی پیش از بهینه‌سازی‌ها
+# (جدول‌های از پیش کامپایل‌شده و امتیاز افزایشی _rescore) است و هر تغییر رفتاری را نشان می‌دهد
+GOLDEN_TEXT = (
+    "برای شروع، توصیه می‌شود ابتدا با مفاهیم پایه آشنا شوید. مطمئن شوید که پروژه‌ها را انجام دهید. "
+    "بسیار مهم است که تمرکز کنید و از کارهای پیچیده اجتناب کنید. در نتیجه می‌توانید پیشرفت کنید."
+)
+
+GOLDEN = {
+    ('apply_slang', 1): 'برای شروع، می\u200cگم امتحان کن ابتدا با مفاهیم پایه بیا تو جریان. یادت نره که پروژه\u200cها را یه حرکتی بزن. خیلی تو چشمه که حواست جمع باشه و از کارهای مغزمو خورد بی\u200cخیالش شو. در نتیجه می\u200cتوانید یه پله برید بالا.',
+    ('apply_slang', 7): 'برای شروع، پیشنهاد می\u200cکنم ابتدا با مفاهیم پایه یاد بگیرش. یادت نره که پروژه\u200cها را یه حرکتی بزن. خیلی مهمه ها! که حواست جمع باشه و از کارهای مغزمو خورد بی\u200cخیالش شو. در نتیجه می\u200cتوانید یه پله برید بالا.',
+    ('paraphrase_structure', 1): 'برای شروع، توصیه می\u200cشود ابتدا با مفاهیم پایه آشنا شوید. مطمئن شوید که پروژه\u200cها را انجام دهید. بسیار بهتره که تمرکز کنید و از کارهای پیچیده اجتناب کنید. واسه همین می\u200cتوانید پیشرفت کنید.',
+    ('paraphrase_structure', 7): 'برای شروع، توصیه می\u200cشود ابتدا با مفاهیم پایه آشنا شوید. مطمئن شوید که پروژه\u200cها را انجام دهید. بسیار بهتره که تمرکز کنید و از کارهای پیچیده اجتناب کنید. واسه همین می\u200cتوانید پیشرفت کنید.',
+    ('simulate_typo', 1): 'برای شروع، توصیه میشود ابتدا با مفاهیم پایه آشنا شوید. مطمئن شوید که پروژه\u200cها را انجام دهید. بسیار مهم هست که تمرکز کنید و از کارهای پیچیده اجتناب کنید. در نتیجه می\u200cتوانید پیشرفت کنید.',
+    ('simulate_typo', 7): 'برای شروع، توصیه می شه ابتدا با مفاهیم پایه آشنا شوید. مطمئن شوید که پروژه\u200cها را انجام دهید. بسیار مهم هستش که تمرکز کنید و از کارهای پیچیده اجتناب کنید. در نتیجه می\u200cتوانید پیشرفت کنید.',
+    ('add_human_touch', 1): 'می\u200cدونی فرقش کجاست؟ توی دل آدمه! برای شروع، توصیه می\u200cشود ابتدا با مفاهیم پایه آشنا شوید. اگه من جات بودم، مطمئن شوید که پروژه\u200cها را انجام دهید. بسیار مهم است که تمرکز کنید و از کارهای پیچیده اجتناب کنید. در نتیجه می\u200cتوانید پیشرفت کنید.',
+    ('add_human_touch', 7): 'برای شروع، توصیه می\u200cشود ابتدا با مفاهیم پایه آشنا شوید. یه لحظه وایسا، این یکی فرق داره! مطمئن شوید که پروژه\u200cها را انجام دهید. از ما گفتن بود 😎 بسیار مهم است که تمرکز کنید و از کارهای پیچیده اجتناب کنید. بیا خودمونیم، یه جورایی باحاله! در نتیجه می\u200cتوانید پیشرفت کنید.',
+    ('insert_minor_irrelevance', 1): 'برای شروع، توصیه می\u200cشود ابتدا با مفاهیم پایه آشنا شوید. وسط حرفام اینو یادم اومد، حیفم اومد نگم. مطمئن شوید که پروژه\u200cها را انجام دهید. بسیار مهم است که تمرکز کنید و از کارهای پیچیده اجتناب کنید. در نتیجه می\u200cتوانید پیشرفت کنید.',
+    ('insert_minor_irrelevance', 7): 'برای شروع، توصیه می\u200cشود ابتدا با مفاهیم پایه آشنا شوید. مطمئن شوید که پروژه\u200cها را انجام دهید. بسیار مهم است که تمرکز کنید و از کارهای پیچیده اجتناب کنید. در نتیجه می\u200cتوانید پیشرفت کنید.',
+    ('add_minor_disorder', 1): 'برای شروع، توصیه می\u200cشود ابتدا با مفاهیم پایه آشنا شوید. مطمئن شوید که پروژه\u200cها را انجام دهید.... بسیار مهم است که تمرکز کنید و از کارهای پیچیده اجتناب کنید. در نتیجه می\u200cتوانید پیشرفت کنید.',
+    ('add_minor_disorder', 7): 'برای شروع، توصیه می\u200cشود ابتدا با مفاهیم پایه آشنا شوید. مطمئن شوید که پروژه\u200cها را انجام دهید. بسیار مهم است که تمرکز کنید و از کارهای پیچیده اجتناب کنید.... در نتیجه می\u200cتوانید پیشرفت کنید.',
+    ('make_more_human_if_needed', 1): 'برای شروع، می\u200cگم امتحان کن ابتدا با مفاهیم پایه بیا تو جریان.... یادت نره که پروژه\u200cها را یه حرکتی بزن. خیلی تو چشمه که حواست جمع باشه و از کارهای مغزمو خورد بی\u200cخیالش شو. در نتیجه می\u200cتوانید یه پله برید بالا.',
+    ('make_more_human_if_needed', 7): 'برای شروع، پیشنهاد می\u200cکنم ابتدا با مفاهیم پایه یاد بگیرش. یادت نره که پروژه\u200cها را یه حرکتی بزن. خیلی مهمه ها! که حواست جمع باشه و از کارهای مغزمو خورد بی\u200cخیالش شو. در نتیجه می\u200cتوانید یه پله برید بالا.',
+    ('super_humanize', 1): 'برای شروع، می\u200cگم امتحان کن ابتدا با مفاهیم پایه بیا تو جریان. یادت نره که پروژه\u200cها را یه حرکتی بزن. خیلی تو چشمه که حواست جمع باشه و از کارهای مغزمو خورد بی\u200cخیالش شو. واسه همین می\u200cتوانید یه پله برید بالا.',
+    ('super_humanize', 7): 'برای شروع، پیشنهاد می\u200cکنم ابتدا با مفاهیم پایه یاد بگیرش. یادت نره که پروژه\u200cها را یه حرکتی بزن. خیلی مهمه ها! که حواست جمع باشه و از کارهای مغزمو خورد بی\u200cخیالش شو. واسه همین می\u200cتوانید یه پله برید بالا.',
+    ('humanize_text', 1): 'وقتی چشم آدم پر اشکه، دیگه خوب نمی\u200cبینه که قضاوت کنه: الان قاطی کردم، یه لحظه صبر بده. یاد اون روزایی افتادم که بی\u200cحساب عشق می\u200cدادم، ولی تهش شد: «نه خوردیم نونی، نه دیدیم روغنی». شاید ساده به نظر بیاد، ولی پشتش یه عمر تجربه\u200cست: برای شروع، توصیه میشه ابتدا با مفاهیم پایه آشنا شاوند. مطمئن شاوند که پروژه\u200cها را انجام دهید. بسیار مهم هست که تمرکز کنید و از کارهای پیچیده اجتناب کنید. در نهایت می\u200cتوانید پیشرفت کنید. در فصلنامه\u200cی «روان\u200cشناسی شناختی کاربردی» (جلد هشتم، شماره دوم)، اثر محیط\u200cهای باز، منعطف و بدون کنترل سخت\u200cگیرانه بر رشد خلاقیت در کارمندان بررسی شده است.',
+    ('humanize_text', 7): 'اگه یه چیز از این زندگی فهمیدم اینه که همیشه حقیقت ساده نیست: الان قاطی کردم خودمم، یه\u200cکم گنگ شدم! یه بار همچین جریانی پیش اومد، بعد بهم گفتن: «ماهی رو هر وقت از آب بگیری، تازه\u200cست». باور کن اگه جای من بودی، می\u200cفهمیدی که برای شروع، توصیه میشه ابتدا با مفاهیم پایه آشنا شاوند. مطمئن شاوند که پروژه\u200cها را انجام دهید. بسیار مهم هست که تمرکز کنید و از کارهای پیچیده اجتناب کنید. در نهایت می\u200cتوانید پیشرفت کنید. نشریه «فلسفه برای کودکان» چاپ مؤسسه فبک ایران، در مقاله\u200cای از دکتر شیرین عطری (۱۴۰۲) به این نکته اشاره می\u200cکند که تقویت گفت\u200cوگوهای انتقادی در کودکان می\u200cتواند زمینه\u200cساز رشد خلاقیت در بزرگ\u200cسالی باشد.',
+    ('rewrite_ai_response', 1): 'برای شروع، می\u200cگم امتحان کن ابتدا با مفاهیم پایه بیا تو جریان.... یادت نره که پروژه\u200cها را یه حرکتی بزن. خیلی تو چشمه که حواست جمع باشه و از کارهای مغزمو خورد بی\u200cخیالش شو. در نتیجه می\u200cتوانید یه پله برید بالا.',
+    ('rewrite_ai_response', 7): 'برای شروع، پیشنهاد می\u200cکنم ابتدا با مفاهیم پایه یاد بگیرش. یادت نره که پروژه\u200cها را یه حرکتی بزن. خیلی مهمه ها! که حواست جمع باشه و از کارهای مغزمو خورد بی\u200cخیالش شو. در نتیجه می\u200cتوانید یه پله برید بالا.',
+}
+
+
+@pytest.mark.parametrize("name, seed", sorted(GOLDEN))
+def test_transform_output_is_unchanged(name, seed, monkeypatch):
+    monkeypatch.setattr(rewrite_tools, "REWRITE_HAZM", "0")
+    random.seed(seed)
+    assert getattr(rewrite_tools, name)(GOLDEN_TEXT) == GOLDEN[name, seed]
+
+
+def test_formality_score_of_golden_text():
+    score, spans = rewrite_tools.formality_score(GOLDEN_TEXT)
+    assert score == 9
+    assert {key for _, _, key in spans} >= {"توصیه می‌شود", "مطمئن شوید", "انجام دهید", "پیشرفت کنید"}
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_incremental_rescore_matches_full_score(seed):
+    random.seed(seed)
+    text = GOLDEN_TEXT
+    score, spans = rewrite_tools.formality_score(text)
+    words = len(text.split())
+    for make_edits in (
+        rewrite_tools._human_touch_edits, rewrite_tools._irrelevance_edits, rewrite_tools._minor_disorder_edits,
+    ):
+        text, spans, words = rewrite_tools._rescore(text, spans, words, make_edits(text))
+    text, spans, words = rewrite_tools._rescore_word_table(
+        text, spans, words, rewrite_tools._slang_table, rewrite_tools._pick(rewrite_tools.slang_replacements), spans)
+    assert sorted(spans) == sorted(rewrite_tools.formality_score(text)[1])
+    assert words == len(text.split())
@@ -0,0 +1,48 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+import semantic_cache
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.setattr(semantic_cache, "SEMANTIC_CACHE_ENABLED", True)
+    monkeypatch.setattr(semantic_cache, "_indexes", {})
+    monkeypatch.setattr(semantic_cache, "_stats", dict.fromkeys(semantic_cache._stats, 0))
+    return semantic_cache
+
+
+def similarity(a, b):
+    return float(semantic_cache.embed(a) @ semantic_cache.embed(b))
+
+
+def test_questions_differing_only_in_a_number_do_not_collide(cache):
+    first = "برای سفر به شیراز در 3 روز چه برنامه‌ای پیشنهاد می‌کنی؟"
+    second = "برای سفر به شیراز در 5 روز چه برنامه‌ای پیشنهاد می‌کنی؟"
+    # شباهت n-gramها از آستانه بالاتر است؛ فقط کلید عددها جلوی برخورد را می‌گیرد
+    assert similarity(first, second) >= semantic_cache.threshold_for("gemini")
+    cache.put(first, "gemini", "برنامه‌ی سه‌روزه")
+    assert cache.get(second, "gemini") is None
+    assert cache.get(first, "gemini") == "برنامه‌ی سه‌روزه"
+
+
+def test_same_numbers_in_persian_digits_still_hit(cache):
+    cache.put("جدول ضرب 7 رو بگو", "gemini", "جواب هفت")
+    assert cache.get("جدول ضرب ۷ رو بگو!", "gemini") == "جواب هفت"
+    assert cache.get("جدول ضرب 8 رو بگو", "gemini") is None
+
+
+def test_numbers_key_ignores_digit_script_and_keeps_order():
+    key = semantic_cache.numbers_key
+    assert key("۱۲ و ٣٤") == key("12 و 34")
+    assert key("12 و 34") != key("34 و 12")
+    assert key("بدون عدد") == 0
+
+
+def test_lsh_search_also_requires_matching_numbers():
+    index = semantic_cache.VectorIndex(ann_min_entries=1)
+    vector = semantic_cache.embed("برای سفر به شیراز در 3 روز چه برنامه‌ای پیشنهاد می‌کنی؟")
+    index.add(vector, "سه روز", expires_at=float("inf"), key=semantic_cache.numbers_key("3"))
+    assert index.search(vector, 0, semantic_cache.numbers_key("5")) == (0.0, None)
+    assert index.search(vector, 0, semantic_cache.numbers_key("3"))[1] == "سه روز"
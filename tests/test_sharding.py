@@ -0,0 +1,114 @@
+import asyncio
+import multiprocessing
+import time
+
+import pytest
+from telegram import Update
+
+import sharding
+
+
+class FakeApplication:
+    """process_update ساختگی: شروع و پایان هر آپدیت را ثبت می‌کند؛ delays بر حسب update_id."""
+
+    bot = None
+
+    def __init__(self, delays):
+        self.delays = delays
+        self.events = []
+
+    async def process_update(self, update):
+        self.events.append(("start", update.update_id))
+        await asyncio.sleep(self.delays.get(update.update_id, 0))
+        self.events.append(("end", update.update_id))
+
+
+def message(update_id, text, chat_id=1):
+    return Update.de_json({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id, "date": 0, "text": text,
+            "chat": {"id": chat_id, "type": "private"},
+        },
+    }, None)
+
+
+def callback(update_id, data, chat_id=1):
+    return Update.de_json({
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id), "chat_instance": "1", "data": data,
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Test"},
+            "message": {"message_id": 1, "date": 0, "chat": {"id": chat_id, "type": "private"}},
+        },
+    }, None)
+
+
+def run_order(delays, updates):
+    application = FakeApplication(delays)
+
+    async def run():
+        order = sharding.ChatOrder(application)
+        for update in updates:
+            order.dispatch(update)
+        await order.drain()
+        assert not order.barriers
+
+    asyncio.run(run())
+    return application.events
+
+
+def test_message_after_mode_change_waits_for_it():
+    events = run_order({1: 0.05}, [callback(1, "set_deepseek"), message(2, "سلام")])
+    assert events.index(("end", 1)) < events.index(("start", 2))
+
+
+def test_commands_run_in_order():
+    events = run_order({1: 0.05}, [message(1, "/reset"), message(2, "/menu")])
+    assert events == [("start", 1), ("end", 1), ("start", 2), ("end", 2)]
+
+
+def test_text_messages_of_a_chat_overlap_for_chat_queue():
+    events = run_order({1: 0.05, 2: 0.05}, [message(1, "اول"), message(2, "دوم")])
+    assert events[:2] == [("start", 1), ("start", 2)]
+
+
+def test_other_chats_are_not_blocked():
+    events = run_order({1: 0.05}, [callback(1, "set_gemini", chat_id=1), message(2, "سلام", chat_id=2)])
+    assert events.index(("start", 2)) < events.index(("end", 1))
+
+
+def _exit(index, queue):
+    pass
+
+
+def _idle(index, queue):
+    time.sleep(30)
+
+
+@pytest.fixture
+def fork():
+    return multiprocessing.get_context("fork")
+
+
+def test_deliver_restarts_dead_worker(fork):
+    shards = sharding.Shards(1, fork, target=_exit, queue_size=4)
+    try:
+        shards.workers[0].join(5)
+        dead = shards.workers[0]
+        assert shards.deliver(0, {"update_id": 1}, timeout=1)
+        assert shards.workers[0] is not dead
+    finally:
+        shards.stop(timeout=1)
+
+
+def test_deliver_drops_update_when_queue_stays_full(fork):
+    shards = sharding.Shards(1, fork, target=_idle, queue_size=1)
+    try:
+        assert shards.deliver(0, {"update_id": 1}, timeout=1)
+        start = time.monotonic()
+        assert not shards.deliver(0, {"update_id": 2}, timeout=0.1)
+        assert time.monotonic() - start < 1
+        assert shards.workers[0].is_alive()
+    finally:
+        shards.stop(timeout=0.1)
@@ -0,0 +1,119 @@
+import asyncio
+import socket
+import urllib.error
+import urllib.request
+from contextlib import contextmanager
+
+import pytest
+
+import main
+import telemetry
+
+
+@pytest.fixture(autouse=True)
+def metrics(monkeypatch):
+    monkeypatch.setattr(telemetry, "_histograms", {})
+    monkeypatch.setattr(telemetry, "_counters", {})
+    monkeypatch.setattr(telemetry, "_tracer", None)
+
+
+def test_span_records_duration_tokens_and_bytes():
+    with telemetry.span("model", model="gemini-2.0-flash") as span:
+        telemetry.annotate(tokens_in=12, tokens_out=30)
+        span.set(bytes=64)
+    assert span.duration > 0
+    text = telemetry.render_prometheus()
+    labels = 'stage="model",model="gemini-2.0-flash",kind=""'
+    assert f"bot_stage_duration_seconds_count{{{labels}}} 1" in text
+    assert f'bot_stage_duration_seconds_bucket{{{labels},le="+Inf"}} 1' in text
+    assert f'bot_stage_tokens_total{{{labels},direction="in"}} 12' in text
+    assert f'bot_stage_tokens_total{{{labels},direction="out"}} 30' in text
+    assert f"bot_stage_bytes_total{{{labels}}} 64" in text
+
+
+def test_failed_span_counts_the_error_type():
+    with pytest.raises(TimeoutError):
+        with telemetry.span("send"):
+            raise TimeoutError
+    text = telemetry.render_prometheus()
+    assert 'bot_stage_errors_total{stage="send",model="",kind="",error="TimeoutError"} 1' in text
+    assert 'bot_stage_duration_seconds_count{stage="send",model="",kind=""} 1' in text
+
+
+def test_annotate_goes_to_the_innermost_span():
+    telemetry.annotate(tokens_in=1)
+    with telemetry.span("request") as outer:
+        with telemetry.span("model") as inner:
+            telemetry.annotate(tokens_in=5)
+        telemetry.annotate(bytes=3)
+    assert inner.attributes == {"tokens_in": 5}
+    assert outer.attributes == {"bytes": 3}
+    assert telemetry._current.get() is None
+
+
+def test_label_values_are_escaped():
+    with telemetry.span("model", model='bad"name\\x\n'):
+        pass
+    assert 'model="bad\\"name\\\\x\\n"' in telemetry.render_prometheus()
+
+
+class FakeTracer:
+    """tracer ساختگی OpenTelemetry که ویژگی‌های هر span را نگه می‌دارد."""
+
+    def __init__(self):
+        self.spans = {}
+
+    @contextmanager
+    def start_as_current_span(self, name):
+        attributes = self.spans[name] = {}
+
+        class OtelSpan:
+            set_attributes = attributes.update
+
+            def set_attribute(self, key, value):
+                attributes[key] = value
+
+        yield OtelSpan()
+
+
+def test_otel_span_gets_the_same_attributes(monkeypatch):
+    tracer = FakeTracer()
+    monkeypatch.setattr(telemetry, "_tracer", tracer)
+    with pytest.raises(ValueError):
+        with telemetry.span("rewrite", kind="thread", extra=object()):
+            telemetry.annotate(bytes=10)
+            raise ValueError
+    # فقط مقدارهای ساده به OpenTelemetry می‌روند
+    assert tracer.spans["rewrite"] == {"kind": "thread", "bytes": 10, "error.type": "ValueError"}
+
+
+def test_check_stage_emits_a_span(monkeypatch):
+    monkeypatch.setattr(main, "CHECK_SKIP_BELOW_SCORE", 3)
+    monkeypatch.setattr(main, "check_stats", dict.fromkeys(main.check_stats, 0))
+
+    async def run_check():
+        raise AssertionError("نباید صدا زده شود")
+
+    asyncio.run(main.conversational_check("check", "سلام! خوبی؟", run_check))
+    assert 'bot_stage_duration_seconds_count{stage="check",model="check",kind="skipped"} 1' in (
+        telemetry.render_prometheus())
+
+
+def test_serve_metrics_exposes_prometheus_text():
+    assert telemetry.serve_metrics(0) is None
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    with telemetry.span("model"):
+        pass
+    server = telemetry.serve_metrics(port)
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+            assert response.headers["Content-Type"].startswith("text/plain")
+            assert 'stage="model"' in response.read().decode("utf-8")
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/other", timeout=5)
+        assert error.value.code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,123 @@
+import asyncio
+import json
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import main
+import user_store
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    path = tmp_path / "user_modes.json"
+    monkeypatch.setattr(user_store, "USER_MODE_FILE", str(path))
+    monkeypatch.setattr(user_store, "USER_MODE_FLUSH_DELAY", 60)
+    monkeypatch.setattr(user_store, "USER_MODE_RETRY_DELAY", 60)
+    monkeypatch.setattr(user_store, "_modes", None)
+    monkeypatch.setattr(user_store, "_loaded_mtime", None)
+    monkeypatch.setattr(user_store, "_pending", {})
+    monkeypatch.setattr(user_store, "_inflight", {})
+    monkeypatch.setattr(user_store, "_flush_timer", None)
+    yield path
+    if user_store._flush_timer is not None:
+        user_store._flush_timer.cancel()
+
+
+def read(path):
+    return json.loads(path.read_text())
+
+
+def test_set_mode_is_written_behind(store):
+    user_store.set_mode(1, "deepseek")
+    assert user_store.get_mode(1) == "deepseek"
+    assert not store.exists()
+    assert user_store._flush_timer is not None
+    user_store.flush()
+    assert read(store) == {"1": "deepseek"}
+    assert user_store._flush_timer is None
+
+
+def test_flush_timer_writes_after_delay(store, monkeypatch):
+    monkeypatch.setattr(user_store, "USER_MODE_FLUSH_DELAY", 0.05)
+    user_store.set_mode(2, "refined")
+    deadline = time.monotonic() + 5
+    while not store.exists() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert read(store) == {"2": "refined"}
+
+
+def test_flush_merges_changes_from_other_processes(store):
+    store.write_text(json.dumps({"1": "gemini"}))
+    user_store.set_mode(2, "openrouter")
+    # پروسه‌ی دیگری در این فاصله فایل را عوض کرده است
+    store.write_text(json.dumps({"1": "deepseek", "3": "refined"}))
+    user_store.flush()
+    assert read(store) == {"1": "deepseek", "2": "openrouter", "3": "refined"}
+    assert user_store.get_mode(3) == "refined"
+
+
+def test_clear_mode_removes_the_stored_mode(store):
+    user_store.set_mode(1, "deepseek")
+    user_store.flush()
+    user_store.clear_mode(1)
+    assert user_store.get_mode(1) == "gemini"
+    user_store.flush()
+    assert read(store) == {}
+
+
+def test_failed_write_keeps_the_old_file_and_retries(store, monkeypatch):
+    store.write_text(json.dumps({"1": "gemini"}))
+    user_store.set_mode(1, "deepseek")
+
+    replace = os.replace
+
+    def broken_replace(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "replace", broken_replace)
+    user_store.flush()
+    # فایل اصلی دست نخورده است؛ نوشتن فقط در فایل موقت انجام شده بود
+    assert read(store) == {"1": "gemini"}
+    assert user_store._pending == {"1": "deepseek"}
+    assert user_store._flush_timer is not None
+
+    monkeypatch.setattr(os, "replace", replace)
+    user_store.flush()
+    assert read(store) == {"1": "deepseek"}
+
+
+def test_corrupt_file_is_never_overwritten_and_read_is_retried(store):
+    store.write_text(json.dumps({"1": "refined"}))
+    assert user_store.get_mode(1) == "refined"
+
+    store.write_text("{not json")
+    user_store.set_mode(2, "deepseek")
+    # آخرین نسخه‌ی سالم حافظه همچنان استفاده می‌شود
+    assert user_store.get_mode(1) == "refined"
+    user_store.flush()
+    assert store.read_text() == "{not json"
+    assert user_store._pending == {"2": "deepseek"}
+
+    store.write_text(json.dumps({"1": "refined", "3": "gemini"}))
+    user_store.flush()
+    assert read(store) == {"1": "refined", "2": "deepseek", "3": "gemini"}
+
+
+def test_reset_command_clears_the_chat_mode(store):
+    async def reply_text(*args, **kwargs):
+        pass
+
+    update = SimpleNamespace(
+        effective_chat=SimpleNamespace(id=-100),
+        effective_user=SimpleNamespace(id=7),
+        message=SimpleNamespace(reply_text=reply_text),
+    )
+    context = SimpleNamespace(chat_data={"anything": 1})
+    main.save_chat_mode(-100, "refined")
+    assert main.get_chat_mode(update, context) == "refined"
+    asyncio.run(main.reset_session(update, context))
+    assert main.get_chat_mode(update, context) == "gemini"
+    assert context.chat_data == {}
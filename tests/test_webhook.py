@@ -0,0 +1,50 @@
+import atexit
+import importlib
+import sys
+
+import pytest
+
+SECRET = "test-secret"
+
+
+# 🌐 webhook هنگام import اپلیکیشن را بالا می‌آورد (getMe)؛ Bot API به سرور جعلی اشاره می‌کند
+@pytest.fixture(scope="module")
+def webhook(fake_servers):
+    import main
+
+    patch = pytest.MonkeyPatch()
+    patch.setattr(main, "TELEGRAM_TOKEN", "123456:test")
+    patch.setattr(main, "TELEGRAM_BASE_URL", fake_servers["telegram"])
+    patch.setenv("WEBHOOK_SECRET", SECRET)
+    sys.modules.pop("webhook", None)
+    module = importlib.import_module("webhook")
+    try:
+        yield module
+    finally:
+        atexit.unregister(module._stop)
+        module._stop()
+        sys.modules.pop("webhook", None)
+        patch.undo()
+
+
+def post(webhook, payload, secret=None):
+    headers = {"X-Telegram-Bot-Api-Secret-Token": secret} if secret is not None else {}
+    return webhook.app.test_client().post(webhook.WEBHOOK_PATH, json=payload, headers=headers)
+
+
+def test_rejects_missing_or_wrong_secret(webhook):
+    assert post(webhook, {"update_id": 1}).status_code == 403
+    assert post(webhook, {"update_id": 1}, secret="wrong").status_code == 403
+
+
+def test_accepts_update_with_matching_secret(webhook):
+    assert post(webhook, {"update_id": 2}, secret=SECRET).status_code == 200
+
+
+def test_rejects_empty_body(webhook):
+    assert post(webhook, None, secret=SECRET).status_code == 400
+
+
+def test_no_secret_configured_accepts_any_request(webhook, monkeypatch):
+    monkeypatch.setattr(webhook, "WEBHOOK_SECRET", None)
+    assert post(webhook, {"update_id": 3}).status_code == 200
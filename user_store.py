@@ -0,0 +1,141 @@
+import os
+import json
+import fcntl
+import logging
+import atexit
+import threading
+
+# 🗂️ ذخیره‌ی حالت چت‌ها (کلید: شناسه‌ی چت؛ در چت خصوصی همان شناسه‌ی کاربر): یک dict در حافظه که فقط وقتی فایل عوض شده دوباره خوانده می‌شود
+# و تغییرها با تأخیر کوتاه (write-behind) و به صورت اتمیک روی دیسک نوشته می‌شوند.
+# چند پروسه (workerهای وب‌هوک) می‌توانند هم‌زمان از یک فایل استفاده کنند: هر flush زیر قفل فایل
+# آخرین نسخه‌ی دیسک را می‌خواند و فقط تغییرهای همین پروسه را رویش اعمال می‌کند.
+# اگر فایل خراب یا ناخوانا باشد، آخرین نسخه‌ی سالم حافظه استفاده می‌شود و flush انجام نمی‌شود
+# (تا فایل با فقط تغییرهای این پروسه بازنویسی نشود)؛ تغییرها نگه داشته و هر USER_MODE_RETRY_DELAY ثانیه
+# دوباره امتحان می‌شوند.
+USER_MODE_FILE = os.getenv("USER_MODE_FILE", "user_modes.json")
+USER_MODE_FLUSH_DELAY = float(os.getenv("USER_MODE_FLUSH_DELAY", "2"))
+USER_MODE_RETRY_DELAY = float(os.getenv("USER_MODE_RETRY_DELAY", "5"))
+
+log = logging.getLogger(__name__)
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_modes = None
+_loaded_mtime = None
+_pending = {}
+_inflight = {}
+_flush_timer = None
+
+
+def _file_mtime():
+    try:
+        return os.stat(USER_MODE_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+# فقط نبودن فایل یعنی «هنوز حالتی ذخیره نشده»؛ خطای خواندن یا JSON خراب بالا می‌رود
+def _read_file():
+    try:
+        with open(USER_MODE_FILE, "r") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    if not isinstance(data, dict):
+        raise ValueError(f"محتوای {USER_MODE_FILE} یک شیء JSON نیست")
+    return data
+
+
+# تغییرهای منتظر روی data؛ None یعنی حالت آن چت پاک شده است
+def _apply(data, changes):
+    for key, mode in changes.items():
+        if mode is None:
+            data.pop(key, None)
+        else:
+            data[key] = mode
+
+
+def _ensure_loaded():
+    global _modes, _loaded_mtime
+    mtime = _file_mtime()
+    if _modes is None or mtime != _loaded_mtime:
+        try:
+            data = _read_file()
+        except Exception as e:
+            log.error("❌ خطا در خواندن حالت کاربران؛ آخرین نسخه‌ی سالم استفاده می‌شود: %s", e)
+            data = _modes if _modes is not None else {}
+        _apply(data, _inflight)
+        _apply(data, _pending)
+        _modes, _loaded_mtime = data, mtime
+
+
+def _schedule_flush(delay):
+    global _flush_timer
+    if _flush_timer is None:
+        _flush_timer = threading.Timer(delay, flush)
+        _flush_timer.daemon = True
+        _flush_timer.start()
+
+
+def get_mode(chat_id, default="gemini"):
+    with _lock:
+        _ensure_loaded()
+        return _modes.get(str(chat_id), default)
+
+
+def _change(chat_id, mode):
+    with _lock:
+        _ensure_loaded()
+        _apply(_modes, {str(chat_id): mode})
+        _pending[str(chat_id)] = mode
+        _schedule_flush(USER_MODE_FLUSH_DELAY)
+
+
+def set_mode(chat_id, mode):
+    _change(chat_id, mode)
+
+
+# ♻️ پاک کردن حالت ذخیره‌شده (مثلاً با /reset)؛ بعد از آن get_mode مقدار پیش‌فرض را برمی‌گرداند
+def clear_mode(chat_id):
+    _change(chat_id, None)
+
+
+# 💾 نوشتن اتمیک: اول در فایل موقت کنار فایل اصلی، بعد os.replace
+def flush():
+    global _modes, _loaded_mtime, _flush_timer
+    with _flush_lock:
+        with _lock:
+            _flush_timer = None
+            if not _pending:
+                return
+            changes = dict(_pending)
+            _inflight.update(changes)
+            _pending.clear()
+
+        tmp_path = f"{USER_MODE_FILE}.{os.getpid()}.tmp"
+        try:
+            with open(f"{USER_MODE_FILE}.lock", "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                data = _read_file()
+                _apply(data, changes)
+                with open(tmp_path, "w") as f:
+                    json.dump(data, f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, USER_MODE_FILE)
+                mtime = _file_mtime()
+        except Exception as e:
+            log.error("❌ خطا در ذخیره حالت کاربر؛ %s ثانیه‌ی دیگر دوباره امتحان می‌شود: %s", USER_MODE_RETRY_DELAY, e)
+            with _lock:
+                _inflight.clear()
+                for chat_id, mode in changes.items():
+                    _pending.setdefault(chat_id, mode)
+                _schedule_flush(USER_MODE_RETRY_DELAY)
+            return
+
+        with _lock:
+            _inflight.clear()
+            _apply(data, _pending)
+            _modes, _loaded_mtime = data, mtime
+
+
+atexit.register(flush)
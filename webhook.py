@@ -0,0 +1,119 @@
+import os
+import sys
+import hmac
+import atexit
+import asyncio
+import threading
+
+from flask import Flask, request, abort, jsonify
+from telegram import Update
+
+import main as bot
+import response_cache
+import semantic_cache
+import outbound
+import chat_queue
+import model_limits
+import resilience
+import router
+import telemetry
+
+# 🌐 حالت وب‌هوک: تلگرام آپدیت‌ها را با POST می‌فرستد و همان هندلرهای main اجرا می‌شوند.
+#
+#   gunicorn webhook:app --workers 1 --bind 0.0.0.0:$PORT
+#   python webhook.py set-webhook https://example.com/webhook
+#
+# این حالت جایگزین polling است، نه در کنارش: Procfile فقط «python main.py» را اجرا می‌کند و برای وب‌هوک
+# همان خط باید با دستور gunicorn بالا عوض شود (polling هنگام شروع وب‌هوک را حذف می‌کند و برعکس).
+# ⚠️ فقط یک worker: chat_queue، کش user_store و صف ارسال درون پروسه‌اند و gunicorn آپدیت‌های یک چت را
+# به یک worker نمی‌فرستد؛ با بیش از یک worker ترتیب/ادغام/لغو پیام‌های یک چت تضمینی ندارد.
+# برای چند پروسه از sharding.py (مسیریابی بر اساس چت) استفاده کنید.
+# اپلیکیشن و event loop در یک thread جدا اجرا می‌شوند، پس gunicorn را بدون --preload اجرا کنید.
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+
+application = bot.build_application(polling=False)
+_loop = asyncio.new_event_loop()
+
+
+def _run_loop():
+    asyncio.set_event_loop(_loop)
+    _loop.run_forever()
+
+
+async def _startup():
+    await application.initialize()
+    await bot.on_startup(application)
+    await application.start()
+
+
+async def _shutdown():
+    await application.stop()
+    await application.shutdown()
+    await bot.on_shutdown(application)
+
+
+def _stop():
+    asyncio.run_coroutine_threadsafe(_shutdown(), _loop).result(timeout=10)
+    _loop.call_soon_threadsafe(_loop.stop)
+
+
+threading.Thread(target=_run_loop, name="telegram-loop", daemon=True).start()
+asyncio.run_coroutine_threadsafe(_startup(), _loop).result()
+atexit.register(_stop)
+
+app = Flask(__name__)
+
+
+# 📥 دریافت آپدیت: فقط در صف اپلیکیشن گذاشته می‌شود تا پاسخ HTTP فوراً برگردد
+@app.post(WEBHOOK_PATH)
+def telegram_webhook():
+    if WEBHOOK_SECRET and not hmac.compare_digest(
+        request.headers.get("X-Telegram-Bot-Api-Secret-Token", "").encode("utf-8"), WEBHOOK_SECRET.encode("utf-8")
+    ):
+        abort(403)
+    data = request.get_json(silent=True)
+    if not data:
+        abort(400)
+    update = Update.de_json(data, application.bot)
+    asyncio.run_coroutine_threadsafe(application.update_queue.put(update), _loop).result(timeout=5)
+    return "", 200
+
+
+@app.get("/healthz")
+def healthz():
+    return "ok", 200
+
+
+# 📊 آمار کش‌های همین worker
+@app.get("/stats")
+def stats():
+    return jsonify(
+        response_cache=response_cache.stats(),
+        semantic_cache=semantic_cache.stats(),
+        conversational_check=bot.check_stats,
+        outbound=outbound.stats(),
+        chat_queue=chat_queue.stats(),
+        model_limits=model_limits.stats(),
+        resilience=resilience.stats(),
+        router=router.stats(),
+    )
+
+
+# 📈 متریک‌های Prometheus همین worker
+@app.get("/metrics")
+def metrics():
+    return telemetry.render_prometheus(), 200, {"Content-Type": "text/plain; version=0.0.4"}
+
+
+# 🔗 ثبت آدرس وب‌هوک در تلگرام (یک بار کافی است)
+async def set_webhook(url):
+    await application.bot.set_webhook(url, secret_token=WEBHOOK_SECRET)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "set-webhook":
+        asyncio.run_coroutine_threadsafe(set_webhook(sys.argv[2]), _loop).result()
+        print(f"✅ وب‌هوک ثبت شد: {sys.argv[2]}")
+    else:
+        app.run(host="0.0.0.0", port=int(os.getenv("PORT", "8080")))